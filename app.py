@@ -1,107 +1,151 @@
-from flask import Flask, request, jsonify
-import google.generativeai as genai
+from flask import Blueprint, Flask, current_app, request, jsonify, g
 import json
+import logging
+import threading
 import time
-import re
 from config import Config
-from utils.validators import validate_input, validate_output
-from utils.evaluator import evaluate_description, get_evaluation_report
-from prompts.prompt_templates import get_product_description_prompt
-from collections import OrderedDict
-
-app = Flask(__name__)
-app.config.from_object(Config)
-
-# Configure Gemini API
-genai.configure(api_key=Config.GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash')
-
-def validate_and_mark_invalid_fields(data):
-    """Validate input data and mark invalid fields with 'Invalid input'"""
-    validated_data = data.copy()
-    has_valid_data = True
-
-    # Validate product_name
-    if 'product_name' not in data or not isinstance(data.get('product_name'), str) or not data.get('product_name').strip():
-        validated_data['product_name'] = "Invalid input"
-        has_valid_data = False
-
-    # Validate category (must be a string and a known category)
-    valid_categories = [
-        "Electronics", "Wearables", "Smartphone", "Clothing", "Home", "Beauty", "Sports"
-    ]
-    if 'category' not in data or not isinstance(data.get('category'), str) or not data.get('category').strip() or data.get('category').capitalize() not in valid_categories:
-        validated_data['category'] = "Invalid input"
-        has_valid_data = False
-
-    # Validate key_features
-    if 'key_features' not in data:
-        validated_data['key_features'] = "Invalid input"
-        has_valid_data = False
-    elif not isinstance(data.get('key_features'), list):
-        validated_data['key_features'] = "Invalid input"
-        has_valid_data = False
-    elif not all(isinstance(feature, str) and feature.strip() for feature in data.get('key_features', [])):
-        validated_data['key_features'] = "Invalid input"
-        has_valid_data = False
-
-    # Validate price
-    if 'price' not in data:
-        validated_data['price'] = "Invalid input"
-        has_valid_data = False
-    elif not isinstance(data.get('price'), (int, float)):
-        validated_data['price'] = "Invalid input"
-        has_valid_data = False
-    elif data.get('price') < 0:
-        validated_data['price'] = "Invalid input"
-        has_valid_data = False
-
-    # Validate optional fields
-    if 'target_audience' in data and (not isinstance(data.get('target_audience'), str) or not data.get('target_audience').strip()):
-        validated_data['target_audience'] = "Invalid input"
-
-    if 'tone' in data and (not isinstance(data.get('tone'), str) or not data.get('tone').strip()):
-        validated_data['tone'] = "Invalid input"
-
-    # Set defaults for optional fields if not provided
-    if 'target_audience' not in validated_data:
-        validated_data['target_audience'] = 'general'
-    if 'tone' not in validated_data:
-        validated_data['tone'] = 'professional'
-
-    return validated_data, has_valid_data
-
-def clean_json_response(raw_response):
-    """Clean and parse JSON response from Gemini API"""
-    try:
-        if raw_response.startswith('```json'):
-            raw_response = raw_response[7:-3]
-        elif raw_response.startswith('```'):
-            raw_response = raw_response[3:-3]
-
-        json_match = re.search(r'\{.*\}', raw_response, re.DOTALL)
-        if json_match:
-            raw_response = json_match.group()
-
-        return json.loads(raw_response)
-    except:
-        try:
-            raw_response = raw_response.strip()
-            raw_response = re.sub(r',\s*}', '}', raw_response)
-            raw_response = re.sub(r',\s*]', ']', raw_response)
-            return json.loads(raw_response)
-        except:
-            raise ValueError("Could not parse JSON response")
-
-@app.route('/generate-description', methods=['POST'])
+from utils.log import setup_logging
+from utils.metrics import REGISTRY, REQUEST_SECONDS, REQUESTS_IN_FLIGHT, STAGE_SECONDS
+from utils.validators import validate_and_mark_invalid_fields, validate_product, validate_variants
+from utils.evaluator import evaluate_batch, get_evaluation_report
+from utils.circuit_breaker import RejectedError
+from utils.timing import Deadline, ServerTiming
+from utils.json_stream import format_stream_event, stream_format_for
+from prompts.prompt_templates import OUTPUT_MODES, templates
+from services.generation import (
+    DeadlineExceededError,
+    GenerationError,
+    admission_controller,
+    backend_stats,
+    circuit_breaker,
+    clean_product,
+    generate_batch,
+    generate_for_product,
+    generate_variants,
+    hedge_stats,
+    iterate_stream,
+    model_router,
+    rate_limiter,
+    repair_stats,
+    response_cache,
+    retry_policy,
+    semantic_cache,
+    single_flight,
+    start_warm_up,
+    stream_description_async,
+    warm_up_status,
+)
+from services.incremental import record_manager, update_description
+from services.jobs import PRIORITIES, QueueFullError, job_manager, validate_callback_url
+
+logger = logging.getLogger(__name__)
+
+api = Blueprint('api', __name__)
+
+def _endpoint_label():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+@api.before_app_request
+def _start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    g.metrics_endpoint = _endpoint_label()
+    REQUESTS_IN_FLIGHT.inc(endpoint=g.metrics_endpoint)
+
+@api.after_app_request
+def _capture_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+@api.teardown_app_request
+def _finish_request_metrics(exc):
+    if 'metrics_started' not in g:
+        return
+    REQUESTS_IN_FLIGHT.dec(endpoint=g.metrics_endpoint)
+    REQUEST_SECONDS.observe(
+        time.perf_counter() - g.metrics_started,
+        endpoint=g.metrics_endpoint,
+        status=str(g.get('metrics_status', 500))
+    )
+
+def cache_bypass_requested():
+    """True when the client sent Cache-Control: no-cache (or Pragma: no-cache)"""
+    cache_control = request.headers.get('Cache-Control', '').lower()
+    pragma = request.headers.get('Pragma', '').lower()
+    return 'no-cache' in cache_control or 'no-cache' in pragma
+
+def output_mode_requested():
+    """Output mode from ?output_mode= (None means Config.OUTPUT_MODE); ValueError if unknown"""
+    output_mode = request.args.get('output_mode')
+    if output_mode is not None and output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output_mode: {output_mode} (expected one of {', '.join(OUTPUT_MODES)})")
+    return output_mode
+
+def model_hint_requested():
+    """Model hint from ?model= (a pooled model or hint alias; None lets the router decide); ValueError if unknown"""
+    model_hint = request.args.get('model')
+    if model_hint is not None:
+        model_router.resolve_hint(model_hint)
+    return model_hint
+
+def json_response(payload, status=200, headers=None):
+    """Serialize payload without re-sorting keys so field order is preserved"""
+    with STAGE_SECONDS.time(stage='serialization'):
+        body = json.dumps(payload)
+    response = current_app.response_class(
+        response=body,
+        status=status,
+        mimetype='application/json'
+    )
+    for name, value in (headers or {}).items():
+        response.headers[name] = value
+    return response
+
+# Failures a generation route answers with generation_error() instead of a bare 500
+GENERATION_ERRORS = (RejectedError, GenerationError)
+
+def timing_headers(timings, start_time, extra=None):
+    """Server-Timing (with the request's total so far) plus any extra response headers"""
+    timings.add('total', time.monotonic() - start_time)
+    headers = {"Server-Timing": timings.header_value()}
+    headers.update(extra or {})
+    return headers
+
+def generation_error(e):
+    """(status, payload, headers) for a GENERATION_ERRORS failure.
+
+    Load shedding is 503 with Retry-After, a missed deadline 504 and any
+    other generation failure 500.
+    """
+    if isinstance(e, RejectedError):
+        return 503, {"error": str(e)}, {"Retry-After": e.retry_after_header}
+    if isinstance(e, DeadlineExceededError):
+        return 504, {"error": str(e)}, {}
+    return 500, {"error": str(e)}, {}
+
+def generation_error_response(e, timings, start_time):
+    """json_response for a GENERATION_ERRORS failure, with timing headers"""
+    status, payload, headers = generation_error(e)
+    return json_response(payload, status=status, headers=timing_headers(timings, start_time, headers))
+
+@api.route('/generate-description', methods=['POST'])
 def generate_description():
     """Main API endpoint for generating product descriptions"""
-    start_time = time.time()
+    start_time = time.monotonic()
+    # MAX_RESPONSE_TIME is the end-to-end budget, so the clock starts before parsing
+    deadline = Deadline(Config.MAX_RESPONSE_TIME, started=start_time)
+    timings = ServerTiming()
 
     try:
+        try:
+            output_mode = output_mode_requested()
+            model_hint = model_hint_requested()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         # Parse JSON safely
         try:
-            data = request.get_json(force=True)
+            with STAGE_SECONDS.time(stage='json_parse'):
+                data = request.get_json(force=True)
         except Exception as json_err:
             return jsonify({"error": f"Invalid JSON format: {str(json_err)}"}), 400
 
@@ -109,58 +153,306 @@ def generate_description():
             return jsonify({"error": "No JSON data provided"}), 400
 
         # Validate and mark invalid fields
-        validated_data, has_valid_required_data = validate_and_mark_invalid_fields(data)
-        
-        # Debug prints (optional - remove in production)
-        print(f"DEBUG: Input data = {data}")
-        print(f"DEBUG: Validated data = {validated_data}")
-        print(f"DEBUG: Has valid required data = {has_valid_required_data}")
-        
+        with timings.measure('validation'), STAGE_SECONDS.time(stage='validation'):
+            validated_data, has_valid_required_data = validate_and_mark_invalid_fields(data)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("generate-description input", extra={
+                "input": data, "validated": validated_data, "valid": has_valid_required_data
+            })
+
         # If any required field is invalid, return the input with 'Invalid input' markers (only for those fields)
         if not has_valid_required_data:
             # Only return the validated input, preserving all fields and marking only invalid ones
             return jsonify(validated_data), 400
 
         # If all required fields are valid, proceed with generation
-        clean_data = {k: v for k, v in validated_data.items() if v != "Invalid input"}
-        prompt = get_product_description_prompt(clean_data)
+        clean_data = clean_product(validated_data)
 
-        # Call Gemini API with retry logic
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                response = model.generate_content(prompt)
-                raw_response = response.text
-                generated_output = clean_json_response(raw_response)
-                break
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    return jsonify({"error": f"AI generation failed after {max_retries} attempts: {str(e)}"}), 500
-                time.sleep(1)
-
-        # Validate LLM output
-        is_valid, validation_message = validate_output(generated_output)
-        if not is_valid:
-            return jsonify({"error": f"Invalid output format: {validation_message}"}), 500
-
-        final_output = OrderedDict([
-            ("short_description", generated_output.get("short_description", "")),
-            ("detailed_description", generated_output.get("detailed_description", "")),
-            ("bullet_points", generated_output.get("bullet_points", [])),
-            ("seo_keywords", generated_output.get("seo_keywords", [])),
-            ("call_to_action", generated_output.get("call_to_action", ""))
-        ])
-
-        return app.response_class(
-            response=json.dumps(final_output),
-            status=200,
-            mimetype='application/json'
+        try:
+            final_output, cache_status = generate_for_product(
+                clean_data, bypass_cache=cache_bypass_requested(), deadline=deadline, timings=timings,
+                output_mode=output_mode, model_hint=model_hint
+            )
+        except GENERATION_ERRORS as e:
+            return generation_error_response(e, timings, start_time)
+
+        return json_response(final_output, headers=timing_headers(timings, start_time, {"X-Cache": cache_status}))
+
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+def stream_format_requested():
+    """'ndjson' when asked for via ?format=ndjson or the Accept header, else 'sse'"""
+    return stream_format_for(request.args.get('format'), request.headers.get('Accept'))
+
+@api.route('/generate-description/stream', methods=['POST'])
+def generate_description_stream():
+    """Stream each output field as soon as the model has produced it (SSE or NDJSON)"""
+    try:
+        try:
+            output_mode = output_mode_requested()
+            model_hint = model_hint_requested()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            data = request.get_json(force=True)
+        except Exception as json_err:
+            return jsonify({"error": f"Invalid JSON format: {str(json_err)}"}), 400
+
+        if not data:
+            return jsonify({"error": "No JSON data provided"}), 400
+
+        validated_data, has_valid_required_data = validate_and_mark_invalid_fields(data)
+        if not has_valid_required_data:
+            return jsonify(validated_data), 400
+
+        stream_format = stream_format_requested()
+        events = iterate_stream(stream_description_async(
+            clean_product(validated_data), bypass_cache=cache_bypass_requested(), output_mode=output_mode,
+            model_hint=model_hint
+        ))
+        response = current_app.response_class(
+            (format_stream_event(event, stream_format) for event in events),
+            mimetype='application/x-ndjson' if stream_format == 'ndjson' else 'text/event-stream'
         )
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
 
     except Exception as e:
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
-@app.route('/validate-input', methods=['POST'])
+@api.route('/generate-descriptions/batch', methods=['POST'])
+def generate_descriptions_batch():
+    """Generate descriptions for many products concurrently, results in input order"""
+    try:
+        try:
+            output_mode = output_mode_requested()
+            model_hint = model_hint_requested()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            data = request.get_json(force=True)
+        except Exception as json_err:
+            return jsonify({"error": f"Invalid JSON format: {str(json_err)}"}), 400
+
+        # Accept either a bare array or {"products": [...]}
+        products = data.get('products') if isinstance(data, dict) else data
+        if not isinstance(products, list) or not products:
+            return jsonify({"error": "Expected a non-empty array of products"}), 400
+        if len(products) > Config.BATCH_MAX_ITEMS:
+            return jsonify({"error": f"Batch too large: {len(products)} items (max {Config.BATCH_MAX_ITEMS})"}), 413
+
+        # Validation up front and bounded fan-out both happen in the service layer
+        batch_result = generate_batch(
+            products, bypass_cache=cache_bypass_requested(), output_mode=output_mode, model_hint=model_hint
+        )
+        return json_response(batch_result)
+
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+@api.route('/generate-description/variants', methods=['POST'])
+def generate_description_variants():
+    """Generate locale/tone/audience variants of one product in combined calls"""
+    start_time = time.monotonic()
+    deadline = Deadline(Config.MAX_RESPONSE_TIME, started=start_time)
+    timings = ServerTiming()
+
+    try:
+        try:
+            output_mode = output_mode_requested()
+            model_hint = model_hint_requested()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            data = request.get_json(force=True)
+        except Exception as json_err:
+            return jsonify({"error": f"Invalid JSON format: {str(json_err)}"}), 400
+
+        # {"product": {...}, "variants": [{"locale": "hi-IN", "tone": "casual"}, ...]}
+        if not isinstance(data, dict) or not isinstance(data.get('product'), dict):
+            return jsonify({"error": "Expected an object with a product object and a variants array"}), 400
+
+        if isinstance(data.get('variants'), list) and len(data['variants']) > Config.VARIANTS_MAX_ITEMS:
+            return jsonify({"error": f"Too many variants: {len(data['variants'])} (max {Config.VARIANTS_MAX_ITEMS})"}), 413
+        variants, variants_error = validate_variants(data.get('variants'))
+        if variants_error:
+            return jsonify({"error": variants_error}), 400
+
+        with timings.measure('validation'), STAGE_SECONDS.time(stage='validation'):
+            validated_data, has_valid_required_data = validate_and_mark_invalid_fields(data['product'])
+        if not has_valid_required_data:
+            return jsonify(validated_data), 400
+
+        try:
+            variants_result = generate_variants(
+                clean_product(validated_data), variants, bypass_cache=cache_bypass_requested(), deadline=deadline,
+                timings=timings, output_mode=output_mode, model_hint=model_hint
+            )
+        except GENERATION_ERRORS as e:
+            return generation_error_response(e, timings, start_time)
+
+        return json_response(variants_result, headers=timing_headers(timings, start_time))
+
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+@api.route('/jobs', methods=['POST'])
+def submit_jobs():
+    """Queue generations and return 202 at once; poll /jobs/<id> or pass a callback_url"""
+    try:
+        try:
+            output_mode = output_mode_requested()
+            model_hint = model_hint_requested()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            data = request.get_json(force=True)
+        except Exception as json_err:
+            return jsonify({"error": f"Invalid JSON format: {str(json_err)}"}), 400
+
+        # {"product": {...}} queues one job; {"products": [...]} queues one job per product
+        if not isinstance(data, dict) or ('product' in data) == ('products' in data):
+            return jsonify({"error": "Expected a JSON object with either 'product' or 'products'"}), 400
+        single = 'product' in data
+        products = [data['product']] if single else data['products']
+        if not isinstance(products, list) or not products:
+            return jsonify({"error": "Expected a non-empty array of products"}), 400
+        if len(products) > Config.BATCH_MAX_ITEMS:
+            return jsonify({"error": f"Batch too large: {len(products)} items (max {Config.BATCH_MAX_ITEMS})"}), 413
+
+        # Bulk submissions default to low priority so they never crowd out single products
+        priority = data.get('priority', 'normal' if single else 'low')
+        if priority not in PRIORITIES:
+            return jsonify({"error": f"Unknown priority: {priority} (expected one of {', '.join(PRIORITIES)})"}), 400
+        callback_url = data.get('callback_url')
+        if callback_url is not None:
+            callback_error = validate_callback_url(callback_url)
+            if callback_error:
+                return jsonify({"error": callback_error}), 400
+        tenant = request.headers.get('X-Tenant-ID', 'default')
+        bypass_cache = cache_bypass_requested()
+
+        jobs = []
+        for index, product in enumerate(products):
+            if not isinstance(product, dict):
+                jobs.append({"index": index, "status": "invalid_input", "error": "Product must be a JSON object"})
+                continue
+            validated_data, has_valid_required_data = validate_and_mark_invalid_fields(product)
+            if not has_valid_required_data:
+                if single:
+                    return jsonify(validated_data), 400
+                jobs.append({"index": index, "status": "invalid_input", "input_validation": validated_data})
+                continue
+            try:
+                job = job_manager.submit(
+                    clean_product(validated_data), tenant=tenant, priority=priority, callback_url=callback_url,
+                    bypass_cache=bypass_cache, output_mode=output_mode, model_hint=model_hint
+                )
+            except QueueFullError as e:
+                if single:
+                    return json_response({"error": str(e)}, status=503, headers={"Retry-After": e.retry_after_header})
+                jobs.append({"index": index, "status": "rejected", "error": str(e), "retry_after": e.retry_after_header})
+                continue
+            job["index"] = index
+            jobs.append(job)
+
+        if single:
+            return json_response(jobs[0], status=202, headers={"Location": f"/jobs/{jobs[0]['id']}"})
+
+        summary = {
+            "total": len(jobs),
+            "queued": sum(1 for job in jobs if job["status"] == "queued"),
+            "invalid_input": sum(1 for job in jobs if job["status"] == "invalid_input"),
+            "rejected": sum(1 for job in jobs if job["status"] == "rejected"),
+        }
+        status = 202 if summary["queued"] else (503 if summary["rejected"] else 400)
+        return json_response({"summary": summary, "jobs": jobs}, status=status)
+
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+@api.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll a job; result holds the description once status is 'succeeded'"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return json_response(job)
+
+@api.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a job that has not started yet"""
+    job, cancelled = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    if not cancelled:
+        return json_response({"error": f"Job is {job['status']} and can no longer be cancelled", "job": job}, status=409)
+    return json_response(job)
+
+@api.route('/products/<product_id>/description', methods=['PUT'])
+def update_product_description(product_id):
+    """Create or update the stored description of a product, regenerating only the fields an edit affects"""
+    start_time = time.monotonic()
+    deadline = Deadline(Config.MAX_RESPONSE_TIME, started=start_time)
+    timings = ServerTiming()
+
+    try:
+        try:
+            output_mode = output_mode_requested()
+            model_hint = model_hint_requested()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            data = request.get_json(force=True)
+        except Exception as json_err:
+            return jsonify({"error": f"Invalid JSON format: {str(json_err)}"}), 400
+
+        if not data:
+            return jsonify({"error": "No JSON data provided"}), 400
+
+        with timings.measure('validation'), STAGE_SECONDS.time(stage='validation'):
+            validated_data, has_valid_required_data = validate_and_mark_invalid_fields(data)
+        if not has_valid_required_data:
+            return jsonify(validated_data), 400
+
+        try:
+            update = update_description(
+                product_id, clean_product(validated_data), bypass_cache=cache_bypass_requested(), deadline=deadline,
+                timings=timings, output_mode=output_mode, model_hint=model_hint
+            )
+        except GENERATION_ERRORS as e:
+            return generation_error_response(e, timings, start_time)
+
+        status = 201 if update['mode'] == 'created' else 200
+        return json_response(update, status=status, headers=timing_headers(timings, start_time))
+
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+@api.route('/products/<product_id>/description', methods=['GET'])
+def get_product_description(product_id):
+    """The stored generation record: input snapshot, output and prompt version"""
+    record = record_manager.get(product_id)
+    if record is None:
+        return jsonify({"error": f"Unknown product: {product_id}"}), 404
+    return json_response(record)
+
+@api.route('/products/<product_id>/description', methods=['DELETE'])
+def delete_product_description(product_id):
+    """Forget the stored generation record; the next PUT generates from scratch"""
+    if not record_manager.delete(product_id):
+        return jsonify({"error": f"Unknown product: {product_id}"}), 404
+    return '', 204
+
+@api.route('/validate-input', methods=['POST'])
 def validate_input_only():
     """Endpoint to only validate input without generating content"""
     try:
@@ -174,11 +466,12 @@ def validate_input_only():
             return jsonify({"error": "No JSON data provided"}), 400
 
         # Validate and mark invalid fields
-        validated_data, has_valid_required_data = validate_and_mark_invalid_fields(data)
+        validated_data, has_valid_required_data, errors = validate_product(data)
         
         response_data = {
             "input_validation": validated_data,
             "is_valid": has_valid_required_data,
+            "errors": errors,
             "message": "All required fields are valid" if has_valid_required_data else "Some required fields contain invalid input"
         }
         
@@ -188,7 +481,41 @@ def validate_input_only():
     except Exception as e:
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
-@app.route('/evaluate', methods=['POST'])
+@api.route('/validate-input/batch', methods=['POST'])
+def validate_input_batch():
+    """Validate many payloads in one request; errors map each invalid field to an error code"""
+    try:
+        try:
+            data = request.get_json(force=True)
+        except Exception as json_err:
+            return jsonify({"error": f"Invalid JSON format: {str(json_err)}"}), 400
+
+        # Accept either a bare array or {"products": [...]}
+        products = data.get('products') if isinstance(data, dict) else data
+        if not isinstance(products, list) or not products:
+            return jsonify({"error": "Expected a non-empty array of products"}), 400
+        if len(products) > Config.VALIDATE_BATCH_MAX_ITEMS:
+            return jsonify({
+                "error": f"Batch too large: {len(products)} items (max {Config.VALIDATE_BATCH_MAX_ITEMS})"
+            }), 413
+
+        results = []
+        valid = 0
+        with STAGE_SECONDS.time(stage='validation'):
+            for index, product in enumerate(products):
+                _, is_valid, errors = validate_product(product)
+                valid += is_valid
+                results.append({"index": index, "is_valid": is_valid, "errors": errors})
+
+        return json_response({
+            "summary": {"total": len(products), "valid": valid, "invalid": len(products) - valid},
+            "results": results,
+        })
+
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+@api.route('/evaluate', methods=['POST'])
 def evaluate_generated_description():
     """Endpoint for evaluating generated descriptions"""
     try:
@@ -205,14 +532,107 @@ def evaluate_generated_description():
     except Exception as e:
         return jsonify({"error": f"Evaluation failed: {str(e)}"}), 500
 
-@app.route('/health', methods=['GET'])
+@api.route('/evaluate/batch', methods=['POST'])
+def evaluate_batch_descriptions():
+    """Score many input/output pairs against the full rubric in one request"""
+    try:
+        try:
+            data = request.get_json(force=True)
+        except Exception as json_err:
+            return jsonify({"error": f"Invalid JSON format: {str(json_err)}"}), 400
+
+        # Accept either a bare array or {"items": [...]} of {"input_data", "generated_output"} objects
+        items = data.get('items') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "Expected a non-empty array of items"}), 400
+        if len(items) > Config.EVALUATE_BATCH_MAX_ITEMS:
+            return jsonify({
+                "error": f"Batch too large: {len(items)} items (max {Config.EVALUATE_BATCH_MAX_ITEMS})"
+            }), 413
+
+        pairs = [
+            (item.get('input_data'), item.get('generated_output')) if isinstance(item, dict) else item
+            for item in items
+        ]
+        with STAGE_SECONDS.time(stage='evaluation'):
+            results, summary = evaluate_batch(pairs)
+        return json_response({"summary": summary, "results": results})
+
+    except Exception as e:
+        return jsonify({"error": f"Evaluation failed: {str(e)}"}), 500
+
+@api.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (liveness); never touches the model client"""
+    breaker_state = circuit_breaker.state
     return jsonify({
-        "status": "healthy",
+        "status": "degraded" if breaker_state != circuit_breaker.CLOSED else "healthy",
         "timestamp": time.time(),
-        "gemini_configured": bool(Config.GEMINI_API_KEY)
+        "gemini_configured": bool(Config.GEMINI_API_KEY),
+        "circuit_breaker": circuit_breaker.stats(),
+        "admission": admission_controller.stats()
     }), 200
 
+@api.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 503 until the optional start-up warm-up has built the model client"""
+    warm_up = warm_up_status()
+    ready = warm_up['status'] in ('idle', 'done')
+    return jsonify({
+        "ready": ready,
+        "warm_up": warm_up,
+        "backend": backend_stats()
+    }), 200 if ready else 503
+
+@api.route('/stats', methods=['GET'])
+def stats():
+    """Runtime counters for the generation pipeline"""
+    return jsonify({
+        "cache": response_cache.stats() if response_cache is not None else {"enabled": False},
+        "retries": retry_policy.stats(),
+        "circuit_breaker": circuit_breaker.stats(),
+        "admission": admission_controller.stats(),
+        "hedging": hedge_stats(),
+        "repairs": repair_stats(),
+        "prompts": templates.stats(),
+        "jobs": job_manager.stats(),
+        "records": record_manager.stats(),
+        "coalescing": single_flight.stats(),
+        "rate_limiter": rate_limiter.stats() if rate_limiter is not None else {"enabled": False},
+        "semantic_cache": semantic_cache.stats() if semantic_cache is not None else {"enabled": False},
+        "models": model_router.stats(),
+        "backend": backend_stats()
+    }), 200
+
+@api.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint"""
+    return current_app.response_class(
+        response=REGISTRY.render(),
+        status=200,
+        mimetype='text/plain; version=0.0.4'
+    )
+
+def create_app(warm_up=None):
+    """Application factory.
+
+    The model client is built lazily on the first generation. With warm_up
+    (default Config.WARM_UP_ON_START) it is built on a background thread
+    right away instead, and /ready answers 503 until that has finished.
+    Unfinished jobs from a previous process (JOBS_DB_PATH) are re-queued on
+    a background thread too, so neither delays start-up.
+    """
+    setup_logging(Config.LOG_LEVEL)
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.register_blueprint(api)
+    if Config.WARM_UP_ON_START if warm_up is None else warm_up:
+        start_warm_up()
+    if job_manager.store is not None:
+        threading.Thread(target=job_manager.recover, name='job-recovery', daemon=True).start()
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
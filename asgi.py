@@ -0,0 +1,278 @@
+"""ASGI entry point.
+
+The generation routes are served natively, without a worker thread per
+request, so one process can hold hundreds of Gemini calls in flight. Their
+generations run on the shared generation loop (services.generation), the
+same loop the Flask routes and job workers use, since model clients are
+bound to the event loop that first uses them. Every other route is
+delegated to the Flask app through asgiref's WSGI adapter.
+
+Run with:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import json
+import logging
+import time
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import GENERATION_ERRORS, generation_error, timing_headers, app as flask_app
+from config import Config
+from prompts.prompt_templates import OUTPUT_MODES
+from services.generation import (
+    clean_product,
+    generate_batch_async,
+    generate_description_async,
+    model_router,
+    run_on_generation_loop,
+    stream_description_async,
+    stream_on_generation_loop,
+)
+from services.jobs import job_manager
+from utils.json_stream import format_stream_event, stream_format_for
+from utils.metrics import REQUEST_SECONDS, REQUESTS_IN_FLIGHT, STAGE_SECONDS
+from utils.timing import Deadline, ServerTiming
+from utils.validators import validate_and_mark_invalid_fields
+
+logger = logging.getLogger(__name__)
+
+_wsgi_app = WsgiToAsgi(flask_app)
+
+
+async def _read_json(receive):
+    """Read the full request body and decode it as JSON"""
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    with STAGE_SECONDS.time(stage='json_parse'):
+        return json.loads(body) if body else None
+
+
+async def _send_json(send, payload, status=200, headers=None):
+    with STAGE_SECONDS.time(stage='serialization'):
+        body = json.dumps(payload).encode('utf-8')
+    raw_headers = [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode('ascii')),
+    ]
+    for name, value in (headers or {}).items():
+        raw_headers.append((name.lower().encode('latin-1'), value.encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _cache_bypass_requested(scope):
+    """True when the client sent Cache-Control: no-cache (or Pragma: no-cache)"""
+    headers = dict(scope.get('headers') or [])
+    cache_control = headers.get(b'cache-control', b'').decode('latin-1').lower()
+    pragma = headers.get(b'pragma', b'').decode('latin-1').lower()
+    return 'no-cache' in cache_control or 'no-cache' in pragma
+
+
+def _output_mode_requested(scope):
+    """Output mode from ?output_mode= (None means Config.OUTPUT_MODE); ValueError if unknown"""
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    output_mode = query.get('output_mode', [None])[0]
+    if output_mode is not None and output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output_mode: {output_mode} (expected one of {', '.join(OUTPUT_MODES)})")
+    return output_mode
+
+
+def _stream_format_requested(scope):
+    """'ndjson' when asked for via ?format=ndjson or the Accept header, else 'sse'"""
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    headers = dict(scope.get('headers') or [])
+    return stream_format_for(query.get('format', [None])[0], headers.get(b'accept', b'').decode('latin-1'))
+
+
+def _model_hint_requested(scope):
+    """Model hint from ?model= (None lets the router decide); ValueError if unknown"""
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    model_hint = query.get('model', [None])[0]
+    if model_hint is not None:
+        model_router.resolve_hint(model_hint)
+    return model_hint
+
+
+async def generate_description(scope, receive, send):
+    """Async counterpart of app.generate_description"""
+    start_time = time.monotonic()
+    deadline = Deadline(Config.MAX_RESPONSE_TIME, started=start_time)
+    timings = ServerTiming()
+
+    try:
+        try:
+            output_mode = _output_mode_requested(scope)
+            model_hint = _model_hint_requested(scope)
+        except ValueError as e:
+            return await _send_json(send, {"error": str(e)}, 400)
+
+        try:
+            data = await _read_json(receive)
+        except ValueError as json_err:
+            return await _send_json(send, {"error": f"Invalid JSON format: {str(json_err)}"}, 400)
+
+        if not data:
+            return await _send_json(send, {"error": "No JSON data provided"}, 400)
+
+        with timings.measure('validation'), STAGE_SECONDS.time(stage='validation'):
+            validated_data, has_valid_required_data = validate_and_mark_invalid_fields(data)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("generate-description input", extra={
+                "input": data, "validated": validated_data, "valid": has_valid_required_data
+            })
+
+        if not has_valid_required_data:
+            return await _send_json(send, validated_data, 400)
+
+        try:
+            final_output, cache_status = await run_on_generation_loop(generate_description_async(
+                clean_product(validated_data), bypass_cache=_cache_bypass_requested(scope),
+                deadline=deadline, timings=timings, output_mode=output_mode, model_hint=model_hint
+            ))
+        except GENERATION_ERRORS as e:
+            status, payload, headers = generation_error(e)
+            return await _send_json(send, payload, status, headers=timing_headers(timings, start_time, headers))
+
+        await _send_json(send, final_output, headers=timing_headers(timings, start_time, {"X-Cache": cache_status}))
+
+    except Exception as e:
+        await _send_json(send, {"error": f"Internal server error: {str(e)}"}, 500)
+
+
+async def generate_description_stream(scope, receive, send):
+    """Async counterpart of app.generate_description_stream"""
+    started = False
+    try:
+        try:
+            output_mode = _output_mode_requested(scope)
+            model_hint = _model_hint_requested(scope)
+        except ValueError as e:
+            return await _send_json(send, {"error": str(e)}, 400)
+
+        try:
+            data = await _read_json(receive)
+        except ValueError as json_err:
+            return await _send_json(send, {"error": f"Invalid JSON format: {str(json_err)}"}, 400)
+
+        if not data:
+            return await _send_json(send, {"error": "No JSON data provided"}, 400)
+
+        with STAGE_SECONDS.time(stage='validation'):
+            validated_data, has_valid_required_data = validate_and_mark_invalid_fields(data)
+        if not has_valid_required_data:
+            return await _send_json(send, validated_data, 400)
+
+        stream_format = _stream_format_requested(scope)
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'application/x-ndjson' if stream_format == 'ndjson' else b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+            ],
+        })
+        started = True
+        async for event in stream_on_generation_loop(stream_description_async(
+            clean_product(validated_data), bypass_cache=_cache_bypass_requested(scope), output_mode=output_mode,
+            model_hint=model_hint,
+        )):
+            body = format_stream_event(event, stream_format).encode('utf-8')
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    except Exception as e:
+        # Once the stream has started, its status is sent; the server closes the connection
+        if started:
+            raise
+        await _send_json(send, {"error": f"Internal server error: {str(e)}"}, 500)
+
+
+async def generate_descriptions_batch(scope, receive, send):
+    """Async counterpart of app.generate_descriptions_batch"""
+    try:
+        try:
+            output_mode = _output_mode_requested(scope)
+            model_hint = _model_hint_requested(scope)
+        except ValueError as e:
+            return await _send_json(send, {"error": str(e)}, 400)
+
+        try:
+            data = await _read_json(receive)
+        except ValueError as json_err:
+            return await _send_json(send, {"error": f"Invalid JSON format: {str(json_err)}"}, 400)
+
+        products = data.get('products') if isinstance(data, dict) else data
+        if not isinstance(products, list) or not products:
+            return await _send_json(send, {"error": "Expected a non-empty array of products"}, 400)
+        if len(products) > Config.BATCH_MAX_ITEMS:
+            return await _send_json(
+                send, {"error": f"Batch too large: {len(products)} items (max {Config.BATCH_MAX_ITEMS})"}, 413
+            )
+
+        batch_result = await run_on_generation_loop(generate_batch_async(
+            products, bypass_cache=_cache_bypass_requested(scope), output_mode=output_mode,
+            model_hint=model_hint,
+        ))
+        await _send_json(send, batch_result)
+
+    except Exception as e:
+        await _send_json(send, {"error": f"Internal server error: {str(e)}"}, 500)
+
+
+ASYNC_ROUTES = {
+    ('POST', '/generate-description'): generate_description,
+    ('POST', '/generate-description/stream'): generate_description_stream,
+    ('POST', '/generate-descriptions/batch'): generate_descriptions_batch,
+}
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            # Job callbacks run on the generation loop; let the ones in progress finish
+            await asyncio.get_running_loop().run_in_executor(
+                None, job_manager.shutdown, Config.JOBS_SHUTDOWN_GRACE_SECONDS
+            )
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI callable: async generation routes, everything else via Flask"""
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    handler = None
+    if scope['type'] == 'http':
+        handler = ASYNC_ROUTES.get((scope['method'], scope['path']))
+    if handler is None:
+        # Flask's own request hooks record metrics for these routes
+        return await _wsgi_app(scope, receive, send)
+
+    endpoint = scope['path']
+    status = {'code': 500}
+
+    async def send_with_status(message):
+        if message['type'] == 'http.response.start':
+            status['code'] = message['status']
+        await send(message)
+
+    started = time.perf_counter()
+    with REQUESTS_IN_FLIGHT.track_inprogress(endpoint=endpoint):
+        try:
+            await handler(scope, receive, send_with_status)
+        finally:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started, endpoint=endpoint, status=str(status['code'])
+            )
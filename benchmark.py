@@ -0,0 +1,224 @@
+"""Load-test harness for the description endpoints.
+
+Drives either a running server (--url) or the Flask app in-process, at a
+fixed concurrency (closed loop) or a fixed request rate (open loop), and
+prints one JSON report: throughput, latency percentiles, status codes and
+an error breakdown. In-process runs default to the fake model backend so
+results measure this service rather than Gemini; tune it with the FAKE_*
+settings in config.py.
+
+Usage:
+    python benchmark.py --requests 500 --concurrency 32
+    python benchmark.py --rps 50 --duration 30 --error-rate 0.05
+    python benchmark.py --url http://localhost:5000 --concurrency 8 --requests 100
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests'))
+from test_cases import TEST_CASES  # noqa: E402
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def make_sender(url, endpoint, use_cache, output_mode=None):
+    """Return send(payload) -> (status_code, error_label or None)"""
+    headers = {} if use_cache else {'Cache-Control': 'no-cache'}
+    if output_mode:
+        endpoint += f"?output_mode={output_mode}"
+
+    if url:
+        import requests
+
+        session_local = threading.local()
+
+        def send(payload):
+            session = getattr(session_local, 'session', None)
+            if session is None:
+                session = session_local.session = requests.Session()
+            try:
+                response = session.post(url.rstrip('/') + endpoint, json=payload, headers=headers, timeout=60)
+            except requests.RequestException as e:
+                return None, type(e).__name__
+            return response.status_code, _error_label(response.status_code, response.text)
+        return send, None
+
+    import app as app_module
+
+    client = app_module.app.test_client()
+
+    def send(payload):
+        response = client.post(endpoint, json=payload, headers=headers)
+        return response.status_code, _error_label(response.status_code, response.get_data(as_text=True))
+    return send, app_module
+
+
+def _error_label(status, body):
+    if status == 200:
+        return None
+    try:
+        message = json.loads(body).get('error', '')
+    except (ValueError, AttributeError):
+        message = body
+    # Keep labels coarse so the breakdown groups similar failures
+    return f"{status}: {str(message)[:80]}"
+
+
+def run(send, payloads, total, concurrency, rps, duration):
+    """Issue requests and return (latencies, statuses, errors, wall_seconds)"""
+    latencies = []
+    statuses = Counter()
+    errors = Counter()
+    lock = threading.Lock()
+
+    def one(payload, scheduled):
+        status, error = send(payload)
+        # Measured from the scheduled start so open-loop queueing delay is not hidden
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] += 1
+            if error:
+                errors[error] += 1
+
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+
+    if rps:
+        interval = 1.0 / rps
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for i, payload in enumerate(payloads):
+                if total and i >= total:
+                    break
+                scheduled = started + i * interval
+                if deadline and scheduled >= deadline:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(one, payload, scheduled)
+    else:
+        issued = itertools.count()
+        payload_lock = threading.Lock()
+
+        def worker():
+            while True:
+                with payload_lock:
+                    index = next(issued)
+                    payload = next(payloads)
+                if (total and index >= total) or (deadline and time.perf_counter() >= deadline):
+                    return
+                one(payload, time.perf_counter())
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    return latencies, statuses, errors, time.perf_counter() - started
+
+
+def build_report(args, latencies, statuses, errors, wall_seconds, backend):
+    ordered = sorted(latencies)
+    succeeded = statuses.get('200', 0)
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        'target': args.url or 'in-process',
+        'endpoint': args.endpoint,
+        'output_mode': args.output_mode or 'default',
+        'mode': f"open-loop {args.rps} rps" if args.rps else f"closed-loop x{args.concurrency}",
+        'backend': backend,
+        'requests': len(latencies),
+        'succeeded': succeeded,
+        'wall_seconds': round(wall_seconds, 3),
+        'throughput_rps': round(len(latencies) / wall_seconds, 2) if wall_seconds else 0.0,
+        'success_rps': round(succeeded / wall_seconds, 2) if wall_seconds else 0.0,
+        'latency_ms': {
+            'mean': ms(sum(ordered) / len(ordered)) if ordered else None,
+            'p50': ms(percentile(ordered, 50)),
+            'p95': ms(percentile(ordered, 95)),
+            'p99': ms(percentile(ordered, 99)),
+            'max': ms(ordered[-1]) if ordered else None,
+        },
+        'status_codes': dict(sorted(statuses.items())),
+        'errors': dict(errors.most_common()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Base URL of a running server; omit to run the app in-process')
+    parser.add_argument('--endpoint', default='/generate-description')
+    parser.add_argument('--requests', type=int, default=200, help='Total requests (0 = until --duration)')
+    parser.add_argument('--duration', type=float, default=0, help='Stop after this many seconds')
+    parser.add_argument('--concurrency', type=int, default=16, help='Workers (closed loop) or max outstanding (open loop)')
+    parser.add_argument('--rps', type=float, default=0, help='Open-loop request rate instead of closed-loop workers')
+    parser.add_argument('--output-mode', choices=('text', 'structured'), help='Send ?output_mode= (default: server config)')
+    parser.add_argument('--use-cache', action='store_true', help='Allow response cache hits (default sends no-cache)')
+    parser.add_argument('--latency', choices=('fixed', 'uniform', 'lognormal'), help='Fake backend latency distribution')
+    parser.add_argument('--latency-ms', type=float, help='Fake backend mean/median latency')
+    parser.add_argument('--latency-spread', type=float, help='Fake backend spread (ms for uniform, sigma for lognormal)')
+    parser.add_argument('--error-rate', type=float, help='Fake backend error probability')
+    parser.add_argument('--malformed-rate', type=float, help='Fake backend malformed-JSON probability')
+    parser.add_argument('--seed', type=int, help='Fake backend RNG seed')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args(argv)
+
+    if not args.requests and not args.duration:
+        parser.error('give --requests, --duration or both')
+
+    if not args.url:
+        # Config reads the environment at import time, so set these before importing the app
+        overrides = {
+            'MODEL_BACKEND': os.environ.get('MODEL_BACKEND', 'fake'),
+            'FAKE_LATENCY_DISTRIBUTION': args.latency,
+            'FAKE_LATENCY_MEAN_MS': args.latency_ms,
+            'FAKE_LATENCY_SPREAD': args.latency_spread,
+            'FAKE_ERROR_RATE': args.error_rate,
+            'FAKE_MALFORMED_RATE': args.malformed_rate,
+            'FAKE_SEED': args.seed,
+        }
+        for key, value in overrides.items():
+            if value is not None:
+                os.environ[key] = str(value)
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    send, app_module = make_sender(args.url, args.endpoint, args.use_cache, args.output_mode)
+
+    latencies, statuses, errors, wall_seconds = run(
+        send, itertools.cycle(TEST_CASES), args.requests, args.concurrency, args.rps, args.duration)
+    backend = None
+    if app_module:
+        from services.generation import get_model
+
+        # The model client is built lazily; build it (if no request did) so its settings are reported
+        get_model()
+        backend = app_module.backend_stats()
+    report = build_report(args, latencies, statuses, errors, wall_seconds, backend)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
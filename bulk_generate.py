@@ -0,0 +1,188 @@
+"""Offline bulk generation from a JSONL file of product payloads.
+
+Each input line is one product JSON object. Results are streamed to an
+output JSONL file (one record per input line, in completion order) and every
+finished line number is appended to a checkpoint file, so an interrupted run
+can be restarted with the same arguments and only the remaining lines are
+sent to Gemini. With --retry-failed, lines whose last attempt failed are run
+again and their earlier records are then dropped from the output, so it
+still holds one record per input line.
+
+Usage:
+    python bulk_generate.py products.jsonl results.jsonl --workers 8
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from tqdm import tqdm
+
+from services.generation import GenerationError, clean_product, generate_for_product
+from utils.circuit_breaker import RejectedError
+from utils.validators import validate_and_mark_invalid_fields
+
+
+def load_checkpoint(path, retry_failed=False):
+    """Return the set of line numbers already processed according to the checkpoint"""
+    done = {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            for raw in f:
+                raw = raw.strip()
+                if not raw:
+                    continue
+                try:
+                    entry = json.loads(raw)
+                except ValueError:
+                    # A torn final write from a killed run; that line simply re-runs
+                    continue
+                done[entry['line']] = entry['status']
+    except FileNotFoundError:
+        pass
+
+    if retry_failed:
+        return {line for line, status in done.items() if status not in ('error', 'rejected')}
+    return set(done)
+
+
+def iter_pending(input_path, done):
+    """Yield (line_number, raw_line) for input lines not yet in the checkpoint"""
+    with open(input_path, encoding='utf-8') as f:
+        for line_number, raw in enumerate(f, 1):
+            if line_number in done or not raw.strip():
+                continue
+            yield line_number, raw
+
+
+def process_line(line_number, raw):
+    """Run the full validation -> generation pipeline for one input line"""
+    record = {"line": line_number}
+    try:
+        product = json.loads(raw)
+    except ValueError as e:
+        record.update(status="invalid_json", error=f"Invalid JSON format: {str(e)}")
+        return record
+
+    if not isinstance(product, dict):
+        record.update(status="invalid_input", error="Product must be a JSON object")
+        return record
+    if 'id' in product:
+        record["id"] = product['id']
+
+    validated_data, has_valid_required_data = validate_and_mark_invalid_fields(product)
+    if not has_valid_required_data:
+        record.update(status="invalid_input", input_validation=validated_data)
+        return record
+
+    clean_data = clean_product(validated_data)
+    try:
+        final_output, cache_status = generate_for_product(clean_data)
+        record.update(status="ok", cache=cache_status, output=final_output)
+    except RejectedError as e:
+        record.update(status="rejected", error=str(e))
+    except GenerationError as e:
+        record.update(status="error", error=str(e))
+    except Exception as e:
+        record.update(status="error", error=f"Internal server error: {str(e)}")
+    return record
+
+
+def compact_output(output_path, rerun_lines, rerun_offset):
+    """Drop the records of rerun_lines written before byte offset rerun_offset (their earlier attempts).
+
+    Streams the file into a temporary copy and swaps it in, so memory stays
+    flat; only the set of re-run line numbers is held.
+    """
+    temp_path = f"{output_path}.compacting"
+    with open(output_path, 'rb') as src, open(temp_path, 'wb') as dst:
+        for raw in src:
+            if src.tell() <= rerun_offset:
+                try:
+                    if json.loads(raw)['line'] in rerun_lines:
+                        continue
+                except (ValueError, KeyError, TypeError):
+                    pass  # a torn write from a killed run is left as it was
+            dst.write(raw)
+    os.replace(temp_path, output_path)
+
+
+def open_for_append(path):
+    """Open a JSONL file for appending, first ending a line torn by a killed run.
+
+    Without the newline the first new record would be glued onto the torn
+    one and lost with it.
+    """
+    try:
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            torn = f.read(1) != b'\n'
+    except OSError:
+        torn = False  # missing or empty
+    f = open(path, 'a', encoding='utf-8')
+    if torn:
+        f.write('\n')
+    return f
+
+
+def run(input_path, output_path, checkpoint_path, workers, retry_failed=False):
+    """Stream input_path through a bounded worker pool; returns per-status counts"""
+    done = load_checkpoint(checkpoint_path, retry_failed=retry_failed)
+    # Lines that already have a (failed) record in the output and are about to get another
+    rerun_lines = load_checkpoint(checkpoint_path) - done if retry_failed else set()
+    rerun_offset = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+    counts = {}
+    # Keep only a small window of lines in flight so memory stays flat on huge inputs
+    max_in_flight = workers * 2
+
+    with open_for_append(output_path) as out, \
+            open_for_append(checkpoint_path) as checkpoint, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bulk-generate') as pool, \
+            tqdm(desc='products', unit='item', file=sys.stderr, initial=len(done)) as progress:
+
+        def drain(in_flight, return_when):
+            finished, pending = wait(in_flight, return_when=return_when)
+            for future in finished:
+                record = future.result()
+                # Output first, then checkpoint: a crash in between re-runs the line
+                # rather than losing its result
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                out.flush()
+                checkpoint.write(json.dumps({"line": record["line"], "status": record["status"]}) + '\n')
+                checkpoint.flush()
+                counts[record["status"]] = counts.get(record["status"], 0) + 1
+                progress.update(1)
+            return pending
+
+        in_flight = set()
+        for line_number, raw in iter_pending(input_path, done):
+            in_flight.add(pool.submit(process_line, line_number, raw))
+            if len(in_flight) >= max_in_flight:
+                in_flight = drain(in_flight, FIRST_COMPLETED)
+        while in_flight:
+            in_flight = drain(in_flight, FIRST_COMPLETED)
+
+    if rerun_lines:
+        compact_output(output_path, rerun_lines, rerun_offset)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-generate product descriptions from a JSONL file")
+    parser.add_argument('input', help="JSONL file with one product payload per line")
+    parser.add_argument('output', help="JSONL file results are appended to")
+    parser.add_argument('--checkpoint', help="checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument('--workers', type=int, default=8, help="concurrent Gemini calls (default: 8)")
+    parser.add_argument('--retry-failed', action='store_true',
+                        help="re-run lines whose previous attempt failed or was rejected")
+    args = parser.parse_args(argv)
+
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+    counts = run(args.input, args.output, checkpoint_path, args.workers, retry_failed=args.retry_failed)
+    print(json.dumps(counts), file=sys.stderr)
+    return 0 if not (counts.get('error') or counts.get('rejected')) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -6,4 +7,125 @@ load_dotenv()
 class Config:
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
     FLASK_ENV = os.getenv('FLASK_ENV', 'development')
-    MAX_RESPONSE_TIME = 5 
\ No newline at end of file
+    MAX_RESPONSE_TIME = float(os.getenv('MAX_RESPONSE_TIME', '5'))  # end-to-end deadline in seconds
+
+    # Model backend: 'gemini' or 'fake' (deterministic local stand-in, see services/model_backends.py)
+    MODEL_BACKEND = os.getenv('MODEL_BACKEND', 'gemini')
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash')
+    # Model pool and routing (see services/model_router.py); the pool defaults to GEMINI_MODEL alone.
+    # MODEL_ROUTES: {"hint": {"fast": model}, "category": {"Electronics": model}, "tier": {"luxury": model}}
+    # MODEL_COSTS: {model: [USD per 1M input tokens, USD per 1M output tokens]} on top of the built-in prices
+    MODEL_POOL = [name.strip() for name in os.getenv('MODEL_POOL', '').split(',') if name.strip()]
+    MODEL_ROUTES = json.loads(os.getenv('MODEL_ROUTES') or '{}')
+    MODEL_COSTS = json.loads(os.getenv('MODEL_COSTS') or '{}')
+    MODEL_EWMA_ALPHA = float(os.getenv('MODEL_EWMA_ALPHA', '0.2'))
+    MODEL_MAX_ERROR_RATE = float(os.getenv('MODEL_MAX_ERROR_RATE', '0.5'))  # error EWMA above this demotes a model
+    MODEL_MAX_LATENCY_SECONDS = float(os.getenv('MODEL_MAX_LATENCY_SECONDS', '3.0'))  # latency EWMA limit; 0 = none
+    MODEL_PROBE_RATIO = float(os.getenv('MODEL_PROBE_RATIO', '0.05'))  # share still sent to a demoted model
+    # Build the model client in the background at start-up instead of on the first generation (/ready waits for it)
+    WARM_UP_ON_START = os.getenv('WARM_UP_ON_START', 'false').lower() == 'true'
+    FAKE_LATENCY_DISTRIBUTION = os.getenv('FAKE_LATENCY_DISTRIBUTION', 'lognormal')  # fixed, uniform or lognormal
+    FAKE_LATENCY_MEAN_MS = float(os.getenv('FAKE_LATENCY_MEAN_MS', '800'))
+    FAKE_LATENCY_SPREAD = float(os.getenv('FAKE_LATENCY_SPREAD', '0.5'))  # +/- ms for uniform, sigma for lognormal
+    FAKE_ERROR_RATE = float(os.getenv('FAKE_ERROR_RATE', '0'))
+    FAKE_MALFORMED_RATE = float(os.getenv('FAKE_MALFORMED_RATE', '0'))
+    FAKE_SEED = int(os.getenv('FAKE_SEED', '0'))
+
+    # Response cache
+    CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'true').lower() == 'true'
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '1024'))
+    CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', '3600'))
+    CACHE_DB_PATH = os.getenv('CACHE_DB_PATH')  # optional SQLite file for a persistent tier
+    CACHE_DISK_TTL_SECONDS = int(os.getenv('CACHE_DISK_TTL_SECONDS', '604800'))
+
+    # Share one generation between identical requests that are in flight at the same time
+    COALESCE_ENABLED = os.getenv('COALESCE_ENABLED', 'true').lower() == 'true'
+
+    # Near-duplicate (variant) cache: a product with the same features and a name this similar (0-1, Jaccard
+    # similarity of character 3-shingles, see utils/semantic_cache.py) reuses a generation with the name and
+    # price patched
+    SEMANTIC_CACHE_ENABLED = os.getenv('SEMANTIC_CACHE_ENABLED', 'false').lower() == 'true'
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.6'))
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '10000'))
+    SEMANTIC_CACHE_NUM_PERM = int(os.getenv('SEMANTIC_CACHE_NUM_PERM', '64'))  # MinHash signature length
+    SEMANTIC_CACHE_BANDS = int(os.getenv('SEMANTIC_CACHE_BANDS', '16'))  # LSH bands; must divide NUM_PERM
+
+    # Batch generation
+    BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '500'))
+    BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', '8'))
+    # /validate-input/batch does no generation, so it takes far larger batches
+    VALIDATE_BATCH_MAX_ITEMS = int(os.getenv('VALIDATE_BATCH_MAX_ITEMS', '50000'))
+    EVALUATE_BATCH_MAX_ITEMS = int(os.getenv('EVALUATE_BATCH_MAX_ITEMS', '100000'))
+
+    # Multi-variant generation (POST /generate-description/variants): locale/tone/audience
+    # targets of one product, VARIANTS_PER_CALL of them per combined Gemini call
+    VARIANTS_MAX_ITEMS = int(os.getenv('VARIANTS_MAX_ITEMS', '12'))
+    VARIANTS_PER_CALL = int(os.getenv('VARIANTS_PER_CALL', '4'))
+
+    # Background job queue (POST /jobs, GET /jobs/<id>)
+    JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', '8'))  # keep below MAX_IN_FLIGHT_GENERATIONS
+    JOBS_MAX_QUEUED = int(os.getenv('JOBS_MAX_QUEUED', '10000'))
+    JOBS_DB_PATH = os.getenv('JOBS_DB_PATH')  # optional SQLite file; queued jobs survive restarts
+    JOBS_RESULT_TTL_SECONDS = int(os.getenv('JOBS_RESULT_TTL_SECONDS', '86400'))
+    JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', '5'))  # re-queues after load shedding
+    JOBS_TIMEOUT_SECONDS = float(os.getenv('JOBS_TIMEOUT_SECONDS', '120'))
+    JOBS_CALLBACK_TIMEOUT_SECONDS = float(os.getenv('JOBS_CALLBACK_TIMEOUT_SECONDS', '10'))
+    JOBS_CALLBACK_ATTEMPTS = int(os.getenv('JOBS_CALLBACK_ATTEMPTS', '3'))
+    # How long shutdown waits for callbacks still being delivered
+    JOBS_SHUTDOWN_GRACE_SECONDS = float(os.getenv('JOBS_SHUTDOWN_GRACE_SECONDS', '30'))
+    # Callback hosts must resolve to public addresses unless JOBS_CALLBACK_ALLOW_PRIVATE (local development);
+    # JOBS_CALLBACK_ALLOWED_HOSTS (comma-separated, subdomains included) further restricts them
+    JOBS_CALLBACK_ALLOW_PRIVATE = os.getenv('JOBS_CALLBACK_ALLOW_PRIVATE', 'false').lower() == 'true'
+    JOBS_CALLBACK_ALLOWED_HOSTS = [host.strip().rstrip('.').casefold()
+                                   for host in os.getenv('JOBS_CALLBACK_ALLOWED_HOSTS', '').split(',') if host.strip()]
+    JOBS_MAX_FINISHED = int(os.getenv('JOBS_MAX_FINISHED', '10000'))  # finished job records kept in memory
+
+    # Generation records per product id (PUT /products/<id>/description regenerates only what an edit affects)
+    RECORDS_MAX_ENTRIES = int(os.getenv('RECORDS_MAX_ENTRIES', '100000'))
+    RECORDS_DB_PATH = os.getenv('RECORDS_DB_PATH')  # optional SQLite file; records survive restarts
+
+    # Gemini retry policy
+    RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', '3'))
+    RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '0.5'))
+    # Longest backoff; a 429 asking for a longer wait fails at once with that Retry-After instead
+    RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '8'))
+    RETRY_BUDGET_RATIO = float(os.getenv('RETRY_BUDGET_RATIO', '0.2'))
+    RETRY_BUDGET_MIN_RETRIES = int(os.getenv('RETRY_BUDGET_MIN_RETRIES', '10'))
+    RETRY_BUDGET_WINDOW_SECONDS = float(os.getenv('RETRY_BUDGET_WINDOW_SECONDS', '10'))
+
+    # Client-side Gemini quota (0 disables a limit); calls are paced to stay under
+    # limit * RATE_LIMIT_HEADROOM. Set RATE_LIMIT_STATE_PATH to share the budget between processes
+    RATE_LIMIT_RPM = int(os.getenv('RATE_LIMIT_RPM', '0'))
+    RATE_LIMIT_TPM = int(os.getenv('RATE_LIMIT_TPM', '0'))
+    RATE_LIMIT_HEADROOM = float(os.getenv('RATE_LIMIT_HEADROOM', '0.9'))
+    RATE_LIMIT_EXPECTED_OUTPUT_TOKENS = int(os.getenv('RATE_LIMIT_EXPECTED_OUTPUT_TOKENS', '400'))
+    RATE_LIMIT_STATE_PATH = os.getenv('RATE_LIMIT_STATE_PATH')
+
+    # Circuit breaker and load shedding in front of Gemini
+    BREAKER_WINDOW_SIZE = int(os.getenv('BREAKER_WINDOW_SIZE', '20'))
+    BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', '10'))
+    BREAKER_FAILURE_RATE = float(os.getenv('BREAKER_FAILURE_RATE', '0.5'))
+    BREAKER_SLOW_CALL_SECONDS = float(os.getenv('BREAKER_SLOW_CALL_SECONDS', '10'))
+    BREAKER_SLOW_CALL_RATE = float(os.getenv('BREAKER_SLOW_CALL_RATE', '0.8'))
+    BREAKER_OPEN_SECONDS = float(os.getenv('BREAKER_OPEN_SECONDS', '30'))
+    BREAKER_HALF_OPEN_CALLS = int(os.getenv('BREAKER_HALF_OPEN_CALLS', '3'))
+    MAX_IN_FLIGHT_GENERATIONS = int(os.getenv('MAX_IN_FLIGHT_GENERATIONS', '64'))
+
+    # Deadline propagation and hedged Gemini requests
+    MIN_ATTEMPT_SECONDS = float(os.getenv('MIN_ATTEMPT_SECONDS', '1.0'))  # don't start an attempt with less left
+    HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', 'false').lower() == 'true'
+    HEDGE_AFTER_SECONDS = float(os.getenv('HEDGE_AFTER_SECONDS', '3.0'))  # ~p95 Gemini latency
+
+    # Targeted repair of output that fails validate_output
+    MAX_REPAIR_ROUNDS = int(os.getenv('MAX_REPAIR_ROUNDS', '2'))
+
+    # Prompt template version used for new generations (see prompts/prompt_templates.py)
+    PROMPT_VERSION = os.getenv('PROMPT_VERSION', 'v2')
+
+    # Output mode: 'text' (JSON requested in the prompt, cleaned up afterwards) or
+    # 'structured' (Gemini response schema); overridable per request with ?output_mode=
+    OUTPUT_MODE = os.getenv('OUTPUT_MODE', 'text')
+    STRUCTURED_PROMPT_VERSION = os.getenv('STRUCTURED_PROMPT_VERSION', 'v2-structured')
+
+    # Logging (JSON lines on stderr, written from a background thread)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
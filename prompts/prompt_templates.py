@@ -1,55 +1,35 @@
-def get_product_description_prompt(product_data):
-    """
-    Generate a sophisticated prompt for product description generation
-    """
-    # Price positioning logic
-    price = product_data.get('price', 0)
-    if price < 1000:
-        price_category = "budget-friendly"
-    elif price < 10000:
-        price_category = "mid-range"
-    elif price < 50000:
-        price_category = "premium"
-    else:
-        price_category = "luxury"
-    
-    # Category-specific context
-    category_context = {
-        'smartphone': 'cutting-edge technology and connectivity',
-        'electronics': 'innovative features and performance',
-        'clothing': 'style, comfort, and quality',
-        'home': 'functionality and aesthetic appeal',
-        'beauty': 'enhancement and self-care',
-        'sports': 'performance and durability'
-    }
-    
-    category_lower = product_data.get('category', '').lower()
-    context = category_context.get(category_lower, 'quality and value')
-    
-    # Format features for the prompt
-    features_list = product_data.get('key_features', [])
-    features_str = ', '.join(features_list)
-    
-    prompt = f"""You are an expert e-commerce copywriter specializing in {product_data.get('category', 'products')}.
-Your task is to create compelling, conversion-focused product descriptions that drive sales.
+import json
 
-PRODUCT DETAILS:
-- Product Name: {product_data.get('product_name')}
-- Category: {product_data.get('category')}
-- Key Features: {features_str}
-- Price: ₹{product_data.get('price')} ({price_category})
-- Target Audience: {product_data.get('target_audience', 'general')}
-- Tone: {product_data.get('tone', 'professional')}
+from config import Config
+from prompts.template_engine import PromptTemplate, TemplateRegistry
 
-WRITING GUIDELINES:
-- Focus on {context}
-- Highlight value proposition for {price_category} segment
-- Use {product_data.get('tone', 'professional')} tone throughout
-- Appeal to {product_data.get('target_audience', 'general')} specifically
-- Include emotional triggers and benefits, not just features
+# Category-specific context
+CATEGORY_CONTEXT = {
+    'smartphone': 'cutting-edge technology and connectivity',
+    'electronics': 'innovative features and performance',
+    'clothing': 'style, comfort, and quality',
+    'home': 'functionality and aesthetic appeal',
+    'beauty': 'enhancement and self-care',
+    'sports': 'performance and durability'
+}
 
-EXAMPLE OUTPUT FORMAT:
-{{
+# Price positioning: (exclusive upper bound, tier); anything above is luxury
+PRICE_TIERS = (
+    (1000, "budget-friendly"),
+    (10000, "mid-range"),
+    (50000, "premium"),
+)
+
+
+def get_price_category(price):
+    """Price positioning tier used throughout the prompts"""
+    for upper_bound, tier in PRICE_TIERS:
+        if price < upper_bound:
+            return tier
+    return "luxury"
+
+
+EXAMPLE_OUTPUT = """{
   "short_description": "Samsung Galaxy S24 - Premium smartphone with 256GB storage and 50MP camera",
   "detailed_description": "Experience cutting-edge technology with the Samsung Galaxy S24. This premium smartphone delivers exceptional performance with its advanced processor and stunning camera system. Perfect for tech enthusiasts who demand the best.",
   "bullet_points": [
@@ -65,19 +45,354 @@ EXAMPLE OUTPUT FORMAT:
     "premium phone"
   ],
   "call_to_action": "Upgrade to premium technology - Order your Galaxy S24 today!"
-}}
+}"""
+
+
+def build_prompt_context(product_data):
+    """Every value substituted into a product prompt, computed once per render"""
+    category = product_data.get('category')
+    return {
+        'product_name': product_data.get('product_name'),
+        'category': category,
+        'category_or_products': product_data.get('category', 'products'),
+        'features': ', '.join(product_data.get('key_features', [])),
+        'price': product_data.get('price'),
+        'price_category': get_price_category(product_data.get('price', 0)),
+        'target_audience': product_data.get('target_audience', 'general'),
+        'tone': product_data.get('tone', 'professional'),
+        'context': CATEGORY_CONTEXT.get(product_data.get('category', '').lower(), 'quality and value'),
+    }
+
+
+# v1: the original single-block prompt, kept for A/B comparison and cache continuity
+PROMPT_V1 = PromptTemplate(
+    version="v1",
+    prefix="",
+    suffix="""You are an expert e-commerce copywriter specializing in {category_or_products}.
+Your task is to create compelling, conversion-focused product descriptions that drive sales.
+
+PRODUCT DETAILS:
+- Product Name: {product_name}
+- Category: {category}
+- Key Features: {features}
+- Price: ₹{price} ({price_category})
+- Target Audience: {target_audience}
+- Tone: {tone}
+
+WRITING GUIDELINES:
+- Focus on {context}
+- Highlight value proposition for {price_category} segment
+- Use {tone} tone throughout
+- Appeal to {target_audience} specifically
+- Include emotional triggers and benefits, not just features
+
+EXAMPLE OUTPUT FORMAT:
+""" + EXAMPLE_OUTPUT.replace('{', '{{').replace('}', '}}') + """
 
 CRITICAL REQUIREMENTS:
-- Mention ALL key features: {features_str}
+- Mention ALL key features: {features}
 - Short description: EXACTLY 20-50 words
 - Detailed description: EXACTLY 50-200 words
 - Bullet points: EXACTLY 3-5 items, each explaining the benefit of the feature
 - SEO keywords: Include product name and key features
 - Call to action: Create urgency and encourage purchase
 - Consider the {price_category} price point in positioning
-- Adapt language for {product_data.get('target_audience', 'general')} audience
-- Use {product_data.get('tone', 'professional')} tone consistently
+- Adapt language for {target_audience} audience
+- Use {tone} tone consistently
+
+Return ONLY valid JSON format with the exact structure shown above. No additional text before or after the JSON.""",
+    build_context=build_prompt_context,
+)
+
+# Per-product details shared by the v2 templates
+PROMPT_V2_SUFFIX = """PRODUCT DETAILS:
+- Product Name: {product_name}
+- Category: {category} (focus on {context})
+- Key Features: {features}
+- Price: ₹{price} ({price_category} segment)
+- Target Audience: {target_audience}
+- Tone: {tone}"""
+
+# v2: instructions and example hoisted into a static prefix shared by every
+# call; the per-product suffix states each value exactly once
+PROMPT_V2 = PromptTemplate(
+    version="v2",
+    prefix="""You are an expert e-commerce copywriter. Your task is to create compelling, conversion-focused product descriptions that drive sales.
+
+EXAMPLE OUTPUT FORMAT:
+""" + json.dumps(json.loads(EXAMPLE_OUTPUT), ensure_ascii=False) + """
+
+CRITICAL REQUIREMENTS:
+- Mention ALL key features listed under PRODUCT DETAILS
+- Short description: EXACTLY 20-50 words
+- Detailed description: EXACTLY 50-200 words
+- Bullet points: EXACTLY 3-5 items, each explaining the benefit of the feature
+- SEO keywords: Include product name and key features
+- Call to action: Create urgency and encourage purchase
+- Include emotional triggers and benefits, not just features
+- Position the product for its price segment, focus on its category focus, and use the given tone and target audience consistently in every field
+
+Return ONLY valid JSON format with the exact structure shown above. No additional text before or after the JSON.
+
+""",
+    suffix=PROMPT_V2_SUFFIX,
+    build_context=build_prompt_context,
+)
+
+# v2-structured: v2 for structured-output mode. The response schema pins the
+# JSON shape, so the example and format instructions are dropped
+PROMPT_V2_STRUCTURED = PromptTemplate(
+    version="v2-structured",
+    prefix="""You are an expert e-commerce copywriter. Your task is to create compelling, conversion-focused product descriptions that drive sales.
+
+CRITICAL REQUIREMENTS:
+- Mention ALL key features listed under PRODUCT DETAILS
+- Short description: EXACTLY 20-50 words
+- Detailed description: EXACTLY 50-200 words
+- Bullet points: EXACTLY 3-5 items, each explaining the benefit of the feature
+- SEO keywords: Include product name and key features
+- Call to action: Create urgency and encourage purchase
+- Include emotional triggers and benefits, not just features
+- Position the product for its price segment, focus on its category focus, and use the given tone and target audience consistently in every field
+
+""",
+    suffix=PROMPT_V2_SUFFIX,
+    build_context=build_prompt_context,
+)
+
+# Shared product details for the variants templates; tone and audience are per variant
+PROMPT_VARIANTS_SUFFIX = """PRODUCT DETAILS:
+- Product Name: {product_name}
+- Category: {category} (focus on {context})
+- Key Features: {features}
+- Price: ₹{price} ({price_category} segment)
+
+VARIANTS:
+{variants}"""
+
+_VARIANTS_REQUIREMENTS = """CRITICAL REQUIREMENTS (for every variant):
+- Mention ALL key features listed under PRODUCT DETAILS
+- Short description: EXACTLY 20-50 words
+- Detailed description: EXACTLY 50-200 words
+- Bullet points: EXACTLY 3-5 items, each explaining the benefit of the feature
+- SEO keywords: Include product name and key features, in the variant's language
+- Call to action: Create urgency and encourage purchase
+- Include emotional triggers and benefits, not just features
+- Write every field in the language of the variant's locale, keep the product name unchanged, position the product for its price segment and use the variant's tone and target audience consistently
+
+"""
+
+
+def build_variants_context(product_data):
+    """build_prompt_context plus one VARIANTS line per target; product_data['variants'] holds the targets"""
+    context = build_prompt_context(product_data)
+    context['variants'] = '\n'.join(
+        f"- {variant['id']}: locale {variant['locale']}, "
+        f"tone {variant.get('tone', context['tone'])}, "
+        f"target audience {variant.get('target_audience', context['target_audience'])}"
+        for variant in product_data['variants']
+    )
+    return context
+
+
+# v2-variants: several locale/tone/audience variants of one product in a single call,
+# so the instructions and product details are sent once instead of once per variant
+PROMPT_V2_VARIANTS = PromptTemplate(
+    version="v2-variants",
+    prefix="""You are an expert e-commerce copywriter. Your task is to create compelling, conversion-focused product descriptions that drive sales, for several storefronts at once: write one complete description for each variant listed under VARIANTS.
+
+EXAMPLE OUTPUT FORMAT (one variant):
+""" + json.dumps(json.loads(EXAMPLE_OUTPUT), ensure_ascii=False) + """
+
+""" + _VARIANTS_REQUIREMENTS + """Return ONLY valid JSON: an object with one key per variant id, each holding an object with the exact structure shown above. No additional text before or after the JSON.
+
+""",
+    suffix=PROMPT_VARIANTS_SUFFIX,
+    build_context=build_variants_context,
+)
+
+# v2-variants-structured: the response schema (variants_schema) pins the shape
+PROMPT_V2_VARIANTS_STRUCTURED = PromptTemplate(
+    version="v2-variants-structured",
+    prefix="""You are an expert e-commerce copywriter. Your task is to create compelling, conversion-focused product descriptions that drive sales, for several storefronts at once: write one complete description for each variant listed under VARIANTS, under its variant id.
+
+""" + _VARIANTS_REQUIREMENTS,
+    suffix=PROMPT_VARIANTS_SUFFIX,
+    build_context=build_variants_context,
+)
+
+templates = TemplateRegistry(default_version=Config.PROMPT_VERSION)
+templates.register(PROMPT_V1)
+templates.register(PROMPT_V2)
+templates.register(PROMPT_V2_STRUCTURED)
+templates.register(PROMPT_V2_VARIANTS)
+templates.register(PROMPT_V2_VARIANTS_STRUCTURED)
+
+# Output modes: 'text' asks for JSON in the prompt and cleans up the reply;
+# 'structured' sends OUTPUT_SCHEMA as the response schema and parses the reply directly
+OUTPUT_MODES = ('text', 'structured')
+
+# Active template version; part of the cache key so a prompt change invalidates cached generations
+PROMPT_VERSION = templates.default_version
+
+
+def prompt_version_for(output_mode=None):
+    """Template version used for an output mode (Config.OUTPUT_MODE when None)"""
+    output_mode = output_mode or Config.OUTPUT_MODE
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode: {output_mode}")
+    return Config.STRUCTURED_PROMPT_VERSION if output_mode == 'structured' else PROMPT_VERSION
+
+
+def variants_prompt_version_for(output_mode=None):
+    """Variants template version used for an output mode (Config.OUTPUT_MODE when None)"""
+    output_mode = output_mode or Config.OUTPUT_MODE
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode: {output_mode}")
+    return PROMPT_V2_VARIANTS_STRUCTURED.version if output_mode == 'structured' else PROMPT_V2_VARIANTS.version
+
+
+def render_product_prompt(product_data, version=None):
+    """Render the product prompt with size accounting (a RenderedPrompt)"""
+    return templates.get(version).render(product_data)
+
+
+def get_product_description_prompt(product_data, version=None):
+    """
+    Generate a sophisticated prompt for product description generation
+    """
+    return render_product_prompt(product_data, version).text
+
+
+# Constraint text for each output field, shared by the repair prompt
+FIELD_REQUIREMENTS = {
+    'short_description': "a string of EXACTLY 20-50 words",
+    'detailed_description': "a string of EXACTLY 50-200 words that mentions every key feature",
+    'bullet_points': "an array of 3-5 strings, each explaining the benefit of a feature",
+    'seo_keywords': "an array of strings including the product name and key features",
+    'call_to_action': "a string that creates urgency and encourages purchase",
+}
+
+
+_FIELD_SCHEMAS = {
+    'short_description': {"type": "STRING"},
+    'detailed_description': {"type": "STRING"},
+    'bullet_points': {"type": "ARRAY", "items": {"type": "STRING"}, "max_items": 5},
+    'seo_keywords': {"type": "ARRAY", "items": {"type": "STRING"}},
+    'call_to_action': {"type": "STRING"},
+}
+
+
+def output_schema(fields=None):
+    """Gemini response schema for the given output fields (all five by default)"""
+    fields = list(fields or FIELD_REQUIREMENTS)
+    return {
+        "type": "OBJECT",
+        "properties": {
+            field: dict(_FIELD_SCHEMAS[field], description=FIELD_REQUIREMENTS[field]) for field in fields
+        },
+        "required": fields,
+    }
+
+
+OUTPUT_SCHEMA = output_schema()
+
+
+def variants_schema(variant_ids, fields=None):
+    """Gemini response schema for a variants call: one output_schema object per variant id"""
+    variant_ids = list(variant_ids)
+    variant = output_schema(fields)
+    return {
+        "type": "OBJECT",
+        "properties": {variant_id: variant for variant_id in variant_ids},
+        "required": variant_ids,
+    }
+
+
+def get_repair_prompt(product_data, generated_output, field_errors, structured=False):
+    """
+    Build a short follow-up prompt that regenerates only the fields that failed validation.
+    In structured mode the response schema carries the output shape, so the format line is left out
+    """
+    features_str = ', '.join(product_data.get('key_features', []))
+    problems = '\n'.join(
+        f"- {field}: {message}. Must be {FIELD_REQUIREMENTS.get(field, 'present')}."
+        for field, message in field_errors.items()
+    )
+    # Keep the valid fields as context so the rewrite stays consistent with them
+    context = {k: v for k, v in generated_output.items() if k not in field_errors}
+    skeleton = ', '.join(f'"{field}": ...' for field in field_errors)
+
+    prompt = f"""You are fixing a product description for {product_data.get('product_name')} ({product_data.get('category')}, ₹{product_data.get('price')}).
+Key features: {features_str}
+Target audience: {product_data.get('target_audience', 'general')}. Tone: {product_data.get('tone', 'professional')}.
+
+These fields are already approved, keep them consistent:
+{json.dumps(context, ensure_ascii=False)}
+
+Rewrite ONLY these fields to fix the problems:
+{problems}"""
+    if structured:
+        return prompt
+    return prompt + f"""
+
+Return ONLY valid JSON of the form {{{skeleton}}}. No additional text before or after the JSON."""
+
+
+# How each product attribute change is described to the model in an update prompt
+_CHANGE_LABELS = {
+    'product_name': "Product name",
+    'category': "Category",
+    'key_features': "Key features",
+    'price': "Price",
+    'price_tier': "Price segment",
+    'target_audience': "Target audience",
+    'tone': "Tone",
+}
+
+
+def _describe_change(attribute, change):
+    if attribute == 'key_features':
+        parts = []
+        if change['removed']:
+            parts.append("removed " + ', '.join(change['removed']))
+        if change['added']:
+            parts.append("added " + ', '.join(change['added']))
+        return '; '.join(parts) or "reworded"
+    if attribute == 'price':
+        return f"₹{change['from']} -> ₹{change['to']}"
+    return f"{change['from']} -> {change['to']}"
+
+
+def get_update_prompt(product_data, changes, fields, kept_output, structured=False):
+    """
+    Build a reduced prompt that rewrites only `fields` after the product changed.
+    changes maps each changed attribute to {'from', 'to'} (key_features: {'removed', 'added'});
+    kept_output holds fields that stay as they are and are shown so the rewrite matches them
+    """
+    changed = '\n'.join(
+        f"- {_CHANGE_LABELS[attribute]}: {_describe_change(attribute, change)}" for attribute, change in changes.items()
+    )
+    requirements = '\n'.join(f"- {field}: {FIELD_REQUIREMENTS[field]}" for field in fields)
+    skeleton = ', '.join(f'"{field}": ...' for field in fields)
+
+    prompt = f"""You are updating a product description after the product changed.
+
+{PROMPT_V2_SUFFIX.format(**build_prompt_context(product_data))}
+
+What changed:
+{changed}"""
+    if kept_output:
+        prompt += f"""
+
+These fields stay as they are, keep the rewrite consistent with them:
+{json.dumps(kept_output, ensure_ascii=False)}"""
+    prompt += f"""
 
-Return ONLY valid JSON format with the exact structure shown above. No additional text before or after the JSON."""
+Write ONLY these fields for the updated product:
+{requirements}"""
+    if structured:
+        return prompt
+    return prompt + f"""
 
-    return prompt
\ No newline at end of file
+Return ONLY valid JSON of the form {{{skeleton}}}. No additional text before or after the JSON."""
@@ -0,0 +1,118 @@
+import threading
+from string import Formatter
+
+# Rough chars-per-token ratio for English prose with Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Cheap token estimate used for accounting; not an exact tokenizer count"""
+    return max(1, round(len(text) / CHARS_PER_TOKEN)) if text else 0
+
+
+class RenderedPrompt:
+    """A rendered prompt split into its static prefix and per-product suffix"""
+
+    __slots__ = ('version', 'prefix', 'suffix', 'text')
+
+    def __init__(self, version, prefix, suffix):
+        self.version = version
+        self.prefix = prefix
+        self.suffix = suffix
+        self.text = prefix + suffix
+
+    @property
+    def chars(self):
+        return len(self.text)
+
+    @property
+    def estimated_tokens(self):
+        return estimate_tokens(self.text)
+
+    def size(self):
+        return {
+            'version': self.version,
+            'chars': self.chars,
+            'estimated_tokens': self.estimated_tokens,
+            'prefix_chars': len(self.prefix),
+            'suffix_chars': len(self.suffix),
+        }
+
+
+class PromptTemplate:
+    """A versioned prompt compiled once: a static prefix plus a pre-parsed suffix.
+
+    `prefix` is emitted verbatim and is byte-identical across calls, so it
+    can be served from a prompt/prefix cache. `suffix` uses str.format field
+    syntax (without format specs); it is parsed once here and rendered by
+    concatenation. `build_context(product_data)` computes every substitution
+    value once per render.
+    """
+
+    def __init__(self, version, prefix, suffix, build_context):
+        self.version = version
+        self.prefix = prefix
+        self.build_context = build_context
+        self._parts = [
+            (literal, field) for literal, field, _, _ in Formatter().parse(suffix)
+        ]
+        self.prefix_tokens = estimate_tokens(prefix)
+        self._lock = threading.Lock()
+        self._renders = 0
+        self._chars = 0
+        self._tokens = 0
+
+    def render(self, product_data):
+        context = self.build_context(product_data)
+        pieces = []
+        for literal, field in self._parts:
+            pieces.append(literal)
+            if field is not None:
+                pieces.append(str(context[field]))
+        rendered = RenderedPrompt(self.version, self.prefix, ''.join(pieces))
+
+        with self._lock:
+            self._renders += 1
+            self._chars += rendered.chars
+            self._tokens += rendered.estimated_tokens
+        return rendered
+
+    def stats(self):
+        with self._lock:
+            renders, chars, tokens = self._renders, self._chars, self._tokens
+        return {
+            'renders': renders,
+            'prefix_chars': len(self.prefix),
+            'prefix_estimated_tokens': self.prefix_tokens,
+            'total_chars': chars,
+            'total_estimated_tokens': tokens,
+            'avg_estimated_tokens': round(tokens / renders, 1) if renders else 0.0,
+        }
+
+
+class TemplateRegistry:
+    """Holds every compiled template version; the default is used when none is requested"""
+
+    def __init__(self, default_version):
+        self.default_version = default_version
+        self._templates = {}
+
+    def register(self, template):
+        self._templates[template.version] = template
+        return template
+
+    def get(self, version=None):
+        version = version or self.default_version
+        try:
+            return self._templates[version]
+        except KeyError:
+            raise ValueError(f"Unknown prompt template version: {version}")
+
+    def versions(self):
+        return sorted(self._templates)
+
+    def stats(self):
+        return {
+            'default_version': self.default_version,
+            'templates': {version: t.stats() for version, t in sorted(self._templates.items())},
+        }
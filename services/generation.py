@@ -0,0 +1,1158 @@
+"""Async generation service shared by the Flask views, the ASGI entry point and the bulk CLI.
+
+Everything that talks to Gemini lives here. Coroutines are the primary API;
+synchronous callers (Flask worker threads, the bulk runner) go through
+run_coroutine(), which schedules them on one long-lived background event loop
+so a single process can keep many generations in flight without a thread per
+call.
+"""
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from config import Config
+from prompts.prompt_templates import (
+    get_price_category,
+    get_product_description_prompt,
+    get_repair_prompt,
+    output_schema,
+    prompt_version_for,
+    render_product_prompt,
+    templates,
+    variants_prompt_version_for,
+    variants_schema,
+)
+from prompts.template_engine import estimate_tokens
+from services.model_backends import create_backend
+from services.model_router import ModelRouter, RouteCursor
+from utils.cache import ResponseCache, canonicalize_product, make_cache_key
+from utils.circuit_breaker import AdmissionController, CircuitBreaker, RejectedError
+from utils.json_stream import IncrementalObjectParser
+from utils.metrics import (
+    LLM_IN_FLIGHT,
+    OUTPUT_VALIDATION_FAILURES,
+    PARSE_FAILURES,
+    PROMPT_TOKENS,
+    REGISTRY,
+    RESPONSE_TOKENS,
+    STAGE_SECONDS,
+    stats_collector,
+)
+from utils.rate_limit import FileLockState, RateLimitedError, TokenBucketLimiter
+from utils.retry import RetryBudget, RetryError, RetryPolicy, classify_error
+from utils.semantic_cache import SemanticCache
+from utils.single_flight import SingleFlight
+from utils.timing import DeadlineCutOffError, ServerTiming, hedged
+from utils.validators import OUTPUT_FIELDS, get_output_field_errors, validate_and_mark_invalid_fields
+
+logger = logging.getLogger(__name__)
+
+
+def _build_backend(model_name):
+    with STAGE_SECONDS.time(stage='model_init'):
+        return create_backend(model_name=model_name)
+
+
+# Pool of model clients (Gemini, or the local fake for tests and benchmarks) and the rules that pick one
+# per generation. Clients are built on first use so importing the app does not pull in the Gemini SDK
+# and its grpc/protobuf stack
+model_router = ModelRouter(
+    Config.MODEL_POOL or [Config.GEMINI_MODEL],
+    _build_backend,
+    routes=Config.MODEL_ROUTES,
+    costs={name: tuple(prices) for name, prices in Config.MODEL_COSTS.items()},
+    ewma_alpha=Config.MODEL_EWMA_ALPHA,
+    max_error_rate=Config.MODEL_MAX_ERROR_RATE,
+    max_latency=Config.MODEL_MAX_LATENCY_SECONDS or None,
+    probe_ratio=Config.MODEL_PROBE_RATIO,
+    breaker_factory=lambda name: CircuitBreaker(
+        window_size=Config.BREAKER_WINDOW_SIZE,
+        min_calls=Config.BREAKER_MIN_CALLS,
+        failure_rate_threshold=Config.BREAKER_FAILURE_RATE,
+        slow_call_seconds=Config.BREAKER_SLOW_CALL_SECONDS,
+        slow_call_rate_threshold=Config.BREAKER_SLOW_CALL_RATE,
+        open_seconds=Config.BREAKER_OPEN_SECONDS,
+        half_open_max_calls=Config.BREAKER_HALF_OPEN_CALLS,
+        name=name,
+    ),
+)
+
+# Cache of generated descriptions keyed on the canonical product payload
+response_cache = ResponseCache(
+    maxsize=Config.CACHE_MAX_ENTRIES,
+    ttl=Config.CACHE_TTL_SECONDS,
+    db_path=Config.CACHE_DB_PATH,
+    disk_ttl=Config.CACHE_DISK_TTL_SECONDS,
+) if Config.CACHE_ENABLED else None
+
+# One budget for the whole process so retries stay a bounded share of Gemini traffic
+retry_policy = RetryPolicy(
+    max_attempts=Config.RETRY_MAX_ATTEMPTS,
+    base_delay=Config.RETRY_BASE_DELAY,
+    max_delay=Config.RETRY_MAX_DELAY,
+    budget=RetryBudget(
+        ratio=Config.RETRY_BUDGET_RATIO,
+        min_retries=Config.RETRY_BUDGET_MIN_RETRIES,
+        window=Config.RETRY_BUDGET_WINDOW_SECONDS,
+    ),
+)
+
+# Trips on sustained Gemini errors or slowness so callers fail fast with 503. Each model also has its
+# own breaker in model_router; a failure is only charged here when no fallback model could take the retry
+circuit_breaker = CircuitBreaker(
+    window_size=Config.BREAKER_WINDOW_SIZE,
+    min_calls=Config.BREAKER_MIN_CALLS,
+    failure_rate_threshold=Config.BREAKER_FAILURE_RATE,
+    slow_call_seconds=Config.BREAKER_SLOW_CALL_SECONDS,
+    slow_call_rate_threshold=Config.BREAKER_SLOW_CALL_RATE,
+    open_seconds=Config.BREAKER_OPEN_SECONDS,
+    half_open_max_calls=Config.BREAKER_HALF_OPEN_CALLS,
+)
+
+# Client-side pacing under the Gemini RPM/TPM quota; FileLockState shares it across processes
+rate_limiter = TokenBucketLimiter(
+    rpm=Config.RATE_LIMIT_RPM,
+    tpm=Config.RATE_LIMIT_TPM,
+    headroom=Config.RATE_LIMIT_HEADROOM,
+    state=FileLockState(Config.RATE_LIMIT_STATE_PATH) if Config.RATE_LIMIT_STATE_PATH else None,
+) if Config.RATE_LIMIT_RPM or Config.RATE_LIMIT_TPM else None
+
+# Identical generations in flight at the same time share one Gemini call
+single_flight = SingleFlight()
+
+# Product variants (same category, audience, tone and price tier) reuse a patched generation
+semantic_cache = SemanticCache(
+    threshold=Config.SEMANTIC_CACHE_THRESHOLD,
+    maxsize=Config.SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl=Config.CACHE_TTL_SECONDS,
+    num_perm=Config.SEMANTIC_CACHE_NUM_PERM,
+    bands=Config.SEMANTIC_CACHE_BANDS,
+) if Config.SEMANTIC_CACHE_ENABLED else None
+
+# Caps generations in flight; cache hits are never shed
+admission_controller = AdmissionController(max_in_flight=Config.MAX_IN_FLIGHT_GENERATIONS)
+
+# Failure reasons that say something about Gemini's health (client errors, malformed
+# output and calls cut off by the request's own deadline do not count against the breaker)
+BREAKER_FAILURE_REASONS = {'rate_limited', 'unavailable', 'deadline_exceeded', 'server_error', 'unknown'}
+
+_hedge_lock = threading.Lock()
+_hedge_counters = {'launched': 0, 'won': 0}
+
+_repair_lock = threading.Lock()
+_repair_counters = {'generations': 0, 'needed': 0, 'succeeded': 0, 'failed': 0, 'rounds': 0, 'fields': 0}
+
+_warm_up_lock = threading.Lock()
+_warm_up_state = {'status': 'idle', 'seconds': None, 'error': None}
+
+
+class GenerationError(Exception):
+    """Raised when the model could not produce a valid description"""
+
+
+class DeadlineExceededError(GenerationError):
+    """Raised when generation could not finish within the response deadline"""
+
+
+def clean_json_response(raw_response):
+    """Clean and parse JSON response from Gemini API"""
+    try:
+        if raw_response.startswith('```json'):
+            raw_response = raw_response[7:-3]
+        elif raw_response.startswith('```'):
+            raw_response = raw_response[3:-3]
+
+        json_match = re.search(r'\{.*\}', raw_response, re.DOTALL)
+        if json_match:
+            raw_response = json_match.group()
+
+        return json.loads(raw_response)
+    except:
+        try:
+            raw_response = raw_response.strip()
+            raw_response = re.sub(r',\s*}', '}', raw_response)
+            raw_response = re.sub(r',\s*]', ']', raw_response)
+            return json.loads(raw_response)
+        except:
+            raise ValueError("Could not parse JSON response")
+
+
+def describe_retry_error(error):
+    """Human-readable reason a RetryPolicy gave up on Gemini"""
+    if error.outcome == 'fatal_error':
+        return f"AI generation failed (non-retryable {error.reason}): {str(error)}"
+    if error.outcome == 'budget_exhausted':
+        return f"AI generation failed after {error.attempts} attempts (retry budget exhausted): {str(error)}"
+    return f"AI generation failed after {error.attempts} attempts: {str(error)}"
+
+
+def _raise_for_retry_error(error, deadline, kind='generation'):
+    """Re-raise a RetryError from a Gemini call as the error the routes map to a status.
+
+    A load-shedding rejection (503) is re-raised as is, and a server-requested
+    retry delay the policy would not wait for becomes RateLimitedError (503
+    with that Retry-After). A run that ran out of deadline is
+    DeadlineExceededError (504), anything else GenerationError (500).
+    `kind` names the call in the log line.
+    """
+    if isinstance(error.last_exception, RejectedError):
+        raise error.last_exception
+    logger.warning(f"Gemini {kind} gave up", extra={
+        "outcome": error.outcome, "reason": error.reason, "attempts": error.attempts, "error": str(error)
+    })
+    if error.retry_after is not None:
+        raise RateLimitedError(
+            f"Gemini quota exceeded, retry in {error.retry_after:.0f}s: {str(error)}", error.retry_after
+        )
+    if deadline is not None and (error.outcome == 'deadline_exhausted' or deadline.expired()):
+        raise DeadlineExceededError(
+            f"AI generation exceeded the {deadline.seconds}s response deadline "
+            f"after {error.attempts} attempts: {str(error)}"
+        )
+    raise GenerationError(describe_retry_error(error))
+
+
+def build_final_output(generated_output):
+    """Project the model output onto the public response fields, in order"""
+    return OrderedDict([
+        ("short_description", generated_output.get("short_description", "")),
+        ("detailed_description", generated_output.get("detailed_description", "")),
+        ("bullet_points", generated_output.get("bullet_points", [])),
+        ("seo_keywords", generated_output.get("seo_keywords", [])),
+        ("call_to_action", generated_output.get("call_to_action", ""))
+    ])
+
+
+def structured_generation_config(fields=None):
+    """generation_config constraining Gemini to JSON that matches the output schema"""
+    return {"response_mime_type": "application/json", "response_schema": output_schema(fields)}
+
+
+def clean_product(validated_data):
+    """Drop fields marked 'Invalid input' (optional ones) before prompting"""
+    return {k: v for k, v in validated_data.items() if v != "Invalid input"}
+
+
+async def _record_tokens(response, prompt, raw_response, kind, reserved_tokens=0):
+    """Observe prompt/response token counts, estimating when usage metadata is absent; returns both counts.
+
+    reserved_tokens is what the rate limiter charged up front; it is settled
+    against the actual usage.
+    """
+    usage = getattr(response, 'usage_metadata', None)
+    prompt_tokens = getattr(usage, 'prompt_token_count', 0) or estimate_tokens(prompt)
+    response_tokens = getattr(usage, 'candidates_token_count', 0) or estimate_tokens(raw_response)
+    PROMPT_TOKENS.observe(prompt_tokens, kind=kind)
+    RESPONSE_TOKENS.observe(response_tokens, kind=kind)
+    if rate_limiter is not None and reserved_tokens:
+        await rate_limiter.settle_async(reserved_tokens, prompt_tokens + response_tokens)
+    return prompt_tokens, response_tokens
+
+
+async def _wait_for_quota(prompt, max_wait=None):
+    """Pace a call under the RPM/TPM quota; returns (tokens reserved, seconds waited).
+
+    Raises RateLimitedError when the wait would exceed max_wait.
+    """
+    if rate_limiter is None:
+        return 0, 0.0
+    tokens = estimate_tokens(prompt) + Config.RATE_LIMIT_EXPECTED_OUTPUT_TOKENS
+    waited = await rate_limiter.acquire(tokens, max_wait=max_wait)
+    if waited:
+        STAGE_SECONDS.observe(waited, stage='rate_limit_wait')
+    return tokens, waited
+
+
+def _admit_call(model_name):
+    """Reserve one call with the global circuit breaker and the model's own, or raise CircuitOpenError"""
+    circuit_breaker.before_call()
+    try:
+        model_router.breaker(model_name).before_call()
+    except RejectedError:
+        circuit_breaker.release()
+        raise
+
+
+def _release_call(model_name):
+    """End an admitted call without an outcome"""
+    circuit_breaker.release()
+    model_router.breaker(model_name).release()
+
+
+async def _admit_and_wait_for_quota(model_name, prompt, max_wait=None):
+    """_admit_call, then _wait_for_quota; returns (tokens reserved, seconds waited).
+
+    Admission comes first so an open breaker fails fast without taking or
+    waiting for quota; the admission is released if the quota wait fails.
+    """
+    _admit_call(model_name)
+    try:
+        return await _wait_for_quota(prompt, max_wait=max_wait)
+    except BaseException:
+        # Throttled (RateLimitedError) or cancelled before the call was made
+        _release_call(model_name)
+        raise
+
+
+def _record_model_success(model_name, elapsed):
+    circuit_breaker.record(True, elapsed)
+    model_router.breaker(model_name).record(True, elapsed)
+
+
+async def _record_model_error(exc, started, model_name, has_fallback=None):
+    """Report a failed call to the circuit breakers, and drain the rate limiter on a 429.
+
+    has_fallback() tells whether another model can still take the retry;
+    while one can, the failure is only charged to this model's breaker.
+    """
+    reason = classify_error(exc)
+    healthy = reason not in BREAKER_FAILURE_REASONS
+    elapsed = time.monotonic() - started
+    model_router.breaker(model_name).record(healthy, elapsed)
+    if healthy or has_fallback is None or not has_fallback():
+        circuit_breaker.record(healthy, elapsed)
+    else:
+        circuit_breaker.release()
+    if reason == 'rate_limited' and rate_limiter is not None:
+        await rate_limiter.drain_async()
+
+
+async def _call_model(prompt, timeout=None, kind='generate', generation_config=None, model_name=None,
+                      fallback=False, has_fallback=None):
+    """One Gemini call reported to the circuit breakers and the model router; returns the raw response text.
+
+    model_name picks a model from the router's pool (default: the first);
+    fallback marks a call that is not the route's first choice, and
+    has_fallback is passed on to _record_model_error.
+    """
+    model_name = model_name or model_router.default
+    if timeout is not None and timeout <= 0:
+        raise DeadlineCutOffError("Response deadline exhausted before calling Gemini")
+    reserved_tokens, waited = await _admit_and_wait_for_quota(model_name, prompt, max_wait=timeout)
+    if timeout is not None:
+        timeout -= waited
+    started = time.monotonic()
+    try:
+        with LLM_IN_FLIGHT.track_inprogress(), STAGE_SECONDS.time(stage='llm_attempt'):
+            client = get_model(model_name)
+            if generation_config is not None:
+                call = client.generate_content_async(prompt, generation_config=generation_config)
+            else:
+                call = client.generate_content_async(prompt)
+            response = await asyncio.wait_for(call, timeout)
+            raw_response = response.text
+    except asyncio.CancelledError:
+        # Hedging loser or abandoned request: says nothing about Gemini's health
+        _release_call(model_name)
+        raise
+    except asyncio.TimeoutError as exc:
+        if timeout is None:
+            await _record_model_error(exc, started, model_name, has_fallback)
+            model_router.record(model_name, time.monotonic() - started, False, fallback=fallback)
+            raise
+        # The request's remaining budget ran out, however short it was: kept out of the
+        # breakers and the router's EWMAs, and classified 'local_deadline' for retries
+        _release_call(model_name)
+        model_router.record_cut_off(model_name)
+        raise DeadlineCutOffError(f"Gemini call cut off by the response deadline after {timeout:.2f}s") from exc
+    except Exception as exc:
+        await _record_model_error(exc, started, model_name, has_fallback)
+        model_router.record(model_name, time.monotonic() - started, False, fallback=fallback)
+        raise
+    elapsed = time.monotonic() - started
+    _record_model_success(model_name, elapsed)
+    prompt_tokens, response_tokens = await _record_tokens(response, prompt, raw_response, kind, reserved_tokens)
+    model_router.record(model_name, elapsed, True, prompt_tokens, response_tokens, fallback=fallback)
+    return raw_response
+
+
+def parse_model_output(raw_response, structured=False):
+    """Parse a model reply with stage timing and parse-failure counting.
+
+    Structured-mode replies are schema-constrained JSON, so they are parsed
+    directly; text-mode replies go through clean_json_response.
+    """
+    mode = 'structured' if structured else 'text'
+    with STAGE_SECONDS.time(stage='parse_structured' if structured else 'clean_json_response'):
+        try:
+            if structured:
+                try:
+                    return json.loads(raw_response)
+                except ValueError:
+                    raise ValueError("Could not parse JSON response")
+            return clean_json_response(raw_response)
+        except ValueError:
+            PARSE_FAILURES.inc(mode=mode)
+            raise
+
+
+def similarity_block(clean_data, namespace):
+    """What a near-duplicate must share exactly; only name, features and price within the tier may differ"""
+    product = canonicalize_product(clean_data)
+    return (
+        product['category'], product['target_audience'].casefold(), product['tone'].casefold(),
+        get_price_category(product['price']), namespace,
+    )
+
+
+def _patch_validator(clean_data):
+    """Accept a patched output only if it passes output validation and mentions every feature"""
+    features = [feature.lower() for feature in clean_data.get('key_features', [])]
+
+    def validate(output):
+        text = output.get('detailed_description', '').lower()
+        return not get_output_field_errors(output) and all(feature in text for feature in features)
+    return validate
+
+
+def check_output(output, locale=None):
+    """get_output_field_errors with stage timing and per-field failure counting"""
+    with STAGE_SECONDS.time(stage='validate_output'):
+        field_errors = get_output_field_errors(output, locale)
+    for field, message in field_errors.items():
+        if message.startswith('Missing'):
+            reason = 'missing'
+        elif 'words' in message:
+            reason = 'word_count'
+        else:
+            reason = 'type'
+        OUTPUT_VALIDATION_FAILURES.inc(field=field, reason=reason)
+    return field_errors
+
+
+def _record_hedge(won):
+    with _hedge_lock:
+        _hedge_counters['launched'] += 1
+        if won:
+            _hedge_counters['won'] += 1
+
+
+def hedge_stats():
+    with _hedge_lock:
+        return dict(_hedge_counters)
+
+
+def get_model(name=None):
+    """The backend for a pooled model (default: the first), created on first use"""
+    return model_router.client(name)
+
+
+def backend_stats():
+    if not model_router.initialized():
+        return {'backend': Config.MODEL_BACKEND, 'initialized': False}
+    model = model_router.client()
+    describe = getattr(model, 'describe', None)
+    stats = describe() if describe is not None else {'backend': type(model).__name__}
+    return dict(stats, initialized=True)
+
+
+def cache_namespace(prompt_version, model_hint=None):
+    """Cache and coalescing namespace: a request pinned to a model gets its own entries"""
+    if model_hint is None:
+        return prompt_version
+    return f"{prompt_version}@{model_router.resolve_hint(model_hint)}"
+
+
+def start_warm_up():
+    """Build the default model client and the bridge event loop on a background thread (once)"""
+    with _warm_up_lock:
+        if _warm_up_state['status'] != 'idle':
+            return
+        _warm_up_state['status'] = 'running'
+    threading.Thread(target=_warm_up, name='model-warm-up', daemon=True).start()
+
+
+def _warm_up():
+    started = time.monotonic()
+    status, error = 'done', None
+    try:
+        get_model()
+        _get_loop()
+    except Exception as e:
+        logger.exception("Model warm-up failed")
+        status, error = 'failed', str(e)
+    with _warm_up_lock:
+        _warm_up_state.update(status=status, error=error, seconds=round(time.monotonic() - started, 3))
+
+
+def warm_up_status():
+    """{'status': idle|running|done|failed, 'seconds', 'error'}; idle means no warm-up was requested"""
+    with _warm_up_lock:
+        return dict(_warm_up_state)
+
+
+def _count_repair(name, amount=1):
+    with _repair_lock:
+        _repair_counters[name] += amount
+
+
+def repair_stats():
+    """Repair counters plus the share of generations that needed a repair"""
+    with _repair_lock:
+        stats = dict(_repair_counters)
+    stats['repair_rate'] = round(stats['needed'] / stats['generations'], 4) if stats['generations'] else 0.0
+    return stats
+
+
+async def repair_output(clean_data, generated_output, field_errors, deadline=None, structured=False,
+                        model_name=None):
+    """Regenerate only the fields in field_errors, for at most MAX_REPAIR_ROUNDS rounds.
+
+    Returns (merged_output, remaining_field_errors); remaining errors are
+    empty when the repair succeeded.
+    """
+    _count_repair('needed')
+    output = dict(generated_output) if isinstance(generated_output, dict) else {}
+
+    for _ in range(Config.MAX_REPAIR_ROUNDS):
+        if deadline is not None and deadline.remaining() < Config.MIN_ATTEMPT_SECONDS:
+            break
+        _count_repair('rounds')
+        _count_repair('fields', len(field_errors))
+        prompt = get_repair_prompt(clean_data, output, field_errors, structured=structured)
+        generation_config = structured_generation_config(field_errors) if structured else None
+
+        async def attempt():
+            raw_response = await _call_model(
+                prompt, deadline.remaining() if deadline is not None else None, kind='repair',
+                generation_config=generation_config, model_name=model_name,
+            )
+            return parse_model_output(raw_response, structured)
+
+        try:
+            patch = await retry_policy.run_async(
+                attempt, deadline=deadline, min_attempt_seconds=Config.MIN_ATTEMPT_SECONDS
+            )
+        except RetryError as e:
+            if isinstance(e.last_exception, RejectedError):
+                raise e.last_exception
+            break
+
+        if isinstance(patch, dict):
+            # Only the fields we asked for are merged; the model may not touch valid ones
+            output.update({field: patch[field] for field in field_errors if field in patch})
+        field_errors = check_output(output)
+        if not field_errors:
+            _count_repair('succeeded')
+            return output, field_errors
+
+    _count_repair('failed')
+    return output, field_errors
+
+
+async def generate_description_async(clean_data, bypass_cache=False, deadline=None, timings=None,
+                                     output_mode=None, model_hint=None):
+    """Run cache lookup -> prompt -> Gemini -> parse -> validate for one clean product.
+
+    deadline (a utils.timing.Deadline) bounds every Gemini attempt and
+    suppresses retries the remaining budget cannot cover; timings (a
+    ServerTiming) collects per-stage durations for the caller. output_mode
+    ('text' or 'structured') defaults to Config.OUTPUT_MODE. model_hint
+    (a pooled model name or hint alias) overrides the model router's rules.
+
+    Identical concurrent calls are coalesced: one does the work and the
+    others get its result with cache_status "COALESCED"; calls with
+    bypass_cache are never coalesced. With the semantic cache enabled, a
+    near-duplicate of an earlier product is served from a patched copy of
+    its output with cache_status "SIMILAR".
+
+    Returns (final_output, cache_status). Raises RejectedError when the
+    circuit breaker or admission control refuses the call,
+    DeadlineExceededError when the deadline runs out, and GenerationError when
+    the model fails or returns output that does not pass validate_output.
+    """
+    timings = timings if timings is not None else ServerTiming()
+    prompt_version = prompt_version_for(output_mode)
+    structured = (output_mode or Config.OUTPUT_MODE) == 'structured'
+    namespace = cache_namespace(prompt_version, model_hint)
+
+    # Serve repeated catalogue items from the cache unless the client opted out
+    cache_key = None
+    cache_status = "DISABLED"
+    if response_cache is not None:
+        with timings.measure('cache'):
+            cache_key = make_cache_key(clean_data, namespace)
+            if bypass_cache:
+                response_cache.record_bypass()
+                cache_status = "BYPASS"
+            else:
+                cached_output = await response_cache.get_async(cache_key)
+                if cached_output is not None:
+                    return cached_output, "HIT"
+                cache_status = "MISS"
+
+    if semantic_cache is not None and not bypass_cache:
+        with timings.measure('similar'):
+            similar_output, _ = semantic_cache.lookup(
+                clean_data, similarity_block(clean_data, namespace), validate=_patch_validator(clean_data)
+            )
+        if similar_output is not None:
+            if response_cache is not None:
+                await response_cache.set_async(cache_key, similar_output)
+            return similar_output, "SIMILAR"
+
+    def generate():
+        return _generate_fresh(clean_data, prompt_version, structured, cache_key, deadline, timings, model_hint)
+
+    # A no-cache request asks for a fresh generation, so it never shares one already in flight
+    if not Config.COALESCE_ENABLED or bypass_cache:
+        return await generate(), cache_status
+
+    # Identical requests already in flight share that generation instead of calling Gemini again
+    flight_key = cache_key or make_cache_key(clean_data, namespace)
+    started = time.monotonic()
+    try:
+        final_output, shared = await single_flight.run(
+            flight_key, generate, timeout=deadline.remaining() if deadline is not None else None
+        )
+    except asyncio.TimeoutError:
+        raise DeadlineExceededError(
+            f"AI generation exceeded the {deadline.seconds}s response deadline "
+            "waiting for an identical in-flight request"
+        )
+    if shared:
+        timings.add('coalesce', time.monotonic() - started)
+        return final_output, "COALESCED"
+    return final_output, cache_status
+
+
+async def _generate_fresh(clean_data, prompt_version, structured, cache_key, deadline, timings, model_hint=None):
+    """Prompt -> Gemini -> parse -> validate -> repair for a cache miss; stores the result"""
+    generation_config = structured_generation_config() if structured else None
+    cursor = RouteCursor(model_router, model_router.route(clean_data, model_hint))
+
+    with timings.measure('prompt'), STAGE_SECONDS.time(stage='prompt_build'):
+        prompt = get_product_description_prompt(clean_data, prompt_version)
+
+    def call():
+        # Retries and hedged backups move down the route's fallback list
+        model_name, fallback = cursor.next()
+        return _call_model(
+            prompt, deadline.remaining() if deadline is not None else None, generation_config=generation_config,
+            model_name=model_name, fallback=fallback, has_fallback=cursor.has_fallback,
+        )
+
+    def can_hedge():
+        # Only hedge when the backup still has a realistic chance to finish in time
+        return deadline is None or deadline.remaining() >= Config.MIN_ATTEMPT_SECONDS
+
+    async def attempt():
+        with timings.measure('llm'):
+            if Config.HEDGE_ENABLED:
+                raw_response = await hedged(call, Config.HEDGE_AFTER_SECONDS, can_hedge, _record_hedge)
+            else:
+                raw_response = await call()
+        with timings.measure('postprocess'):
+            return parse_model_output(raw_response, structured)
+
+    # Call Gemini API with classified, jittered, budgeted, deadline-aware retries
+    with admission_controller.slot():
+        try:
+            generated_output = await retry_policy.run_async(
+                attempt, deadline=deadline, min_attempt_seconds=Config.MIN_ATTEMPT_SECONDS,
+                failover=cursor.has_fallback,
+            )
+        except RetryError as e:
+            _raise_for_retry_error(e, deadline, 'generation')
+
+    _count_repair('generations')
+    with timings.measure('postprocess'):
+        field_errors = check_output(generated_output)
+
+    if field_errors:
+        # Fix just the failing fields instead of paying for a full regeneration
+        with timings.measure('repair'):
+            generated_output, field_errors = await repair_output(
+                clean_data, generated_output, field_errors, deadline=deadline, structured=structured,
+                model_name=cursor.current,
+            )
+
+    with timings.measure('postprocess'):
+        # Validate LLM output
+        if field_errors:
+            raise GenerationError(f"Invalid output format: {next(iter(field_errors.values()))}")
+
+        final_output = build_final_output(generated_output)
+
+    if response_cache is not None:
+        await response_cache.set_async(cache_key, final_output)
+    if semantic_cache is not None:
+        namespace = cache_namespace(prompt_version, model_hint)
+        semantic_cache.add(
+            cache_key or make_cache_key(clean_data, namespace), clean_data,
+            similarity_block(clean_data, namespace), final_output,
+        )
+
+    return final_output
+
+
+# Event loop -> semaphore shared by every batch running on it, so BATCH_MAX_CONCURRENCY bounds all
+# batch generations in flight together (batches run on the generation loop, or uvicorn's under asgi.py)
+_batch_semaphores = weakref.WeakKeyDictionary()
+
+
+def _batch_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _batch_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _batch_semaphores[loop] = asyncio.Semaphore(Config.BATCH_MAX_CONCURRENCY)
+    return semaphore
+
+
+async def _generate_batch_item(clean_data, bypass_cache, semaphore, output_mode=None, model_hint=None):
+    """Generate one batch item; never raises so results stay per-item"""
+    # The request's own cap first, so waiting on it holds no shared slot
+    async with semaphore, _batch_semaphore():
+        try:
+            final_output, cache_status = await generate_description_async(
+                clean_data, bypass_cache=bypass_cache, output_mode=output_mode, model_hint=model_hint
+            )
+            return {"status": "ok", "cache": cache_status, "output": final_output}
+        except RejectedError as e:
+            return {"status": "rejected", "error": str(e), "retry_after": e.retry_after_header}
+        except GenerationError as e:
+            return {"status": "error", "error": str(e)}
+        except Exception as e:
+            return {"status": "error", "error": f"Internal server error: {str(e)}"}
+
+
+async def generate_batch_async(products, bypass_cache=False, concurrency=None, output_mode=None, model_hint=None):
+    """Validate every product up front, then generate the valid ones concurrently.
+
+    Returns {"summary": ..., "results": [...]} with one result per product, in
+    input order. All batches share Config.BATCH_MAX_CONCURRENCY slots;
+    concurrency further caps this one.
+    """
+    semaphore = asyncio.Semaphore(min(concurrency or Config.BATCH_MAX_CONCURRENCY, Config.BATCH_MAX_CONCURRENCY))
+    results = [None] * len(products)
+    pending = {}
+    for index, product in enumerate(products):
+        if not isinstance(product, dict):
+            results[index] = {"status": "invalid_input", "error": "Product must be a JSON object"}
+            continue
+        validated_data, has_valid_required_data = validate_and_mark_invalid_fields(product)
+        if not has_valid_required_data:
+            results[index] = {"status": "invalid_input", "input_validation": validated_data}
+            continue
+        pending[index] = _generate_batch_item(
+            clean_product(validated_data), bypass_cache, semaphore, output_mode, model_hint
+        )
+
+    generated = await asyncio.gather(*pending.values())
+    for index, result in zip(pending, generated):
+        results[index] = result
+
+    for index, result in enumerate(results):
+        result["index"] = index
+
+    summary = {
+        "total": len(results),
+        "succeeded": sum(1 for r in results if r["status"] == "ok"),
+        "invalid_input": sum(1 for r in results if r["status"] == "invalid_input"),
+        "failed": sum(1 for r in results if r["status"] == "error"),
+        "rejected": sum(1 for r in results if r["status"] == "rejected"),
+    }
+    return {"summary": summary, "results": results}
+
+
+def variant_product(clean_data, variant):
+    """The product as one variant sees it: the variant's tone and audience over the product's"""
+    return dict(clean_data, **{field: variant[field] for field in ('tone', 'target_audience') if field in variant})
+
+
+async def _generate_variant_chunk(clean_data, chunk, prompt_version, structured, models, deadline, timings):
+    """One combined Gemini call for a chunk of variants; returns the reply parsed to {variant id: output}"""
+    generation_config = (
+        {"response_mime_type": "application/json", "response_schema": variants_schema(v['id'] for v in chunk)}
+        if structured else None
+    )
+    with timings.measure('prompt'), STAGE_SECONDS.time(stage='prompt_build'):
+        prompt = render_product_prompt(dict(clean_data, variants=chunk), prompt_version).text
+    cursor = RouteCursor(model_router, models)
+
+    async def attempt():
+        # Retries move down the route's fallback list
+        model_name, fallback = cursor.next()
+        with timings.measure('llm'):
+            raw_response = await _call_model(
+                prompt, deadline.remaining() if deadline is not None else None, kind='variants',
+                generation_config=generation_config, model_name=model_name, fallback=fallback,
+                has_fallback=cursor.has_fallback,
+            )
+        with timings.measure('postprocess'):
+            reply = parse_model_output(raw_response, structured)
+        if not isinstance(reply, dict):
+            raise ValueError("Could not parse JSON response: expected an object keyed by variant id")
+        return reply
+
+    with admission_controller.slot():
+        try:
+            return await retry_policy.run_async(
+                attempt, deadline=deadline, min_attempt_seconds=Config.MIN_ATTEMPT_SECONDS,
+                failover=cursor.has_fallback,
+            )
+        except RetryError as e:
+            _raise_for_retry_error(e, deadline, 'variants generation')
+
+
+async def generate_variants_async(clean_data, variants, bypass_cache=False, deadline=None, timings=None,
+                                  output_mode=None, model_hint=None):
+    """Generate several locale/tone/audience variants of one clean product in combined calls.
+
+    variants come from utils.validators.validate_variants. Each variant is
+    cached on its own; the rest are sent VARIANTS_PER_CALL per Gemini call
+    (calls run concurrently), so the instructions and product details are
+    sent once per call instead of once per variant. Each variant in the
+    reply is validated on its own, with word counts for its locale (see
+    utils.validators.count_words), and the ones that fail or are missing are
+    regenerated together in another combined call, for at most
+    MAX_REPAIR_ROUNDS more rounds.
+
+    Returns {"summary": ..., "variants": {id: result}} in request order, where
+    a result is {"status": "ok", "cache", "output"} or {"status": "error",
+    "error"}. When no variant could be produced, raises what stopped them:
+    RejectedError, DeadlineExceededError or GenerationError.
+    """
+    timings = timings if timings is not None else ServerTiming()
+    prompt_version = variants_prompt_version_for(output_mode)
+    structured = (output_mode or Config.OUTPUT_MODE) == 'structured'
+    namespace = cache_namespace(prompt_version, model_hint)
+
+    results = {}
+    errors = {}
+    cache_keys = {}
+    pending = []
+    cache_status = "DISABLED"
+    for variant in variants:
+        if response_cache is not None:
+            with timings.measure('cache'):
+                # The locale is not a product field, so it goes into the key's namespace
+                cache_key = cache_keys[variant['id']] = make_cache_key(
+                    variant_product(clean_data, variant), f"{namespace}:{variant['locale']}"
+                )
+                if bypass_cache:
+                    response_cache.record_bypass()
+                    cache_status = "BYPASS"
+                    cached_output = None
+                else:
+                    cached_output = await response_cache.get_async(cache_key)
+                    cache_status = "MISS"
+            if cached_output is not None:
+                results[variant['id']] = {"status": "ok", "cache": "HIT", "output": cached_output}
+                continue
+        pending.append(variant)
+
+    models = model_router.route(clean_data, model_hint) if pending else None
+    per_call = max(1, Config.VARIANTS_PER_CALL)
+    calls = rounds = regenerated = 0
+    failure = None
+    while pending and rounds <= Config.MAX_REPAIR_ROUNDS:
+        if rounds:
+            if deadline is not None and deadline.remaining() < Config.MIN_ATTEMPT_SECONDS:
+                break
+            regenerated += len(pending)
+        rounds += 1
+        chunks = [pending[i:i + per_call] for i in range(0, len(pending), per_call)]
+        calls += len(chunks)
+        replies = await asyncio.gather(*(
+            _generate_variant_chunk(clean_data, chunk, prompt_version, structured, models, deadline, timings)
+            for chunk in chunks
+        ), return_exceptions=True)
+
+        failing = []
+        for chunk, reply in zip(chunks, replies):
+            if isinstance(reply, BaseException):
+                if not isinstance(reply, (RejectedError, GenerationError)):
+                    raise reply
+                # The retry policy already gave this call every attempt it could afford
+                failure = reply
+                errors.update((variant['id'], str(reply)) for variant in chunk)
+                continue
+            for variant in chunk:
+                output = reply.get(variant['id'])
+                field_errors = check_output(output, variant['locale']) if isinstance(output, dict) else None
+                if field_errors is None:
+                    errors[variant['id']] = "Variant missing from the model response"
+                elif field_errors:
+                    errors[variant['id']] = f"Invalid output format: {next(iter(field_errors.values()))}"
+                else:
+                    final_output = build_final_output(output)
+                    if response_cache is not None:
+                        await response_cache.set_async(cache_keys[variant['id']], final_output)
+                    results[variant['id']] = {"status": "ok", "cache": cache_status, "output": final_output}
+                    continue
+                failing.append(variant)
+        pending = failing
+
+    if not results:
+        if failure is not None:
+            raise failure
+        raise GenerationError(next(iter(errors.values())))
+
+    ordered = OrderedDict(
+        (variant['id'], results.get(variant['id']) or {"status": "error", "error": errors[variant['id']]})
+        for variant in variants
+    )
+    summary = {
+        "total": len(ordered),
+        "succeeded": len(results),
+        "failed": len(ordered) - len(results),
+        "cached": sum(1 for result in results.values() if result["cache"] == "HIT"),
+        "calls": calls,
+        "rounds": rounds,
+        "regenerated": regenerated,
+    }
+    return {"summary": summary, "variants": ordered}
+
+
+def _field_error(field, value):
+    """Validation message for a single streamed field, or None if it is valid"""
+    return get_output_field_errors({field: value}).get(field)
+
+
+async def stream_description_async(clean_data, bypass_cache=False, output_mode=None, model_hint=None):
+    """Stream a generation as events, one per top-level output field.
+
+    Yields dicts: {"event": "field", "field", "value", "valid", "error"} as
+    each field completes, then a final {"event": "done", "valid", "errors",
+    "cache"} verdict, or {"event": "error", "error"} if generation fails.
+    Fields that fail validation are repaired after the stream ends and
+    re-emitted with "repaired": true. A stream cannot switch models midway,
+    so it uses the route's first model without fallback.
+    """
+    prompt_version = prompt_version_for(output_mode)
+    structured = (output_mode or Config.OUTPUT_MODE) == 'structured'
+    namespace = cache_namespace(prompt_version, model_hint)
+    if response_cache is not None and not bypass_cache:
+        cached_output = await response_cache.get_async(make_cache_key(clean_data, namespace))
+        if cached_output is not None:
+            for field, value in cached_output.items():
+                yield {"event": "field", "field": field, "value": value, "valid": True, "error": None}
+            yield {"event": "done", "valid": True, "errors": {}, "cache": "HIT"}
+            return
+    if response_cache is not None and bypass_cache:
+        response_cache.record_bypass()
+
+    with STAGE_SECONDS.time(stage='prompt_build'):
+        prompt = get_product_description_prompt(clean_data, prompt_version)
+    parser = IncrementalObjectParser()
+    generated_output = {}
+    model_name = model_router.route(clean_data, model_hint)[0]
+
+    try:
+        with admission_controller.slot():
+            reserved_tokens, _ = await _admit_and_wait_for_quota(model_name, prompt)
+            started = time.monotonic()
+            LLM_IN_FLIGHT.inc()
+            try:
+                client = get_model(model_name)
+                if structured:
+                    response = await client.generate_content_async(
+                        prompt, stream=True, generation_config=structured_generation_config()
+                    )
+                else:
+                    response = await client.generate_content_async(prompt, stream=True)
+                async for chunk in response:
+                    for field, value in parser.feed(chunk.text):
+                        if field not in OUTPUT_FIELDS:
+                            continue
+                        generated_output[field] = value
+                        error = _field_error(field, value)
+                        yield {"event": "field", "field": field, "value": value,
+                               "valid": error is None, "error": error}
+            except (asyncio.CancelledError, GeneratorExit):
+                _release_call(model_name)
+                raise
+            except Exception as exc:
+                await _record_model_error(exc, started, model_name)
+                model_router.record(model_name, time.monotonic() - started, False)
+                raise
+            finally:
+                LLM_IN_FLIGHT.dec()
+            elapsed = time.monotonic() - started
+            _record_model_success(model_name, elapsed)
+            STAGE_SECONDS.observe(elapsed, stage='llm_stream')
+            prompt_tokens, response_tokens = await _record_tokens(
+                response, prompt, json.dumps(generated_output), 'stream', reserved_tokens
+            )
+            model_router.record(model_name, elapsed, True, prompt_tokens, response_tokens)
+    except RejectedError as e:
+        yield {"event": "error", "error": str(e), "retry_after": e.retry_after_header}
+        return
+    except Exception as e:
+        yield {"event": "error", "error": f"AI generation failed: {str(e)}"}
+        return
+
+    _count_repair('generations')
+    field_errors = check_output(generated_output)
+    if field_errors:
+        try:
+            repaired_output, field_errors = await repair_output(
+                clean_data, generated_output, field_errors, structured=structured, model_name=model_name
+            )
+        except RejectedError:
+            repaired_output = generated_output
+        for field in OUTPUT_FIELDS:
+            if field in repaired_output and repaired_output[field] != generated_output.get(field):
+                error = _field_error(field, repaired_output[field])
+                yield {"event": "field", "field": field, "value": repaired_output[field],
+                       "valid": error is None, "error": error, "repaired": True}
+        generated_output = repaired_output
+
+    cache_status = "BYPASS" if bypass_cache else "MISS"
+    if response_cache is None:
+        cache_status = "DISABLED"
+    elif not field_errors:
+        await response_cache.set_async(make_cache_key(clean_data, namespace), build_final_output(generated_output))
+
+    yield {"event": "done", "valid": not field_errors, "errors": field_errors, "cache": cache_status}
+
+
+def _retry_collector():
+    stats = retry_policy.stats()
+    return [
+        ('pdg_llm_attempt_outcomes_total', 'counter', 'Gemini calls by final or intermediate retry outcome',
+         [({'outcome': outcome}, count) for outcome, count in stats['outcomes'].items()]),
+        ('pdg_llm_errors_total', 'counter', 'Failed Gemini attempts by classified reason',
+         [({'reason': reason}, count) for reason, count in stats['errors_by_reason'].items()]),
+    ]
+
+
+def _template_collector():
+    stats = templates.stats()['templates']
+    return [
+        ('pdg_prompt_renders_total', 'counter', 'Prompts rendered per template version',
+         [({'version': version}, t['renders']) for version, t in stats.items()]),
+        ('pdg_prompt_estimated_tokens_total', 'counter', 'Estimated prompt tokens rendered per template version',
+         [({'version': version}, t['total_estimated_tokens']) for version, t in stats.items()]),
+    ]
+
+
+def _model_collector():
+    models = model_router.stats()['models']
+
+    def samples(key, scale=1.0):
+        return [({'model': name}, stats[key] * scale) for name, stats in models.items() if stats[key] is not None]
+    return [
+        ('pdg_model_calls_total', 'counter', 'Gemini calls per pooled model', samples('calls')),
+        ('pdg_model_fallback_calls_total', 'counter', 'Calls a model served as a fallback', samples('fallback_calls')),
+        ('pdg_model_errors_total', 'counter', 'Failed Gemini calls per pooled model', samples('errors')),
+        ('pdg_model_cut_off_total', 'counter', 'Calls per pooled model cut off by the response deadline',
+         samples('cut_off')),
+        ('pdg_model_cost_usd_total', 'counter', 'Estimated spend per pooled model in USD', samples('cost_usd')),
+        ('pdg_model_latency_ewma_seconds', 'gauge', 'Call latency EWMA per pooled model',
+         samples('latency_ewma_ms', 0.001)),
+        ('pdg_model_error_rate_ewma', 'gauge', 'Error rate EWMA per pooled model', samples('error_rate_ewma')),
+    ]
+
+
+def _breaker_state_collector():
+    state = circuit_breaker.state
+    return [('pdg_circuit_breaker_state', 'gauge', 'Circuit breaker state (1 for the current state)',
+             [({'state': name}, int(name == state))
+              for name in (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN)])]
+
+
+if response_cache is not None:
+    REGISTRY.register_collector(stats_collector('cache', 'Response cache counters', response_cache.stats))
+REGISTRY.register_collector(_retry_collector)
+REGISTRY.register_collector(_template_collector)
+REGISTRY.register_collector(_breaker_state_collector)
+REGISTRY.register_collector(stats_collector('circuit_breaker', 'Circuit breaker counters', circuit_breaker.stats))
+REGISTRY.register_collector(stats_collector('admission', 'Admission control counters', admission_controller.stats))
+REGISTRY.register_collector(stats_collector('hedging', 'Hedged request counters', hedge_stats))
+REGISTRY.register_collector(stats_collector('repairs', 'Output repair counters', repair_stats))
+if rate_limiter is not None:
+    REGISTRY.register_collector(stats_collector('rate_limiter', 'Client-side Gemini quota pacing', rate_limiter.stats))
+REGISTRY.register_collector(stats_collector('coalescing', 'Single-flight request coalescing counters', single_flight.stats))
+if semantic_cache is not None:
+    REGISTRY.register_collector(stats_collector('semantic_cache', 'Near-duplicate cache counters', semantic_cache.stats))
+REGISTRY.register_collector(_model_collector)
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop():
+    """Start (once) the background event loop that sync callers submit work to"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name='generation-loop', daemon=True)
+            thread.start()
+        return _loop
+
+
+def run_coroutine(coro):
+    """Run a coroutine on the shared background loop and block for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+def generate_for_product(clean_data, bypass_cache=False, deadline=None, timings=None, output_mode=None,
+                         model_hint=None):
+    """Synchronous wrapper around generate_description_async"""
+    return run_coroutine(generate_description_async(
+        clean_data, bypass_cache=bypass_cache, deadline=deadline, timings=timings, output_mode=output_mode,
+        model_hint=model_hint,
+    ))
+
+
+def generate_batch(products, bypass_cache=False, concurrency=None, output_mode=None, model_hint=None):
+    """Synchronous wrapper around generate_batch_async"""
+    return run_coroutine(generate_batch_async(
+        products, bypass_cache=bypass_cache, concurrency=concurrency, output_mode=output_mode,
+        model_hint=model_hint,
+    ))
+
+
+def generate_variants(clean_data, variants, bypass_cache=False, deadline=None, timings=None, output_mode=None,
+                      model_hint=None):
+    """Synchronous wrapper around generate_variants_async"""
+    return run_coroutine(generate_variants_async(
+        clean_data, variants, bypass_cache=bypass_cache, deadline=deadline, timings=timings,
+        output_mode=output_mode, model_hint=model_hint,
+    ))
+
+
+def iterate_stream(agen):
+    """Drive an async generator on the background loop from synchronous code"""
+    loop = _get_loop()
+    try:
+        while True:
+            try:
+                item = asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+
+async def run_on_generation_loop(coro):
+    """Await a coroutine run on the shared background loop from another event loop.
+
+    Model clients (Gemini's async gRPC client) are bound to the loop that
+    first uses them, so every generation runs on this one loop. Cancelling
+    the caller cancels the coroutine.
+    """
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, _get_loop()))
+
+
+async def stream_on_generation_loop(agen):
+    """iterate_stream for async callers on another event loop"""
+    try:
+        while True:
+            try:
+                item = await run_on_generation_loop(agen.__anext__())
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        await run_on_generation_loop(agen.aclose())
@@ -0,0 +1,296 @@
+"""Incremental regeneration of stored product descriptions.
+
+PUT /products/<id>/description keeps a generation record per product id:
+the clean input snapshot, the output and the prompt version it was made
+with. When the product is sent again, the new input is diffed against the
+snapshot and only the output fields that depend on a changed attribute
+(FIELD_DEPENDENCIES) are regenerated, with a reduced prompt that states the
+change and shows the kept fields. A price edit within the same price tier
+regenerates nothing; standalone occurrences of the old price are rewritten
+in the kept text (utils.semantic_cache.patch_output). A new product, a
+record made with another prompt version, a Cache-Control: no-cache request
+or a change that affects every field gets a full generation.
+
+Updates to one product id are applied one at a time, in arrival order.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from prompts.prompt_templates import get_price_category, get_update_prompt, prompt_version_for
+from services import generation
+from services.generation import (
+    GenerationError,
+    admission_controller,
+    build_final_output,
+    cache_namespace,
+    check_output,
+    generate_description_async,
+    model_router,
+    parse_model_output,
+    repair_output,
+    response_cache,
+    retry_policy,
+    structured_generation_config,
+)
+from services.model_router import RouteCursor
+from utils.cache import canonicalize_product, make_cache_key, normalize_text
+from utils.metrics import REGISTRY, stats_collector
+from utils.record_store import MemoryRecordStore, SQLiteRecordStore
+from utils.retry import RetryError
+from utils.semantic_cache import patch_output
+from utils.timing import ServerTiming
+from utils.validators import OUTPUT_FIELDS
+
+# Output field -> the product attributes it is written from ('price_tier' is get_price_category(price))
+FIELD_DEPENDENCIES = {
+    'short_description': frozenset({'product_name', 'category', 'key_features', 'price_tier', 'target_audience', 'tone'}),
+    'detailed_description': frozenset({'product_name', 'category', 'key_features', 'price_tier', 'target_audience', 'tone'}),
+    'bullet_points': frozenset({'category', 'key_features', 'target_audience', 'tone'}),
+    'seo_keywords': frozenset({'product_name', 'category', 'key_features'}),
+    'call_to_action': frozenset({'product_name', 'price_tier', 'target_audience', 'tone'}),
+}
+
+# Kept fields shown to the model in an update prompt; detailed_description is left out to keep it small
+CONTEXT_FIELDS = ('short_description', 'bullet_points', 'seo_keywords', 'call_to_action')
+
+
+def diff_products(old, new):
+    """Attributes that differ between two clean products, as {attribute: change}.
+
+    Compared in canonical form (see utils.cache.canonicalize_product), so
+    whitespace and feature order do not count. A change is {'from', 'to'},
+    or {'removed', 'added'} for key_features; 'price_tier' appears when the
+    price moved into another tier.
+    """
+    before, after = canonicalize_product(old), canonicalize_product(new)
+    changes = {}
+    for attribute in ('product_name', 'category'):
+        if before[attribute] != after[attribute]:
+            changes[attribute] = {'from': old.get(attribute), 'to': new.get(attribute)}
+    if before['key_features'] != after['key_features']:
+        changes['key_features'] = {
+            'removed': [f for f in old.get('key_features', []) if normalize_text(f) not in after['key_features']],
+            'added': [f for f in new.get('key_features', []) if normalize_text(f) not in before['key_features']],
+        }
+    if before['price'] != after['price']:
+        changes['price'] = {'from': before['price'], 'to': after['price']}
+        old_tier, new_tier = get_price_category(before['price']), get_price_category(after['price'])
+        if old_tier != new_tier:
+            changes['price_tier'] = {'from': old_tier, 'to': new_tier}
+    for attribute in ('target_audience', 'tone'):
+        if before[attribute] != after[attribute]:
+            changes[attribute] = {'from': before[attribute], 'to': after[attribute]}
+    return changes
+
+
+def affected_fields(changes):
+    """Output fields that depend on any changed attribute, in output order"""
+    return [field for field in OUTPUT_FIELDS if FIELD_DEPENDENCIES[field] & changes.keys()]
+
+
+class RecordManager:
+    """Owns the generation records and applies product edits to them"""
+
+    def __init__(self, store):
+        self.store = store
+        # SQLite reads and writes from coroutines run here, off the generation loop
+        self._store_executor = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix='record-store')
+            if isinstance(store, SQLiteRecordStore) else None
+        )
+        self._lock = threading.Lock()
+        self._updating = {}  # product_id -> [asyncio.Lock, users]; only touched on the generation loop
+        self._counters = {
+            'updates': 0, 'created': 0, 'full': 0, 'incremental': 0, 'patched': 0, 'unchanged': 0,
+            'fields_regenerated': 0, 'fields_reused': 0,
+        }
+
+    def get(self, product_id):
+        return self.store.get(product_id)
+
+    def delete(self, product_id):
+        return self.store.delete(product_id)
+
+    async def _run_store(self, fn, *args):
+        if self._store_executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self._store_executor, fn, *args)
+
+    async def get_async(self, product_id):
+        """get() for coroutines; a SQLite store is read off the event loop"""
+        return await self._run_store(self.store.get, product_id)
+
+    async def save_async(self, record):
+        """store.save() for coroutines; a SQLite store is written off the event loop"""
+        await self._run_store(self.store.save, record)
+
+    async def delete_async(self, product_id):
+        """delete() for coroutines"""
+        return await self._run_store(self.store.delete, product_id)
+
+    async def update_async(self, product_id, clean_data, bypass_cache=False, deadline=None, timings=None,
+                           output_mode=None, model_hint=None):
+        """Bring the record for product_id up to date with clean_data; returns the update result.
+
+        The result holds the product id, the mode ('created', 'full',
+        'incremental', 'patched' or 'unchanged'), the changes found, the
+        regenerated fields, the record's revision and prompt version, and
+        the output. Raises like generate_description_async; the stored
+        record is left untouched when the update fails.
+        """
+        entry = self._updating.get(product_id)
+        if entry is None:
+            entry = self._updating[product_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                return await self._update(
+                    product_id, clean_data, bypass_cache, deadline,
+                    timings if timings is not None else ServerTiming(), output_mode, model_hint,
+                )
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._updating[product_id]
+
+    async def _update(self, product_id, clean_data, bypass_cache, deadline, timings, output_mode, model_hint):
+        prompt_version = prompt_version_for(output_mode)
+        structured = (output_mode or Config.OUTPUT_MODE) == 'structured'
+        record = await self.get_async(product_id)
+        changes = diff_products(record['input'], clean_data) if record is not None else {}
+        fields = affected_fields(changes)
+
+        if record is None or bypass_cache or record['prompt_version'] != prompt_version or len(fields) == len(OUTPUT_FIELDS):
+            mode = 'created' if record is None else 'full'
+            fields = list(OUTPUT_FIELDS)
+            output, _ = await generate_description_async(
+                clean_data, bypass_cache=bypass_cache, deadline=deadline, timings=timings,
+                output_mode=output_mode, model_hint=model_hint,
+            )
+        else:
+            output = record['output']
+            if 'price' in changes:
+                # The exact price may appear in the kept text even when its tier is unchanged. Only
+                # standalone price numbers are rewritten; a kept field the patch broke is regenerated
+                output = patch_output(output, {'price': changes['price']['from']}, {'price': changes['price']['to']})
+                broken = check_output(output)
+                fields = [field for field in OUTPUT_FIELDS if field in fields or field in broken]
+            if fields:
+                mode = 'incremental'
+                output = await self._regenerate_fields(
+                    clean_data, output, changes, fields, deadline, timings, structured, model_hint
+                )
+            else:
+                mode = 'patched' if changes else 'unchanged'
+                output = build_final_output(output)
+            if changes and response_cache is not None:
+                await response_cache.set_async(
+                    make_cache_key(clean_data, cache_namespace(prompt_version, model_hint)), output
+                )
+
+        now = round(time.time(), 3)
+        if mode != 'unchanged':
+            record = {
+                'product_id': product_id,
+                'revision': record['revision'] + 1 if record is not None else 1,
+                'prompt_version': prompt_version,
+                'created_at': record['created_at'] if record is not None else now,
+                'updated_at': now,
+                'input': clean_data,
+                'output': output,
+            }
+            await self.save_async(record)
+
+        with self._lock:
+            self._counters['updates'] += 1
+            self._counters[mode] += 1
+            self._counters['fields_regenerated'] += len(fields)
+            self._counters['fields_reused'] += len(OUTPUT_FIELDS) - len(fields)
+        return {
+            'product_id': product_id,
+            'mode': mode,
+            'changes': changes,
+            'regenerated_fields': fields,
+            'revision': record['revision'],
+            'prompt_version': prompt_version,
+            'output': output,
+        }
+
+    async def _regenerate_fields(self, clean_data, output, changes, fields, deadline, timings, structured, model_hint):
+        """One reduced Gemini call for the affected fields, merged over the kept ones and validated"""
+        kept = {field: output[field] for field in CONTEXT_FIELDS if field not in fields and field in output}
+        prompt = get_update_prompt(clean_data, changes, fields, kept, structured=structured)
+        generation_config = structured_generation_config(fields) if structured else None
+        cursor = RouteCursor(model_router, model_router.route(clean_data, model_hint))
+
+        async def attempt():
+            # Retries move down the route's fallback list
+            model_name, fallback = cursor.next()
+            with timings.measure('llm'):
+                raw_response = await generation._call_model(
+                    prompt, deadline.remaining() if deadline is not None else None, kind='update',
+                    generation_config=generation_config, model_name=model_name, fallback=fallback,
+                    has_fallback=cursor.has_fallback,
+                )
+            with timings.measure('postprocess'):
+                return parse_model_output(raw_response, structured)
+
+        with admission_controller.slot():
+            try:
+                patch = await retry_policy.run_async(
+                    attempt, deadline=deadline, min_attempt_seconds=Config.MIN_ATTEMPT_SECONDS,
+                    failover=cursor.has_fallback,
+                )
+            except RetryError as e:
+                generation._raise_for_retry_error(e, deadline, 'update')
+
+        generation._count_repair('generations')
+        patch = patch if isinstance(patch, dict) else {}
+        merged = dict(output)
+        merged.update({field: patch[field] for field in fields if field in patch})
+        with timings.measure('postprocess'):
+            field_errors = check_output(merged)
+        # A requested field the model left out would otherwise keep its stale value
+        for field in fields:
+            if field not in patch:
+                field_errors.setdefault(field, f"Missing required field: {field}")
+
+        if field_errors:
+            with timings.measure('repair'):
+                merged, field_errors = await repair_output(
+                    clean_data, merged, field_errors, deadline=deadline, structured=structured,
+                    model_name=cursor.current,
+                )
+        if field_errors:
+            raise GenerationError(f"Invalid output format: {next(iter(field_errors.values()))}")
+        return build_final_output(merged)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['records'] = len(self.store)
+        stats['evictions'] = self.store.evictions
+        stats['durable'] = isinstance(self.store, SQLiteRecordStore)
+        total = stats['fields_regenerated'] + stats['fields_reused']
+        stats['fields_reused_ratio'] = round(stats['fields_reused'] / total, 4) if total else 0.0
+        return stats
+
+
+record_manager = RecordManager(
+    SQLiteRecordStore(Config.RECORDS_DB_PATH) if Config.RECORDS_DB_PATH
+    else MemoryRecordStore(maxsize=Config.RECORDS_MAX_ENTRIES)
+)
+
+REGISTRY.register_collector(stats_collector('records', 'Generation record and incremental update counters', record_manager.stats))
+
+
+def update_description(product_id, clean_data, bypass_cache=False, deadline=None, timings=None, output_mode=None,
+                       model_hint=None):
+    """Synchronous wrapper around record_manager.update_async"""
+    return generation.run_coroutine(record_manager.update_async(
+        product_id, clean_data, bypass_cache=bypass_cache, deadline=deadline, timings=timings,
+        output_mode=output_mode, model_hint=model_hint,
+    ))
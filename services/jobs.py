@@ -0,0 +1,483 @@
+"""Asynchronous generation jobs.
+
+Clients submit a product and get a job id back immediately; a fixed pool of
+worker coroutines on the generation event loop drains a FairQueue and the
+client polls GET /jobs/<id> or receives a callback POST when the job
+finishes. Callbacks are delivered on tasks of their own, so a slow or dead
+callback endpoint never holds a worker. With JOBS_DB_PATH set, job records
+are kept in SQLite and jobs that were queued or running when the process
+stopped are re-queued on start-up.
+
+The worker pool is deliberately smaller than MAX_IN_FLIGHT_GENERATIONS so
+background jobs can never take every admission slot from interactive
+requests.
+"""
+import asyncio
+import atexit
+import copy
+import ipaddress
+import logging
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from urllib.parse import urlparse
+
+from config import Config
+from services import generation
+from services.generation import GenerationError, generate_description_async
+from utils.circuit_breaker import RejectedError
+from utils.job_queue import PRIORITY_WEIGHTS, FairQueue, SQLiteJobStore
+from utils.metrics import REGISTRY, stats_collector
+from utils.timing import Deadline
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = tuple(PRIORITY_WEIGHTS)
+
+# Fields of a job record returned to clients (the stored record also keeps the input)
+PUBLIC_FIELDS = (
+    'id', 'status', 'tenant', 'priority', 'attempts', 'created_at', 'started_at', 'finished_at',
+    'cache', 'result', 'error', 'callback',
+)
+
+
+class QueueFullError(RejectedError):
+    """Raised when the job queue already holds JOBS_MAX_QUEUED jobs"""
+
+
+def _internal_address(address):
+    """True for loopback, private, link-local, multicast, reserved and other non-public addresses"""
+    ip = ipaddress.ip_address(address.split('%', 1)[0])  # drop an IPv6 zone id
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return not ip.is_global or ip.is_multicast
+
+
+def _host_allowed(host, allowed):
+    """host is in the allowlist itself or a subdomain of an entry"""
+    host = host.rstrip('.').casefold()
+    return any(host == entry or host.endswith('.' + entry) for entry in allowed)
+
+
+def check_callback_url(url):
+    """Validate a callback URL; returns (error message or None, address to connect to or None).
+
+    Callbacks are POSTed from inside our network, so unless
+    JOBS_CALLBACK_ALLOW_PRIVATE is set, every address the host resolves to
+    must be public, and the delivery connects to the returned address instead
+    of resolving the host again (which a rebinding DNS server could answer
+    differently). JOBS_CALLBACK_ALLOWED_HOSTS further restricts the hosts.
+    Resolves DNS, so it blocks for the lookup.
+    """
+    if not isinstance(url, str) or not url:
+        return "callback_url must be a non-empty string", None
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        return "callback_url must be an absolute http(s) URL", None
+    try:
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    except ValueError:
+        return "callback_url has an invalid port", None
+    if Config.JOBS_CALLBACK_ALLOWED_HOSTS and not _host_allowed(parsed.hostname, Config.JOBS_CALLBACK_ALLOWED_HOSTS):
+        return f"callback_url host {parsed.hostname} is not in the allowed callback hosts", None
+    if Config.JOBS_CALLBACK_ALLOW_PRIVATE:
+        return None, None
+    try:
+        addresses = [info[4][0] for info in socket.getaddrinfo(parsed.hostname, port, type=socket.SOCK_STREAM)]
+    except (socket.gaierror, UnicodeError):
+        return f"callback_url host cannot be resolved: {parsed.hostname}", None
+    if not addresses or any(_internal_address(address) for address in addresses):
+        return "callback_url must not point at a loopback, private, link-local or other internal address", None
+    return None, addresses[0]
+
+
+def validate_callback_url(url):
+    """Return an error message for an unusable callback URL, or None (see check_callback_url)"""
+    return check_callback_url(url)[0]
+
+
+def _pinned_session(address):
+    """A requests session that connects to `address` whatever the URL's host resolves to.
+
+    The URL's host is kept for the Host header, TLS SNI and certificate
+    verification.
+    """
+    import requests  # only callbacks need it; kept off the start-up import path
+    from requests.adapters import HTTPAdapter
+
+    class PinnedAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            parsed = urlparse(request.url)
+            pinned_host = f"[{address}]" if ':' in address else address
+            request.headers['Host'] = parsed.netloc.rpartition('@')[2]
+            request.url = parsed._replace(
+                netloc=pinned_host + (f":{parsed.port}" if parsed.port else '')
+            ).geturl()
+            if parsed.scheme == 'https':
+                self.poolmanager.connection_pool_kw.update(
+                    server_hostname=parsed.hostname, assert_hostname=parsed.hostname
+                )
+            return super().send(request, **kwargs)
+
+    session = requests.Session()
+    session.trust_env = False  # a proxy would resolve the host itself
+    session.mount('http://', PinnedAdapter())
+    session.mount('https://', PinnedAdapter())
+    return session
+
+
+def public_view(record):
+    return {field: record.get(field) for field in PUBLIC_FIELDS}
+
+
+def _log_save_error(future):
+    if future.exception() is not None:
+        logger.error("Job store write failed", exc_info=future.exception())
+
+
+def _log_callback_error(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Job callback delivery failed", exc_info=task.exception())
+
+
+class JobManager:
+    """Owns the job queue, the job records and the worker pool"""
+
+    def __init__(self, workers=4, max_queued=10000, result_ttl=86400, max_attempts=5,
+                 job_timeout=120.0, callback_timeout=10.0, callback_attempts=3, store=None, max_finished=10000):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self.max_finished = max_finished
+        self.max_attempts = max_attempts
+        self.job_timeout = job_timeout
+        self.callback_timeout = callback_timeout
+        self.callback_attempts = callback_attempts
+        self.store = store
+
+        self._lock = threading.Lock()
+        self._queue = FairQueue()
+        self._records = {}
+        self._finished = deque()  # (finished_at, job_id) in completion order, for expiry
+        self._running = 0
+        self._counters = {
+            'submitted': 0, 'succeeded': 0, 'failed': 0, 'cancelled': 0, 'requeued': 0, 'recovered': 0,
+            'callbacks_delivered': 0, 'callbacks_failed': 0,
+        }
+        self._loop = None
+        self._wakeup = None
+        self._callbacks = set()  # delivery tasks in progress; only touched on the generation loop
+        # One thread, so writes land in the order they were queued and never block the generation loop
+        self._store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='job-store') if store else None
+        # Recovery starts the generation loop, so it waits for app start or the first use (recover())
+        self._recovered = store is None
+        self._recover_lock = threading.Lock()
+
+    def recover(self):
+        """Re-queue jobs a previous process accepted but never finished and purge expired results (once)"""
+        if self._recovered:
+            return
+        with self._recover_lock:
+            if self._recovered:
+                return
+            self.store.purge(time.time() - self.result_ttl)
+            records = self.store.unfinished()
+            with self._lock:
+                for record in records:
+                    record['status'] = 'queued'
+                    self._records[record['id']] = record
+                    self._queue.put(record['id'], record['tenant'], record['priority'])
+                    self._counters['recovered'] += 1
+            if records:
+                logger.info("Recovered unfinished jobs", extra={"jobs": len(records)})
+                self._ensure_started()
+            self._recovered = True
+
+    def _ensure_started(self):
+        """Start the worker coroutines on the generation loop (once)"""
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = generation._get_loop()
+        asyncio.run_coroutine_threadsafe(self._start_workers(), self._loop).result()
+
+    async def _start_workers(self):
+        self._wakeup = asyncio.Event()
+        for _ in range(self.workers):
+            asyncio.ensure_future(self._worker())
+
+    def _notify(self):
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _save(self, record):
+        """Queue a write of the record as it is now; caller holds self._lock.
+
+        Returns the write's future, or None without a store. Holding the lock
+        keeps the writes in the order of the state changes they record.
+        """
+        if self.store is None:
+            return None
+        future = self._store_executor.submit(self.store.save, copy.deepcopy(record))
+        future.add_done_callback(_log_save_error)
+        return future
+
+    def submit(self, product, tenant='default', priority='normal', callback_url=None,
+               bypass_cache=False, output_mode=None, model_hint=None):
+        """Queue one clean product; returns the public job record.
+
+        Raises ValueError for an unknown priority and QueueFullError when the
+        queue is at capacity.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority} (expected one of {', '.join(PRIORITIES)})")
+        self.recover()
+        self._ensure_started()
+
+        now = time.time()
+        record = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'tenant': tenant,
+            'priority': priority,
+            'attempts': 0,
+            'created_at': round(now, 3),
+            'started_at': None,
+            'finished_at': None,
+            'cache': None,
+            'result': None,
+            'error': None,
+            'callback': {'url': callback_url, 'status': 'pending', 'attempts': 0} if callback_url else None,
+            'product': product,
+            'options': {'bypass_cache': bypass_cache, 'output_mode': output_mode, 'model_hint': model_hint},
+        }
+        with self._lock:
+            self._expire(now)
+            if len(self._queue) >= self.max_queued:
+                raise QueueFullError(f"Job queue is full ({self.max_queued} jobs queued)", 5.0)
+            self._records[record['id']] = record
+            self._queue.put(record['id'], tenant, priority)
+            self._counters['submitted'] += 1
+            view = public_view(record)
+            saved = self._save(record)
+        if saved is not None:
+            saved.result()  # the job is durable before it is acknowledged
+        self._notify()
+        return view
+
+    def get(self, job_id):
+        """Public record for a job id, or None if unknown or expired"""
+        self.recover()
+        with self._lock:
+            self._expire(time.time())
+            record = self._records.get(job_id)
+            if record is not None:
+                return public_view(record)
+        if self.store is not None:
+            record = self.store.get(job_id)
+            if record is not None:
+                return public_view(record)
+        return None
+
+    def cancel(self, job_id):
+        """Cancel a queued job. Returns (public_record, cancelled) or (None, False) if unknown"""
+        self.recover()
+        with self._lock:
+            record = self._records.get(job_id)
+            if record is None:
+                return None, False
+            if record['status'] != 'queued':
+                return public_view(record), False
+            # Not in the queue while it waits to be re-queued after load shedding; _requeue skips it
+            self._queue.remove(job_id, record['tenant'], record['priority'])
+            self._mark_finished(record, 'cancelled')
+            view = public_view(record)
+            saved = self._save(record)
+        if saved is not None:
+            saved.result()
+        return view, True
+
+    def _mark_finished(self, record, status):
+        """Caller holds self._lock"""
+        now = time.time()
+        record['status'] = status
+        record['finished_at'] = round(now, 3)
+        self._counters[status] += 1
+        self._finished.append((now, record['id']))
+        self._expire(now)
+
+    def _expire(self, now):
+        """Forget finished jobs older than result_ttl, oldest first past max_finished; caller holds self._lock.
+
+        With a store, get() still finds a job forgotten for the cap until result_ttl.
+        """
+        while self._finished and (self._finished[0][0] < now - self.result_ttl
+                                  or len(self._finished) > self.max_finished):
+            _, job_id = self._finished.popleft()
+            self._records.pop(job_id, None)
+
+    def _next_job(self):
+        with self._lock:
+            job_id = self._queue.pop()
+            if job_id is None:
+                return None
+            record = self._records[job_id]
+            record['status'] = 'running'
+            record['started_at'] = round(time.time(), 3)
+            record['attempts'] += 1
+            self._running += 1
+            self._save(record)
+        return record
+
+    async def _worker(self):
+        while True:
+            record = self._next_job()
+            if record is None:
+                self._wakeup.clear()
+                # Re-check after clearing so a submit that raced with the clear is not missed
+                record = self._next_job()
+                if record is None:
+                    await self._wakeup.wait()
+                    continue
+            try:
+                await self._run(record)
+            except Exception:
+                logger.exception("Job worker error", extra={"job_id": record['id']})
+
+    async def _run(self, record):
+        options = record['options']
+        status, retry_after = 'failed', None
+        try:
+            output, cache_status = await generate_description_async(
+                record['product'], bypass_cache=options['bypass_cache'],
+                deadline=Deadline(self.job_timeout), output_mode=options['output_mode'],
+                model_hint=options.get('model_hint'),
+            )
+            record['result'], record['cache'], record['error'] = output, cache_status, None
+            status = 'succeeded'
+        except RejectedError as e:
+            # The breaker or admission control shed the job: try again later instead of failing it
+            record['error'] = str(e)
+            if record['attempts'] < self.max_attempts:
+                status, retry_after = 'queued', e.retry_after
+        except GenerationError as e:
+            record['error'] = str(e)
+        except Exception as e:
+            record['error'] = f"Internal server error: {str(e)}"
+
+        with self._lock:
+            self._running -= 1
+            if status == 'queued':
+                record['status'] = 'queued'
+                self._counters['requeued'] += 1
+            else:
+                self._mark_finished(record, status)
+            self._save(record)
+
+        if retry_after is not None:
+            self._loop.call_later(retry_after, self._requeue, record)
+        elif record['callback'] is not None:
+            # Up to callback_attempts x callback_timeout plus backoff: the worker moves on to the next job
+            task = asyncio.ensure_future(self._deliver_callback(record))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+            task.add_done_callback(_log_callback_error)
+
+    def _requeue(self, record):
+        with self._lock:
+            if record['status'] != 'queued':
+                return
+            self._queue.put(record['id'], record['tenant'], record['priority'])
+        self._wakeup.set()
+
+    async def _deliver_callback(self, record):
+        """POST the finished job to its callback URL, retrying with exponential backoff"""
+        import requests  # only callbacks need it; kept off the start-up import path
+
+        callback = record['callback']
+        payload = public_view(record)
+        loop = asyncio.get_running_loop()
+        for attempt in range(1, self.callback_attempts + 1):
+            callback['attempts'] = attempt
+            # Checked again at delivery: the host's DNS may have changed since the job was accepted
+            url_error, address = await loop.run_in_executor(None, check_callback_url, callback['url'])
+            if url_error:
+                callback['error'] = url_error
+                callback['status'] = 'failed'
+                break
+            try:
+                # The connection goes to the address just checked, and redirects are not
+                # followed, since either could lead to an internal address
+                with _pinned_session(address) if address is not None else requests.Session() as session:
+                    response = await loop.run_in_executor(None, lambda: session.post(
+                        callback['url'], json=payload, timeout=self.callback_timeout, allow_redirects=False
+                    ))
+                if response.status_code < 300:
+                    callback['status'] = 'delivered'
+                    callback['error'] = None
+                    break
+                callback['error'] = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                callback['error'] = str(e)
+            if attempt < self.callback_attempts:
+                await asyncio.sleep(2 ** (attempt - 1))
+        else:
+            callback['status'] = 'failed'
+        if callback['status'] == 'failed':
+            logger.warning("Job callback failed", extra={
+                "job_id": record['id'], "url": callback['url'], "error": callback['error']
+            })
+
+        with self._lock:
+            self._counters['callbacks_delivered' if callback['status'] == 'delivered' else 'callbacks_failed'] += 1
+            self._save(record)
+
+    async def drain_callbacks(self):
+        """Wait for every callback delivery in progress"""
+        while self._callbacks:
+            await asyncio.wait(list(self._callbacks))
+
+    def shutdown(self, timeout=None):
+        """Give callback deliveries in progress up to timeout seconds to finish; for process shutdown"""
+        if self._loop is None or not self._loop.is_running():
+            return
+        future = asyncio.run_coroutine_threadsafe(self.drain_callbacks(), self._loop)
+        try:
+            future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.warning("Job callbacks still pending at shutdown", extra={"callbacks": len(self._callbacks)})
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'workers': self.workers,
+                'queued': len(self._queue),
+                'running': self._running,
+                'callbacks_pending': len(self._callbacks),
+                'tenants_waiting': self._queue.tenants(),
+                'queued_by_priority': self._queue.depth(),
+                'durable': self.store is not None,
+            }
+            stats.update(self._counters)
+        return stats
+
+
+job_manager = JobManager(
+    workers=Config.JOBS_WORKERS,
+    max_queued=Config.JOBS_MAX_QUEUED,
+    result_ttl=Config.JOBS_RESULT_TTL_SECONDS,
+    max_attempts=Config.JOBS_MAX_ATTEMPTS,
+    job_timeout=Config.JOBS_TIMEOUT_SECONDS,
+    callback_timeout=Config.JOBS_CALLBACK_TIMEOUT_SECONDS,
+    callback_attempts=Config.JOBS_CALLBACK_ATTEMPTS,
+    store=SQLiteJobStore(Config.JOBS_DB_PATH) if Config.JOBS_DB_PATH else None,
+    max_finished=Config.JOBS_MAX_FINISHED,
+)
+
+REGISTRY.register_collector(stats_collector('jobs', 'Background job queue counters', job_manager.stats))
+
+# Flask-only processes have no lifespan hook; under uvicorn asgi.py drains on lifespan shutdown first
+atexit.register(job_manager.shutdown, Config.JOBS_SHUTDOWN_GRACE_SECONDS)
@@ -0,0 +1,222 @@
+"""Model backends behind the generation service.
+
+A backend exposes the subset of google.generativeai.GenerativeModel the
+service uses:
+
+    response = await backend.generate_content_async(prompt)
+    response.text, response.usage_metadata
+
+    stream = await backend.generate_content_async(prompt, stream=True)
+    async for chunk in stream: chunk.text
+
+GeminiBackend talks to the real API; FakeBackend is a deterministic local
+stand-in with configurable latency, error and malformed-output rates for
+tests and benchmarks.
+"""
+import abc
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+
+from config import Config
+
+
+class ModelResponse:
+    """Minimal response object: text plus optional usage metadata"""
+
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class UsageMetadata:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class ModelBackend(abc.ABC):
+    """Interface every backend implements"""
+
+    name = 'base'
+
+    @abc.abstractmethod
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        """Return a ModelResponse, or an async iterable of chunks when stream=True"""
+
+    def describe(self):
+        """Settings worth reporting alongside benchmark results"""
+        return {'backend': self.name}
+
+
+class GeminiBackend(ModelBackend):
+    """google.generativeai.GenerativeModel behind the backend interface"""
+
+    name = 'gemini'
+
+    def __init__(self, model_name, api_key):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self._model = genai.GenerativeModel(model_name)
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        return await self._model.generate_content_async(prompt, stream=stream, **kwargs)
+
+    def describe(self):
+        return {'backend': self.name, 'model': self.model_name}
+
+
+class FakeBackendError(Exception):
+    """Injected failure; `code` lets utils.retry classify it like a real API error"""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+class _FakeStream:
+    def __init__(self, text, latency, chunk_size=64):
+        self._chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)] or ['']
+        self._delay = latency / len(self._chunks)
+        self.usage_metadata = None
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self._chunks:
+            await asyncio.sleep(self._delay)
+            yield ModelResponse(chunk)
+
+
+class FakeBackend(ModelBackend):
+    """Deterministic local backend.
+
+    latency: 'fixed', 'uniform' (mean +/- spread ms) or 'lognormal' (median
+    mean_ms, sigma spread). error_rate and malformed_rate are probabilities
+    per call; errors alternate between 429 and 503 so retry classification
+    is exercised. Calls with a JSON response schema are never malformed.
+    Draws come from one seeded RNG, so a serial run is fully reproducible.
+    """
+
+    name = 'fake'
+
+    _LINE = re.compile(r'^- (Product Name|Key Features): (.*)$', re.MULTILINE)
+    _VARIANT = re.compile(r'^- ([A-Za-z0-9_.-]+): locale ', re.MULTILINE)
+
+    def __init__(self, latency='fixed', mean_ms=50.0, spread=0.0,
+                 error_rate=0.0, malformed_rate=0.0, seed=0):
+        self.latency = latency
+        self.mean_ms = mean_ms
+        self.spread = spread
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        """Return (latency_seconds, outcome) for one call"""
+        with self._lock:
+            if self.latency == 'uniform':
+                delay_ms = self._rng.uniform(self.mean_ms - self.spread, self.mean_ms + self.spread)
+            elif self.latency == 'lognormal':
+                delay_ms = self._rng.lognormvariate(math.log(self.mean_ms), self.spread)
+            else:
+                delay_ms = self.mean_ms
+            roll = self._rng.random()
+        if roll < self.error_rate:
+            outcome = 'error'
+        elif roll < self.error_rate + self.malformed_rate:
+            outcome = 'malformed'
+        else:
+            outcome = 'ok'
+        return max(0.0, delay_ms) / 1000.0, outcome
+
+    def _render_output(self, prompt, fields=None):
+        details = dict(self._LINE.findall(prompt))
+        name = details.get('Product Name', 'This product')
+        features = [f.strip() for f in details.get('Key Features', '').split(',') if f.strip()] or ['quality']
+        feature_text = ', '.join(features)
+        short = f"{name} brings {feature_text} together in one carefully designed package that delivers dependable everyday value for discerning shoppers who expect quality, comfort and performance every single day"
+        detailed = (
+            f"Discover {name}, built around {feature_text}. "
+            "Every detail has been considered to give you reliable performance, lasting comfort and real value "
+            "from the very first day you use it. Whether at home, at work or on the move, it adapts to your "
+            "routine and keeps delivering the results you expect. Thoughtful engineering, quality materials and "
+            "attention to detail make it an investment you will appreciate for years to come."
+        )
+        output = {
+            "short_description": short,
+            "detailed_description": detailed,
+            "bullet_points": [f"{feature} - designed to make every day easier" for feature in features[:5]]
+                             + ["Built to last - dependable quality", "Great value - more for your money"][:max(0, 3 - len(features))],
+            "seo_keywords": [name] + features[:4],
+            "call_to_action": f"Order {name} today and feel the difference!",
+        }
+        if fields:
+            output = {field: value for field, value in output.items() if field in fields}
+        return output
+
+    async def generate_content_async(self, prompt, stream=False, generation_config=None, **kwargs):
+        delay, outcome = self._draw()
+        if outcome == 'error':
+            await asyncio.sleep(delay / 2)
+            code = 429 if int(delay * 1000) % 2 else 503
+            raise FakeBackendError(f"Injected fake backend error ({code})", code)
+
+        # Like Gemini's schema-constrained decoding: only the schema's fields, never prose around the JSON
+        structured = bool(generation_config) and generation_config.get('response_mime_type') == 'application/json'
+        schema = (generation_config or {}).get('response_schema') or {}
+        variant_ids = self._VARIANT.findall(prompt)
+        if variant_ids:
+            # Variants prompt: one output per listed variant id, keyed by id
+            variant_schemas = schema.get('properties') or {}
+            output = {
+                variant_id: self._render_output(prompt, (variant_schemas.get(variant_id) or {}).get('properties'))
+                for variant_id in variant_ids
+            }
+        else:
+            output = self._render_output(prompt, schema.get('properties'))
+        text = json.dumps(output, ensure_ascii=False)
+        if outcome == 'malformed' and not structured:
+            text = "Here is your description: " + text[: len(text) // 2]
+
+        if stream:
+            return _FakeStream(text, delay)
+        await asyncio.sleep(delay)
+        usage = UsageMetadata(max(1, len(prompt) // 4), max(1, len(text) // 4))
+        return ModelResponse(text, usage)
+
+    def describe(self):
+        return {
+            'backend': self.name,
+            'latency': self.latency,
+            'mean_ms': self.mean_ms,
+            'spread': self.spread,
+            'error_rate': self.error_rate,
+            'malformed_rate': self.malformed_rate,
+            'seed': self.seed,
+        }
+
+
+def create_backend(name=None, model_name=None):
+    """Build the backend selected by Config.MODEL_BACKEND (or `name`) for model_name (default Config.GEMINI_MODEL)"""
+    name = name or Config.MODEL_BACKEND
+    if name == 'gemini':
+        return GeminiBackend(model_name or Config.GEMINI_MODEL, Config.GEMINI_API_KEY)
+    if name == 'fake':
+        return FakeBackend(
+            latency=Config.FAKE_LATENCY_DISTRIBUTION,
+            mean_ms=Config.FAKE_LATENCY_MEAN_MS,
+            spread=Config.FAKE_LATENCY_SPREAD,
+            error_rate=Config.FAKE_ERROR_RATE,
+            malformed_rate=Config.FAKE_MALFORMED_RATE,
+            seed=Config.FAKE_SEED,
+        )
+    raise ValueError(f"Unknown MODEL_BACKEND: {name}")
@@ -0,0 +1,239 @@
+"""Routing of generations across a pool of models.
+
+Each generation is routed to one model by, in order: an explicit request
+hint (?model=), a per-category rule, a per-price-tier rule (the tiers of
+get_price_category), then the first model in the pool. The rest of the pool
+follows as fallbacks, ordered by live health, and retries and hedged calls
+move down that list.
+
+Health is tracked per model as an exponentially weighted moving average of
+call latency and of the error rate. A routed model whose EWMAs are over
+the limits is demoted behind the healthiest fallback, except for a small
+probe share of requests that keeps its EWMAs fresh so it can recover.
+Routes pinned by a hint are never demoted.
+
+Every model also has its own circuit breaker. A model whose breaker is
+open goes to the back of the route, hinted or not, and RouteCursor skips
+it when an attempt moves down the list, so one failing model cannot block
+its fallbacks.
+"""
+import random
+import threading
+
+from prompts.prompt_templates import get_price_category
+from utils.circuit_breaker import CircuitBreaker
+
+# USD per 1M tokens (input, output): Gemini API list prices for prompts up to 128k tokens
+DEFAULT_MODEL_COSTS = {
+    'gemini-1.5-flash': (0.075, 0.30),
+    'gemini-1.5-flash-8b': (0.0375, 0.15),
+    'gemini-1.5-pro': (1.25, 5.00),
+}
+
+RULE_KINDS = ('hint', 'category', 'tier')
+
+
+class ModelRouter:
+    """Pool of lazily built model clients with rule-based routing and EWMA health"""
+
+    def __init__(self, models, factory, routes=None, costs=None, ewma_alpha=0.2, max_error_rate=0.5,
+                 max_latency=None, probe_ratio=0.05, seed=None, breaker_factory=None):
+        """
+        models: model names, the first being the default route.
+        factory: name -> backend, called on a model's first use.
+        routes: {'hint': {alias: model}, 'category': {category: model}, 'tier': {tier: model}}.
+        costs: {model: (usd_per_1m_input_tokens, usd_per_1m_output_tokens)}, over DEFAULT_MODEL_COSTS.
+        breaker_factory: name -> CircuitBreaker for that model (default: CircuitBreaker defaults).
+        """
+        if not models:
+            raise ValueError("The model pool is empty")
+        self.models = list(models)
+        self.default = self.models[0]
+        self.routes = {kind: {} for kind in RULE_KINDS}
+        for kind, rules in (routes or {}).items():
+            if kind not in RULE_KINDS:
+                raise ValueError(f"Unknown routing rule kind: {kind} (expected one of {', '.join(RULE_KINDS)})")
+            for key, model in rules.items():
+                if model not in self.models:
+                    raise ValueError(f"Route {kind}:{key} points at {model}, which is not in the model pool")
+                self.routes[kind][key.casefold() if kind != 'hint' else key] = model
+        self.costs = dict(DEFAULT_MODEL_COSTS, **(costs or {}))
+        self.ewma_alpha = ewma_alpha
+        self.max_error_rate = max_error_rate
+        self.max_latency = max_latency
+        self.probe_ratio = probe_ratio
+
+        self._factory = factory
+        self._clients = {}
+        self._client_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._rules_used = dict.fromkeys(RULE_KINDS + ('default',), 0)
+        self._models = {
+            name: {
+                'routed': 0, 'demoted': 0, 'calls': 0, 'fallback_calls': 0, 'errors': 0, 'cut_off': 0,
+                'latency_ewma': None, 'error_ewma': 0.0, 'latency_total': 0.0,
+                'prompt_tokens': 0, 'response_tokens': 0, 'cost_usd': 0.0,
+            }
+            for name in self.models
+        }
+        breaker_factory = breaker_factory or (lambda name: CircuitBreaker(name=name))
+        self._breakers = {name: breaker_factory(name) for name in self.models}
+
+    def client(self, name=None):
+        """The backend for a model, built on first use"""
+        name = name or self.default
+        client = self._clients.get(name)
+        if client is None:
+            with self._client_lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._clients[name] = self._factory(name)
+        return client
+
+    def breaker(self, name=None):
+        """The circuit breaker of one model"""
+        return self._breakers[name or self.default]
+
+    def accepting(self, name):
+        """Whether the model's breaker would admit a call now"""
+        return self._breakers[name].accepting
+
+    def initialized(self, name=None):
+        return (name or self.default) in self._clients
+
+    def hints(self):
+        """Accepted values for a request hint: model names and hint aliases"""
+        return sorted(set(self.models) | set(self.routes['hint']))
+
+    def resolve_hint(self, hint):
+        """Model for a request hint; ValueError if it names no model or alias"""
+        if hint in self.routes['hint']:
+            return self.routes['hint'][hint]
+        if hint in self._models:
+            return hint
+        raise ValueError(f"Unknown model hint: {hint} (expected one of {', '.join(self.hints())})")
+
+    def route(self, product, hint=None):
+        """Models to try for one generation, best first"""
+        if hint is not None:
+            primary, rule = self.resolve_hint(hint), 'hint'
+        else:
+            category = product.get('category')
+            category = category.casefold() if isinstance(category, str) else None
+            tier = get_price_category(product.get('price', 0))
+            if category in self.routes['category']:
+                primary, rule = self.routes['category'][category], 'category'
+            elif tier in self.routes['tier']:
+                primary, rule = self.routes['tier'][tier], 'tier'
+            else:
+                primary, rule = self.default, 'default'
+
+        with self._lock:
+            fallbacks = sorted((name for name in self.models if name != primary), key=self._expected_seconds)
+            self._rules_used[rule] += 1
+            self._models[primary]['routed'] += 1
+            demote = (
+                rule != 'hint' and fallbacks and not self._healthy(primary) and self._healthy(fallbacks[0])
+                and self._rng.random() >= self.probe_ratio
+            )
+            if demote:
+                self._models[primary]['demoted'] += 1
+        models = [fallbacks[0], primary] + fallbacks[1:] if demote else [primary] + fallbacks
+        # Models whose breaker is open go last (stable sort); they are only tried when nothing else is left
+        return sorted(models, key=lambda name: not self.accepting(name))
+
+    def _healthy(self, name):
+        """Caller holds self._lock"""
+        stats = self._models[name]
+        if stats['error_ewma'] > self.max_error_rate:
+            return False
+        return not (self.max_latency and stats['latency_ewma'] is not None and stats['latency_ewma'] > self.max_latency)
+
+    def _expected_seconds(self, name):
+        """Expected time to a successful call, from the EWMAs; untried models sort first. Caller holds self._lock"""
+        stats = self._models[name]
+        latency = stats['latency_ewma'] or 0.0
+        return (not self._healthy(name), latency / max(0.05, 1.0 - stats['error_ewma']))
+
+    def record(self, name, seconds, ok, prompt_tokens=0, response_tokens=0, fallback=False):
+        """Fold one finished call into the model's EWMAs, counters and cost"""
+        input_cost, output_cost = self.costs.get(name, (0.0, 0.0))
+        alpha = self.ewma_alpha
+        with self._lock:
+            stats = self._models[name]
+            stats['calls'] += 1
+            stats['fallback_calls'] += int(fallback)
+            stats['errors'] += int(not ok)
+            stats['latency_total'] += seconds
+            stats['latency_ewma'] = seconds if stats['latency_ewma'] is None else (
+                alpha * seconds + (1 - alpha) * stats['latency_ewma'])
+            stats['error_ewma'] = alpha * (0.0 if ok else 1.0) + (1 - alpha) * stats['error_ewma']
+            stats['prompt_tokens'] += prompt_tokens
+            stats['response_tokens'] += response_tokens
+            stats['cost_usd'] += (prompt_tokens * input_cost + response_tokens * output_cost) / 1e6
+
+    def record_cut_off(self, name):
+        """Count a call the request's own deadline cut off; it says nothing about the model's health"""
+        with self._lock:
+            self._models[name]['cut_off'] += 1
+
+    def stats(self):
+        with self._lock:
+            models = {}
+            for name, stats in self._models.items():
+                calls = stats['calls']
+                models[name] = {
+                    'initialized': name in self._clients,
+                    'healthy': self._healthy(name),
+                    'routed': stats['routed'],
+                    'demoted': stats['demoted'],
+                    'calls': calls,
+                    'fallback_calls': stats['fallback_calls'],
+                    'errors': stats['errors'],
+                    'cut_off': stats['cut_off'],
+                    'error_rate_ewma': round(stats['error_ewma'], 4),
+                    'latency_ewma_ms': round(stats['latency_ewma'] * 1000, 1) if stats['latency_ewma'] is not None else None,
+                    'avg_latency_ms': round(stats['latency_total'] / calls * 1000, 1) if calls else None,
+                    'prompt_tokens': stats['prompt_tokens'],
+                    'response_tokens': stats['response_tokens'],
+                    'cost_usd': round(stats['cost_usd'], 6),
+                    'avg_cost_usd': round(stats['cost_usd'] / calls, 8) if calls else None,
+                    'breaker': self._breakers[name].stats(),
+                }
+            rules = dict(self._rules_used)
+        return {'default': self.default, 'rules_used': rules, 'models': models}
+
+
+class RouteCursor:
+    """Walks one generation's route for its successive attempts, skipping models whose breaker is open.
+
+    Attempts move down the route; once it is used up, the last model is
+    tried again. Only used from the generation event loop.
+    """
+
+    def __init__(self, router, models):
+        self.router = router
+        self.models = models
+        self._position = -1
+
+    def next(self):
+        """(model name, is_fallback) for the next attempt"""
+        start = self._position + 1
+        for index in range(start, len(self.models)):
+            if self.router.accepting(self.models[index]):
+                self._position = index
+                break
+        else:
+            # Nothing left will take a call: the attempt fails fast on its open breaker
+            self._position = min(start, len(self.models) - 1)
+        return self.models[self._position], self._position > 0
+
+    @property
+    def current(self):
+        """Model of the latest attempt (the route's first before any)"""
+        return self.models[max(self._position, 0)]
+
+    def has_fallback(self):
+        """Whether a model further down the route can still take a call"""
+        return any(self.router.accepting(name) for name in self.models[self._position + 1:])
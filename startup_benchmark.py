@@ -0,0 +1,129 @@
+"""Cold-start benchmark: import time of the app and time to its first responses.
+
+Starts a fresh interpreter per run with `python -X importtime`, imports the
+app, serves /health and /validate-input through the test client and
+reports the median import and first-response times, the slowest top-level
+packages by cumulative import time, and whether any of the modules that
+must stay off the start-up path (the Gemini SDK and its grpc/protobuf
+stack) were imported. Exits 1 when --budget-ms is exceeded or a forbidden
+module was imported, so it can gate CI and track start-up over time.
+
+Usage:
+    python startup_benchmark.py --runs 5
+    python startup_benchmark.py --budget-ms 300 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+FORBIDDEN_MODULES = ('google.generativeai', 'grpc', 'google.protobuf')
+
+# Runs in the child interpreter; prints one JSON line of timings
+_PROBE = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+client.get('/health')
+health = time.perf_counter()
+client.post('/validate-input', json={'product_name': 'Probe', 'category': 'Home', 'key_features': ['a'], 'price': 1})
+validated = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_health_ms': (health - started) * 1000,
+    'first_validate_ms': (validated - started) * 1000,
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """Return {module: (self_us, cumulative_us)} from -X importtime output.
+
+    Interpreter start-up (`site` and whatever .pth files pull in) is not
+    part of the app's cost and is left out.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if name == ' site':
+            modules.clear()
+            continue
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def run_once(env):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True, check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"probe failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+
+def build_report(runs, top):
+    timings = [timing for timing, _ in runs]
+    _, modules = runs[-1]
+
+    # Top-level packages by their own cumulative time (a top-level import line carries the whole subtree)
+    packages = {}
+    for name, (_, cumulative) in modules.items():
+        package = name.split('.')[0]
+        packages[package] = max(packages.get(package, 0), cumulative)
+
+    def median_ms(key):
+        return round(statistics.median(timing[key] for timing in timings), 2)
+
+    return {
+        'runs': len(runs),
+        'python': sys.version.split()[0],
+        'import_ms': median_ms('import_ms'),
+        'first_health_ms': median_ms('first_health_ms'),
+        'first_validate_ms': median_ms('first_validate_ms'),
+        'modules_imported': len(modules),
+        'slowest_packages_ms': {
+            package: round(us / 1000, 2)
+            for package, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        },
+        'forbidden_imported': [
+            name for name in FORBIDDEN_MODULES if name in modules
+        ],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to start (median is reported)')
+    parser.add_argument('--top', type=int, default=10, help='Slowest top-level packages to list')
+    parser.add_argument('--budget-ms', type=float, help='Fail when the median import time exceeds this')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, LOG_LEVEL=os.environ.get('LOG_LEVEL', 'WARNING'))
+    runs = [run_once(env) for _ in range(args.runs)]
+    report = build_report(runs, args.top)
+
+    failures = []
+    if args.budget_ms is not None and report['import_ms'] > args.budget_ms:
+        failures.append(f"median import {report['import_ms']}ms exceeds budget {args.budget_ms}ms")
+    if report['forbidden_imported']:
+        failures.append(f"imported at start-up: {', '.join(report['forbidden_imported'])}")
+    report['failures'] = failures
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+import os
+
+# Config is read at import time, so the environment is set before anything imports the app.
+# Every test runs against the deterministic local FakeBackend, never Gemini
+os.environ['MODEL_BACKEND'] = 'fake'
+os.environ['FAKE_LATENCY_DISTRIBUTION'] = 'fixed'
+os.environ['FAKE_LATENCY_MEAN_MS'] = '5'
+os.environ['FAKE_ERROR_RATE'] = '0'
+os.environ['FAKE_MALFORMED_RATE'] = '0'
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import pytest  # noqa: E402
+
+# test_api.py drives a running server (python tests/test_api.py); it is not a pytest module
+collect_ignore = ['test_api.py']
+
+
+@pytest.fixture(scope='session')
+def client():
+    from app import app
+    return app.test_client()
+
+
+@pytest.fixture
+def product(request):
+    """A valid product whose name is unique to the test, so cached generations never leak between tests"""
+    return {
+        'product_name': f"Trail Mat {request.node.name}",
+        'category': 'Sports',
+        'key_features': ['non-slip grip', 'high density foam'],
+        'price': 1999,
+        'target_audience': 'yoga beginners',
+        'tone': 'friendly',
+    }
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """Install a FakeBackend of the test's own for every model; call it with FakeBackend arguments"""
+    from services import generation
+    from services.model_backends import FakeBackend
+
+    def install(**kwargs):
+        backend = FakeBackend(**kwargs)
+        monkeypatch.setattr(generation, 'get_model', lambda name=None: backend)
+        return backend
+    return install
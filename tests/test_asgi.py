@@ -0,0 +1,65 @@
+import asyncio
+import json
+import threading
+
+import httpx
+import pytest
+
+import asgi
+
+
+def request(method, path, **kwargs):
+    async def send():
+        transport = httpx.ASGITransport(app=asgi.application)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await client.request(method, path, **kwargs)
+    return asyncio.run(send())
+
+
+@pytest.fixture
+def model_threads(fake_model):
+    """Names of the threads the model was called on"""
+    backend = fake_model()
+    generate = backend.generate_content_async
+    threads = []
+
+    async def recording(prompt, **kwargs):
+        threads.append(threading.current_thread().name)
+        return await generate(prompt, **kwargs)
+    backend.generate_content_async = recording
+    return threads
+
+
+def test_native_generation_runs_on_the_generation_loop(product, model_threads):
+    response = request('POST', '/generate-description', json=product)
+
+    assert response.status_code == 200
+    assert response.headers['X-Cache'] == 'MISS'
+    assert model_threads == ['generation-loop']
+
+
+def test_native_batch_runs_on_the_generation_loop(product, model_threads):
+    response = request('POST', '/generate-descriptions/batch', json=[product])
+
+    assert response.status_code == 200
+    assert model_threads == ['generation-loop']
+
+
+def test_native_stream_runs_on_the_generation_loop(product, model_threads):
+    response = request('POST', '/generate-description/stream?format=ndjson', json=product)
+
+    events = [json.loads(line) for line in response.text.splitlines() if line]
+    assert response.status_code == 200
+    assert events[-1]['event'] == 'done'
+    assert model_threads == ['generation-loop']
+
+
+def test_stream_error_before_the_response_is_a_500(product, monkeypatch):
+    def broken(data):
+        raise RuntimeError("validator exploded")
+    monkeypatch.setattr(asgi, 'validate_and_mark_invalid_fields', broken)
+
+    response = request('POST', '/generate-description/stream', json=product)
+
+    assert response.status_code == 500
+    assert response.json() == {'error': "Internal server error: validator exploded"}
@@ -0,0 +1,82 @@
+import json
+
+import bulk_generate
+from services.generation import GenerationError
+
+
+def product_line(name, **fields):
+    return json.dumps(dict({'product_name': name, 'category': 'Sports', 'key_features': ['grip'], 'price': 10},
+                           **fields))
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def fake_generation(monkeypatch, failing=()):
+    """Replace generation; products named in failing raise GenerationError. Returns the names generated"""
+    generated = []
+
+    def generate(clean_data, **kwargs):
+        generated.append(clean_data['product_name'])
+        if clean_data['product_name'] in failing:
+            raise GenerationError("AI generation failed")
+        return {'short_description': clean_data['product_name']}, 'MISS'
+
+    monkeypatch.setattr(bulk_generate, 'generate_for_product', generate)
+    return generated
+
+
+def test_run_writes_one_record_per_line(tmp_path, monkeypatch):
+    fake_generation(monkeypatch)
+    input_path = tmp_path / 'in.jsonl'
+    input_path.write_text('\n'.join([product_line('A'), '{"broken', product_line('C', price=-1)]) + '\n')
+
+    counts = bulk_generate.run(str(input_path), str(tmp_path / 'out.jsonl'), str(tmp_path / 'ckpt'), workers=2)
+
+    assert counts == {'ok': 1, 'invalid_json': 1, 'invalid_input': 1}
+    records = {record['line']: record for record in read_jsonl(tmp_path / 'out.jsonl')}
+    assert records[1]['output'] == {'short_description': 'A'}
+    assert records[2]['status'] == 'invalid_json'
+    assert records[3]['input_validation']['price'] == 'Invalid input'
+
+
+def test_rerun_only_processes_lines_missing_from_the_checkpoint(tmp_path, monkeypatch):
+    generated = fake_generation(monkeypatch)
+    input_path = tmp_path / 'in.jsonl'
+    input_path.write_text('\n'.join(product_line(name) for name in 'ABC') + '\n')
+    checkpoint = tmp_path / 'ckpt'
+    # A previous run finished line 2, then was killed mid-write
+    checkpoint.write_text(json.dumps({'line': 2, 'status': 'ok'}) + '\n{"line": 3, "sta')
+
+    bulk_generate.run(str(input_path), str(tmp_path / 'out.jsonl'), str(checkpoint), workers=2)
+
+    assert sorted(generated) == ['A', 'C']
+    assert bulk_generate.load_checkpoint(str(checkpoint)) == {1, 2, 3}
+
+
+def test_retry_failed_reruns_failures_and_keeps_one_record_per_line(tmp_path, monkeypatch):
+    input_path = tmp_path / 'in.jsonl'
+    input_path.write_text('\n'.join(product_line(name) for name in 'ABC') + '\n')
+    paths = str(input_path), str(tmp_path / 'out.jsonl'), str(tmp_path / 'ckpt')
+    fake_generation(monkeypatch, failing={'B'})
+    bulk_generate.run(*paths, workers=2)
+
+    generated = fake_generation(monkeypatch)
+    counts = bulk_generate.run(*paths, workers=2, retry_failed=True)
+
+    assert generated == ['B']
+    assert counts == {'ok': 1}
+    records = read_jsonl(tmp_path / 'out.jsonl')
+    assert sorted(record['line'] for record in records) == [1, 2, 3]
+    assert all(record['status'] == 'ok' for record in records)
+
+
+def test_main_exits_non_zero_when_a_line_failed(tmp_path, monkeypatch):
+    fake_generation(monkeypatch, failing={'A'})
+    input_path = tmp_path / 'in.jsonl'
+    input_path.write_text(product_line('A') + '\n')
+
+    assert bulk_generate.main([str(input_path), str(tmp_path / 'out.jsonl')]) == 1
+    assert (tmp_path / 'out.jsonl.checkpoint').exists()
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+
+from utils.cache import ResponseCache, make_cache_key
+
+PRODUCT = {
+    'product_name': 'Trail Mat',
+    'category': 'Sports',
+    'key_features': ['non-slip grip', 'high density foam'],
+    'price': 1999,
+    'target_audience': 'yoga beginners',
+    'tone': 'friendly',
+}
+
+
+def test_key_ignores_whitespace_feature_order_and_category_case():
+    reworded = dict(
+        PRODUCT, product_name='  Trail   Mat ', category='sports',
+        key_features=['high density foam', 'non-slip  grip'],
+    )
+
+    assert make_cache_key(reworded, 'v2') == make_cache_key(PRODUCT, 'v2')
+
+
+def test_key_defaults_audience_and_tone():
+    product = {k: v for k, v in PRODUCT.items() if k not in ('target_audience', 'tone')}
+
+    assert make_cache_key(product, 'v2') == \
+        make_cache_key(dict(product, target_audience='general', tone='professional'), 'v2')
+
+
+def test_key_changes_with_the_product_and_the_prompt_version():
+    key = make_cache_key(PRODUCT, 'v2')
+
+    assert make_cache_key(dict(PRODUCT, price=2099), 'v2') != key
+    assert make_cache_key(dict(PRODUCT, tone='playful'), 'v2') != key
+    assert make_cache_key(PRODUCT, 'v1') != key
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(maxsize=2, ttl=60)
+    cache.set('a', {'n': 1})
+    cache.set('b', {'n': 2})
+    cache.get('a')
+    cache.set('c', {'n': 3})
+
+    assert cache.get('b') is None
+    assert cache.get('a') == {'n': 1}
+    assert cache.stats()['evictions'] == 1
+
+
+def test_memory_entries_expire():
+    cache = ResponseCache(maxsize=2, ttl=0.01)
+    cache.set('a', {'n': 1})
+    time.sleep(0.02)
+
+    assert cache.get('a') is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_sqlite_tier_survives_a_new_cache(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    ResponseCache(db_path=path).set('a', {'short_description': 'x'})
+
+    cache = ResponseCache(db_path=path)
+
+    assert cache.get('a') == {'short_description': 'x'}
+    assert cache.get('a') == {'short_description': 'x'}
+    stats = cache.stats()
+    assert (stats['hits'], stats['disk_hits'], stats['disk_size']) == (2, 1, 1)
+
+
+def test_expired_sqlite_entries_are_dropped(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    ResponseCache(db_path=path, disk_ttl=0.01).set('a', {'n': 1})
+    time.sleep(0.02)
+
+    cache = ResponseCache(db_path=path)
+
+    assert cache.get('a') is None
+    assert cache.stats()['disk_size'] == 0
+
+
+def test_async_access_keeps_sqlite_off_the_event_loop(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / 'cache.db'))
+    threads = []
+    for name in ('get', 'set'):
+        method = getattr(cache._disk, name)
+
+        def record(*args, method=method):
+            threads.append(threading.current_thread().name)
+            return method(*args)
+        setattr(cache._disk, name, record)
+
+    async def round_trip():
+        await cache.set_async('a', {'n': 1})
+        cache._memory.clear()
+        return await cache.get_async('a')
+
+    assert asyncio.run(round_trip()) == {'n': 1}
+    assert len(threads) == 2
+    assert all(name.startswith('cache-disk') for name in threads)
@@ -0,0 +1,81 @@
+import pytest
+
+from utils.circuit_breaker import AdmissionController, CircuitBreaker, CircuitOpenError, OverloadedError
+
+
+def test_breaker_opens_on_failure_rate():
+    breaker = CircuitBreaker(window_size=4, min_calls=4, failure_rate_threshold=0.5, open_seconds=60)
+    for success in (True, False, True, False):
+        breaker.before_call()
+        breaker.record(success, 0.1)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.accepting
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_stays_closed_below_min_calls():
+    breaker = CircuitBreaker(min_calls=5, open_seconds=60)
+    for _ in range(4):
+        breaker.before_call()
+        breaker.record(False, 0.1)
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_opens_on_slow_calls():
+    breaker = CircuitBreaker(min_calls=3, slow_call_seconds=1.0, slow_call_rate_threshold=0.6, open_seconds=60)
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record(True, 2.5)
+
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_half_open_breaker_closes_after_successful_probes():
+    breaker = CircuitBreaker(min_calls=1, open_seconds=0, half_open_max_calls=2)
+    breaker.before_call()
+    breaker.record(False, 0.1)
+
+    breaker.before_call()
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # both probe slots are taken
+    breaker.record(True, 0.1)
+    breaker.record(True, 0.1)
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker(min_calls=1, open_seconds=0)
+    breaker.before_call()
+    breaker.record(False, 0.1)
+    breaker.before_call()
+    breaker.open_seconds = 60
+    breaker.record(False, 0.1)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.stats()['opened'] == 2
+
+
+def test_admission_sheds_calls_past_max_in_flight():
+    controller = AdmissionController(max_in_flight=1, retry_after=2.0)
+
+    with controller.slot():
+        with pytest.raises(OverloadedError) as info:
+            with controller.slot():
+                pass
+    assert info.value.retry_after == 2.0
+    assert controller.stats() == {'in_flight': 0, 'max_in_flight': 1, 'admitted': 1, 'rejected': 1}
+
+
+def test_shed_generation_is_a_503_with_retry_after(client, product, monkeypatch):
+    from services import generation
+
+    monkeypatch.setattr(generation, 'admission_controller', AdmissionController(max_in_flight=0, retry_after=3.0))
+    response = client.post('/generate-description', json=product)
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '3'
@@ -0,0 +1,60 @@
+from utils.evaluator import MAX_SCORE, evaluate_batch, evaluate_description, get_evaluation_report
+
+INPUT = {
+    'product_name': 'Trail Mat',
+    'key_features': ['non-slip grip', 'high density foam'],
+    'target_audience': 'yoga beginners',
+}
+GOOD = {
+    'detailed_description': (
+        "The Trail Mat gives yoga beginners a non-slip grip and high density foam at an affordable price. "
+        + "Every session feels steady and comfortable from the first pose to the last stretch. " * 5
+    ),
+    'call_to_action': "Roll out your Trail Mat today",
+}
+BAD = {'detailed_description': "A mat.", 'call_to_action': "Buy"}
+
+
+def test_report_scores_every_criterion():
+    report = get_evaluation_report(INPUT, GOOD)
+
+    assert report['total_score'] == report['max_score'] == MAX_SCORE
+    assert report['issues'] == []
+    assert evaluate_description(INPUT, BAD) == 0
+
+
+def test_price_terms_match_as_substrings():
+    output = dict(GOOD, detailed_description=GOOD['detailed_description'].replace('affordable', 'well-valued'))
+
+    assert get_evaluation_report(INPUT, output)['breakdown']['price_positioning'] == 5
+
+
+def test_batch_matches_the_single_report_and_isolates_bad_pairs():
+    results, summary = evaluate_batch([(INPUT, GOOD), (INPUT, BAD), ('oops', GOOD)])
+
+    report = get_evaluation_report(INPUT, BAD)
+    assert (results[1]['total_score'], results[1]['issues']) == (report['total_score'], report['issues'])
+    assert 'error' in results[2]
+    assert (summary['total'], summary['evaluated'], summary['failed'], summary['perfect']) == (3, 2, 1, 1)
+    assert summary['mean_score'] == MAX_SCORE / 2
+    assert summary['criteria_missed']['call_to_action'] == 1
+
+
+def test_batch_endpoint(client):
+    response = client.post('/evaluate/batch', json={'items': [
+        {'input_data': INPUT, 'generated_output': GOOD},
+        {'input_data': INPUT, 'generated_output': BAD},
+    ]})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [r['total_score'] for r in body['results']] == [MAX_SCORE, 0]
+    assert body['summary']['evaluated'] == 2
+
+
+def test_batch_endpoint_rejects_empty_and_oversized_batches(client, monkeypatch):
+    from config import Config
+    monkeypatch.setattr(Config, 'EVALUATE_BATCH_MAX_ITEMS', 1)
+
+    assert client.post('/evaluate/batch', json=[]).status_code == 400
+    assert client.post('/evaluate/batch', json=[[INPUT, GOOD]] * 2).status_code == 413
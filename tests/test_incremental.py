@@ -0,0 +1,168 @@
+import asyncio
+import threading
+
+import pytest
+
+from services import generation
+from services.generation import DeadlineExceededError
+from services.incremental import RecordManager, affected_fields, diff_products
+from utils.circuit_breaker import OverloadedError
+from utils.record_store import SQLiteRecordStore
+
+
+@pytest.fixture
+def product_id(request):
+    return f"sku-{request.node.name}"
+
+
+def put(client, product_id, product, **kwargs):
+    return client.put(f'/products/{product_id}/description', json=product, **kwargs)
+
+
+def test_diff_ignores_formatting_and_reports_feature_changes(product):
+    reordered = dict(product, key_features=list(reversed(product['key_features'])), category='  sports')
+    edited = dict(product, key_features=['non-slip grip', 'cork top'])
+
+    assert diff_products(product, reordered) == {}
+    assert diff_products(product, edited) == {
+        'key_features': {'removed': ['high density foam'], 'added': ['cork top']}
+    }
+
+
+def test_price_tier_change_is_reported():
+    changes = diff_products({'price': 1999}, {'price': 99999})
+
+    assert changes['price_tier']['from'] != changes['price_tier']['to']
+    assert affected_fields({'price': changes['price']}) == []
+    assert 'call_to_action' in affected_fields(changes)
+
+
+def test_first_put_creates_the_record(client, product, product_id):
+    response = put(client, product_id, product)
+
+    assert response.status_code == 201
+    body = response.get_json()
+    assert (body['mode'], body['revision']) == ('created', 1)
+    assert 'Server-Timing' in response.headers
+    assert client.get(f'/products/{product_id}/description').get_json()['output'] == body['output']
+
+
+def test_same_product_is_unchanged(client, product, product_id):
+    put(client, product_id, product)
+
+    body = put(client, product_id, dict(product, product_name=product['product_name'] + '  ')).get_json()
+
+    assert (body['mode'], body['revision'], body['regenerated_fields']) == ('unchanged', 1, [])
+
+
+def test_price_within_the_tier_is_patched(client, product, product_id, fake_model):
+    put(client, product_id, product)
+    backend = fake_model()
+    calls = []
+    generate = backend.generate_content_async
+
+    async def counting(prompt, **kwargs):
+        calls.append(prompt)
+        return await generate(prompt, **kwargs)
+    backend.generate_content_async = counting
+
+    body = put(client, product_id, dict(product, price=product['price'] + 100)).get_json()
+
+    assert (body['mode'], body['revision'], body['regenerated_fields']) == ('patched', 2, [])
+    assert calls == []
+
+
+def test_audience_change_regenerates_only_the_fields_that_use_it(client, product, product_id):
+    created = put(client, product_id, product).get_json()
+
+    body = put(client, product_id, dict(product, target_audience='runners')).get_json()
+
+    assert body['mode'] == 'incremental'
+    assert 'seo_keywords' not in body['regenerated_fields']
+    assert body['output']['seo_keywords'] == created['output']['seo_keywords']
+    assert body['revision'] == 2
+
+
+def test_no_cache_regenerates_everything(client, product, product_id):
+    put(client, product_id, product)
+
+    body = put(client, product_id, product, headers={'Cache-Control': 'no-cache'}).get_json()
+
+    assert (body['mode'], len(body['regenerated_fields'])) == ('full', 5)
+
+
+def test_delete_forgets_the_record(client, product, product_id):
+    put(client, product_id, product)
+
+    assert client.delete(f'/products/{product_id}/description').status_code == 204
+    assert client.get(f'/products/{product_id}/description').status_code == 404
+    assert put(client, product_id, product).get_json()['mode'] == 'created'
+
+
+@pytest.mark.parametrize('error, status', [(OverloadedError("busy", 1), 503), (DeadlineExceededError("slow"), 504)])
+def test_update_errors_map_to_statuses(client, product, product_id, monkeypatch, error, status):
+    import app
+    put(client, product_id, product)
+
+    def fail(*args, **kwargs):
+        raise error
+    monkeypatch.setattr(app, 'update_description', fail)
+
+    response = put(client, product_id, dict(product, tone='playful'))
+
+    assert response.status_code == status
+    assert 'total;dur=' in response.headers['Server-Timing']
+
+
+def test_failed_regeneration_keeps_the_record(client, product, product_id, monkeypatch):
+    from services.model_backends import FakeBackendError
+    put(client, product_id, product)
+
+    async def refuse(*args, **kwargs):
+        raise FakeBackendError("API key not valid", 401)
+    monkeypatch.setattr(generation, '_call_model', refuse)
+
+    response = put(client, product_id, dict(product, target_audience='runners'))
+
+    assert response.status_code == 500
+    assert response.get_json()['error'] == "AI generation failed (non-retryable unauthenticated): API key not valid"
+    record = client.get(f'/products/{product_id}/description').get_json()
+    assert (record['revision'], record['input']['target_audience']) == (1, product['target_audience'])
+
+
+class ProbingStore(SQLiteRecordStore):
+    """Records the thread of every call and checks the generation loop still runs other work meanwhile"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = []
+
+    def _probe(self):
+        self.threads.append(threading.current_thread().name)
+        # Deadlocks into a timeout if this call is holding up the loop
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0), generation._get_loop()).result(timeout=2)
+
+    def get(self, product_id):
+        self._probe()
+        return super().get(product_id)
+
+    def save(self, record):
+        self._probe()
+        super().save(record)
+
+
+def test_sqlite_records_persist_and_stay_off_the_generation_loop(tmp_path, product, product_id):
+    path = str(tmp_path / 'records.db')
+    store = ProbingStore(path)
+
+    created = generation.run_coroutine(RecordManager(store).update_async(product_id, product))
+
+    assert created['mode'] == 'created'
+    assert len(store.threads) == 2 and all(name.startswith('record-store') for name in store.threads)
+
+    # A new manager over the same file, as after a restart
+    manager = RecordManager(SQLiteRecordStore(path))
+    assert manager.get(product_id)['output'] == created['output']
+    patched = generation.run_coroutine(manager.update_async(product_id, dict(product, price=product['price'] + 100)))
+    assert (patched['mode'], patched['revision']) == ('patched', 2)
+    assert manager.stats()['durable'] is True
@@ -0,0 +1,72 @@
+from collections import Counter
+
+import pytest
+
+from utils.job_queue import FairQueue
+
+
+def drain(queue):
+    items = []
+    while (item := queue.pop()) is not None:
+        items.append(item)
+    return items
+
+
+def test_levels_share_dequeues_by_weight():
+    queue = FairQueue()
+    for i in range(20):
+        for priority in ('high', 'normal', 'low'):
+            queue.put(f"{priority}-{i}", 'shop', priority)
+
+    served = Counter(queue.pop().split('-')[0] for _ in range(13))
+
+    assert served == {'high': 8, 'normal': 4, 'low': 1}
+
+
+def test_low_priority_still_drains_under_high_priority_load():
+    queue = FairQueue()
+    queue.put('low-1', 'shop', 'low')
+    for i in range(100):
+        queue.put(f"high-{i}", 'shop', 'high')
+
+    assert 'low-1' in [queue.pop() for _ in range(13)]
+
+
+def test_tenants_take_turns_within_a_level():
+    queue = FairQueue()
+    for i in range(5):
+        queue.put(f"bulk-{i}", 'importer', 'normal')
+    queue.put('single', 'shop', 'normal')
+
+    assert drain(queue)[:3] == ['bulk-0', 'single', 'bulk-1']
+
+
+def test_each_tenant_is_fifo():
+    queue = FairQueue()
+    for i in range(3):
+        queue.put(i, 'a', 'normal')
+        queue.put(i + 10, 'b', 'normal')
+
+    items = drain(queue)
+
+    assert [item for item in items if item < 10] == [0, 1, 2]
+    assert [item for item in items if item >= 10] == [10, 11, 12]
+
+
+def test_remove_and_depth():
+    queue = FairQueue()
+    queue.put('a', 'shop', 'high')
+    queue.put('b', 'shop', 'low')
+
+    assert queue.remove('a', 'shop', 'high') is True
+    assert queue.remove('a', 'shop', 'high') is False
+    assert len(queue) == 1
+    assert queue.depth() == {'high': 0, 'normal': 0, 'low': 1}
+    assert queue.tenants() == 1
+    assert drain(queue) == ['b']
+    assert queue.pop() is None
+
+
+def test_unknown_priority():
+    with pytest.raises(ValueError):
+        FairQueue().put('a', 'shop', 'urgent')
@@ -0,0 +1,245 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from config import Config
+from services import jobs
+from services.jobs import JobManager, _pinned_session, check_callback_url
+from utils.job_queue import SQLiteJobStore
+
+
+@pytest.fixture
+def hook_server():
+    """A local HTTP server recording each POST as (Host header, JSON body); answers after settings['delay'] seconds"""
+    received = []
+    settings = {'delay': 0.0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            time.sleep(settings['delay'])
+            received.append((self.headers['Host'], json.loads(body)))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1], received, settings
+    server.shutdown()
+    server.server_close()
+
+
+def test_pinned_session_connects_to_the_checked_address(hook_server):
+    port, received, _ = hook_server
+
+    # The host does not resolve, so the request only arrives if it went to the pinned address
+    response = _pinned_session('127.0.0.1').post(f"http://hooks.example.invalid:{port}/done", json={'id': 'a'}, timeout=5)
+
+    assert response.status_code == 204
+    assert received == [(f"hooks.example.invalid:{port}", {'id': 'a'})]
+
+
+class RecordingStore(SQLiteJobStore):
+    def __init__(self, path):
+        super().__init__(path)
+        self.writes = []
+
+    def save(self, record):
+        self.writes.append((threading.current_thread().name, record['status']))
+        super().save(record)
+
+
+def test_job_state_is_written_in_order_off_the_generation_loop(tmp_path, product):
+    store = RecordingStore(str(tmp_path / 'jobs.db'))
+    manager = JobManager(workers=1, store=store)
+
+    job = manager.submit(product)
+    for _ in range(200):
+        if manager.get(job['id'])['status'] == 'succeeded':
+            break
+        time.sleep(0.01)
+    manager._store_executor.shutdown(wait=True)
+
+    assert [status for _, status in store.writes] == ['queued', 'running', 'succeeded']
+    assert all(name.startswith('job-store') for name, _ in store.writes)
+    assert store.get(job['id'])['status'] == 'succeeded'
+
+
+def test_slow_callback_does_not_hold_the_worker(hook_server, product, monkeypatch):
+    port, received, settings = hook_server
+    settings['delay'] = 0.5
+    monkeypatch.setattr(Config, 'JOBS_CALLBACK_ALLOW_PRIVATE', True)
+    manager = JobManager(workers=1)
+    callback_url = f"http://127.0.0.1:{port}/done"
+
+    jobs = [manager.submit(dict(product, product_name=f"{product['product_name']} {i}"), callback_url=callback_url)
+            for i in range(2)]
+    for _ in range(200):
+        if all(manager.get(job['id'])['status'] == 'succeeded' for job in jobs):
+            break
+        time.sleep(0.01)
+
+    # Both jobs ran on the single worker while the first callback was still being answered
+    assert [manager.get(job['id'])['status'] for job in jobs] == ['succeeded', 'succeeded']
+    assert received == []
+    assert manager.stats()['callbacks_pending'] == 2
+
+    manager.shutdown(timeout=5)
+
+    assert len(received) == 2
+    assert manager.stats()['callbacks_delivered'] == 2
+    assert [manager.get(job['id'])['callback']['status'] for job in jobs] == ['delivered', 'delivered']
+
+
+# Callback URL checks (SSRF guard)
+
+@pytest.fixture
+def resolve(monkeypatch):
+    """Make every host resolve to the given addresses (or raise socket.gaierror with none)"""
+    monkeypatch.setattr(Config, 'JOBS_CALLBACK_ALLOW_PRIVATE', False)
+    monkeypatch.setattr(Config, 'JOBS_CALLBACK_ALLOWED_HOSTS', [])
+
+    def install(*addresses):
+        def getaddrinfo(host, port, *args, **kwargs):
+            if not addresses:
+                raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+            return [(socket.AF_INET6 if ':' in a else socket.AF_INET, socket.SOCK_STREAM, 6, '', (a, port))
+                    for a in addresses]
+        monkeypatch.setattr(jobs.socket, 'getaddrinfo', getaddrinfo)
+    return install
+
+
+@pytest.mark.parametrize('address', [
+    '127.0.0.1', '10.0.0.5', '::1',
+    '::ffff:127.0.0.1',  # IPv4-mapped IPv6
+    '169.254.169.254',  # cloud metadata (link-local)
+    'fe80::1%eth0',  # link-local with a zone id
+    'fd00::1', '224.0.0.1', '0.0.0.0',
+])
+def test_internal_addresses_are_refused(resolve, address):
+    resolve(address)
+
+    error, pinned = check_callback_url('https://hooks.example.com/done')
+
+    assert error.startswith("callback_url must not point at")
+    assert pinned is None
+
+
+def test_public_address_is_pinned(resolve):
+    resolve('93.184.216.34')
+
+    assert check_callback_url('https://hooks.example.com/done') == (None, '93.184.216.34')
+
+
+def test_one_internal_address_among_public_ones_is_refused(resolve):
+    resolve('93.184.216.34', '10.0.0.5')
+
+    assert check_callback_url('https://hooks.example.com/done')[0] is not None
+
+
+def test_unresolvable_host_is_refused(resolve):
+    resolve()
+
+    assert check_callback_url('https://nowhere.invalid/done') == (
+        "callback_url host cannot be resolved: nowhere.invalid", None
+    )
+
+
+@pytest.mark.parametrize('url', ['ftp://hooks.example.com/x', '/relative', '', 'http://hooks.example.com:99999/'])
+def test_malformed_urls_are_refused(resolve, url):
+    resolve('93.184.216.34')
+
+    assert check_callback_url(url)[0] is not None
+
+
+@pytest.mark.parametrize('host, allowed', [
+    ('example.com', True),
+    ('hooks.example.com', True),
+    ('HOOKS.Example.COM.', True),
+    ('evilexample.com', False),  # suffix look-alike, not a subdomain
+    ('example.com.evil.net', False),
+    ('example.org', False),
+])
+def test_allowlist_matches_hosts_and_subdomains_only(resolve, monkeypatch, host, allowed):
+    resolve('93.184.216.34')
+    monkeypatch.setattr(Config, 'JOBS_CALLBACK_ALLOWED_HOSTS', ['example.com'])
+
+    error, _ = check_callback_url(f'https://{host}/done')
+
+    assert (error is None) == allowed
+
+
+def test_callback_sessions_are_closed(hook_server, product, monkeypatch):
+    port, received, _ = hook_server
+    monkeypatch.setattr(jobs, 'check_callback_url', lambda url: (None, '127.0.0.1'))
+    closed = []
+
+    def tracking(address):
+        session = _pinned_session(address)
+        close = session.close
+
+        def closing():
+            closed.append(address)
+            close()
+        session.close = closing
+        return session
+    monkeypatch.setattr(jobs, '_pinned_session', tracking)
+    manager = JobManager(workers=1)
+
+    manager.submit(product, callback_url=f"http://hooks.example.com:{port}/done")
+    for _ in range(200):
+        if received and closed:
+            break
+        time.sleep(0.01)
+    manager.shutdown(timeout=5)
+
+    assert len(received) == 1
+    assert closed == ['127.0.0.1']
+
+
+def save_unfinished_job(path, product):
+    SQLiteJobStore(path).save({
+        'id': 'left-over', 'status': 'running', 'tenant': 'default', 'priority': 'normal', 'attempts': 1,
+        'created_at': time.time(), 'started_at': None, 'finished_at': None, 'cache': None, 'result': None,
+        'error': None, 'callback': None, 'product': product,
+        'options': {'bypass_cache': False, 'output_mode': None, 'model_hint': None},
+    })
+
+
+def test_recovery_waits_for_first_use(tmp_path, product):
+    path = str(tmp_path / 'jobs.db')
+    save_unfinished_job(path, product)
+
+    manager = JobManager(workers=1, store=SQLiteJobStore(path))
+    assert manager._loop is None and manager.stats()['recovered'] == 0
+
+    for _ in range(200):
+        if manager.get('left-over')['status'] == 'succeeded':
+            break
+        time.sleep(0.01)
+    assert manager.get('left-over')['status'] == 'succeeded'
+    assert manager.stats()['recovered'] == 1
+
+
+def test_importing_the_job_manager_does_not_start_the_generation_loop(tmp_path, product):
+    path = str(tmp_path / 'jobs.db')
+    save_unfinished_job(path, product)
+    probe = (
+        "from services import generation; from services.jobs import job_manager; "
+        "print(generation._loop is None, job_manager.stats()['queued'])"
+    )
+
+    result = subprocess.run([sys.executable, '-c', probe], cwd=os.path.dirname(os.path.dirname(__file__)),
+                            env=dict(os.environ, JOBS_DB_PATH=path), capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip().splitlines()[-1] == 'True 0'
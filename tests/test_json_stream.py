@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from utils.json_stream import IncrementalObjectParser, format_stream_event, stream_format_for
+
+OUTPUT = {
+    "short_description": "A mat with \"grip\", {braces} and [brackets], too",
+    "bullet_points": ["Grip - never slips", "Foam, 6mm"],
+    "nested": {"a": [1, {"b": 2}], "c": "}"},
+    "price": 1999.5,
+    "flag": True,
+}
+
+
+def feed_in_chunks(text, size):
+    parser = IncrementalObjectParser()
+    members = []
+    for start in range(0, len(text), size):
+        members.extend(parser.feed(text[start:start + size]))
+    return parser, members
+
+
+def test_members_are_reported_for_any_chunking():
+    text = json.dumps(OUTPUT)
+    for size in (1, 3, 7, len(text)):
+        parser, members = feed_in_chunks(text, size)
+
+        assert members == list(OUTPUT.items())
+        assert parser.finished
+
+
+def test_member_is_reported_as_soon_as_it_is_complete():
+    parser = IncrementalObjectParser()
+
+    assert parser.feed('{"short_description": "Soft') == []
+    assert parser.feed(' mat", "bullet') == [('short_description', 'Soft mat')]
+    assert parser.feed('_points": ["a"]}') == [('bullet_points', ['a'])]
+
+
+def test_code_fence_and_trailing_comma_are_ignored():
+    _, members = feed_in_chunks('```json\n{"a": 1, "b": [2],\n}\n```', 4)
+
+    assert members == [('a', 1), ('b', [2])]
+
+
+def test_text_after_the_object_is_ignored():
+    parser = IncrementalObjectParser()
+    members = parser.feed('{"a": 1} {"b": 2}')
+
+    assert members == [('a', 1)]
+    assert parser.feed(', "c": 3}') == []
+
+
+def test_unparseable_member_is_skipped():
+    _, members = feed_in_chunks('{"a": 1, "b": nope, "c": 3}', 5)
+
+    assert members == [('a', 1), ('c', 3)]
+
+
+def test_format_stream_event():
+    event = {"event": "field", "field": "a", "value": "é"}
+
+    assert format_stream_event(event, 'ndjson') == '{"event": "field", "field": "a", "value": "é"}\n'
+    assert format_stream_event(event) == 'event: field\ndata: {"field": "a", "value": "é"}\n\n'
+
+
+@pytest.mark.parametrize('format_param, accept, expected', [
+    ('ndjson', None, 'ndjson'),
+    (None, 'application/x-ndjson', 'ndjson'),
+    (None, 'text/html, Application/X-NDJSON; q=0.9', 'ndjson'),
+    (None, 'application/x-ndjson;q=0, text/event-stream', 'sse'),
+    (None, 'application/x-ndjson; q=0.000', 'sse'),
+    (None, 'application/x-ndjsonx', 'sse'),
+    ('ndjsonx', None, 'sse'),
+    (None, None, 'sse'),
+])
+def test_stream_format_for(format_param, accept, expected):
+    assert stream_format_for(format_param, accept) == expected
+
+
+@pytest.mark.parametrize('query, expected', [
+    (b'format=ndjson', 'ndjson'),
+    (b'output_mode=text&format=ndjson', 'ndjson'),
+    (b'output_format=ndjson', 'sse'),
+    (b'xformat=ndjson', 'sse'),
+    (b'format=ndjsonx', 'sse'),
+])
+def test_asgi_stream_format_parses_the_query(query, expected):
+    from asgi import _stream_format_requested
+
+    assert _stream_format_requested({'query_string': query, 'headers': []}) == expected
@@ -0,0 +1,60 @@
+import re
+
+from utils.metrics import Registry, stats_collector
+
+
+def sample(text, name, **labels):
+    """Value of one sample in exposition text, or None; labels in the order they are rendered"""
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = '^' + re.escape(name + (f'{{{label_text}}}' if labels else '')) + r' (\S+)$'
+    match = re.search(pattern, text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.histogram('latency_seconds', 'Latency', ('stage',), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, stage='llm')
+
+    text = registry.render()
+
+    assert '# TYPE latency_seconds histogram' in text
+    assert sample(text, 'latency_seconds_bucket', stage='llm', le='0.1') == 1
+    assert sample(text, 'latency_seconds_bucket', stage='llm', le='1') == 2
+    assert sample(text, 'latency_seconds_bucket', stage='llm', le='+Inf') == 3
+    assert sample(text, 'latency_seconds_count', stage='llm') == 3
+    assert sample(text, 'latency_seconds_sum', stage='llm') == 5.55
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter('errors_total', 'Errors', ('reason',)).inc(reason='say "hi"\n')
+
+    assert 'errors_total{reason="say \\"hi\\"\\n"} 1' in registry.render()
+
+
+def test_stats_collector_exports_numeric_values_only():
+    registry = Registry()
+    registry.register_collector(stats_collector('cache', 'Cache', lambda: {'hits': 3, 'enabled': True, 'name': 'x'}))
+
+    text = registry.render()
+
+    assert sample(text, 'pdg_cache', key='hits') == 3
+    assert 'key="enabled"' not in text and 'key="name"' not in text
+
+
+def test_metrics_endpoint_exposes_request_and_stage_histograms(client, product):
+    client.post('/generate-description', json=product)
+
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert sample(text, 'pdg_request_duration_seconds_count', endpoint='/generate-description', status='200') >= 1
+    for stage in ('validation', 'prompt_build', 'llm_attempt', 'validate_output', 'serialization'):
+        assert sample(text, 'pdg_stage_duration_seconds_count', stage=stage) >= 1, stage
+    assert sample(text, 'pdg_prompt_tokens_count', kind='generate') >= 1
+    assert sample(text, 'pdg_cache', key='misses') >= 1
+    assert sample(text, 'pdg_llm_calls_in_flight') == 0
@@ -0,0 +1,82 @@
+import pytest
+
+from services.model_backends import FakeBackend
+from services.model_router import ModelRouter, RouteCursor
+from utils.circuit_breaker import CircuitBreaker
+
+PRODUCT = {'product_name': 'Mat', 'category': 'Sports', 'key_features': ['grip'], 'price': 999}
+
+
+def make_router(**kwargs):
+    return ModelRouter(
+        ['primary', 'backup', 'spare'], lambda name: FakeBackend(),
+        breaker_factory=lambda name: CircuitBreaker(min_calls=1, open_seconds=60, name=name), **kwargs
+    )
+
+
+def trip(router, name):
+    router.breaker(name).before_call()
+    router.breaker(name).record(False, 0.1)
+
+
+def test_routing_rules():
+    router = make_router(routes={'category': {'sports': 'spare'}, 'hint': {'fast': 'backup'}})
+
+    assert router.route(PRODUCT)[0] == 'spare'
+    assert router.route(dict(PRODUCT, category='Home'))[0] == 'primary'
+    assert router.route(PRODUCT, hint='fast')[0] == 'backup'
+    assert router.stats()['rules_used'] == {'hint': 1, 'category': 1, 'tier': 0, 'default': 1}
+
+
+def test_model_with_an_open_breaker_goes_last():
+    router = make_router()
+    trip(router, 'primary')
+
+    assert router.route(PRODUCT) == ['backup', 'spare', 'primary']
+    assert router.route(PRODUCT, hint='primary')[-1] == 'primary'
+    assert router.stats()['models']['primary']['breaker']['state'] == CircuitBreaker.OPEN
+
+
+def test_cursor_skips_models_whose_breaker_opened():
+    router = make_router()
+    cursor = RouteCursor(router, ['primary', 'backup', 'spare'])
+
+    assert cursor.next() == ('primary', False)
+    trip(router, 'backup')
+    assert cursor.has_fallback()
+    assert cursor.next() == ('spare', True)
+    assert not cursor.has_fallback()
+    assert cursor.next() == ('spare', True)  # the last model is tried again
+
+
+def test_unhealthy_model_is_demoted():
+    router = make_router(probe_ratio=0.0, max_error_rate=0.5, ewma_alpha=1.0)
+    router.record('primary', 0.1, False)
+
+    assert router.route(PRODUCT)[0] == 'backup'
+    assert router.stats()['models']['primary']['demoted'] == 1
+
+
+def test_hints_resolve_to_models():
+    router = make_router(routes={'hint': {'fast': 'backup'}})
+
+    assert router.route(PRODUCT, 'fast')[0] == 'backup'
+    assert router.route(PRODUCT, 'spare')[0] == 'spare'
+    with pytest.raises(ValueError):
+        router.resolve_hint('unknown')
+
+
+def test_clients_are_built_on_first_use():
+    router = make_router()
+
+    assert not router.initialized('backup')
+    router.client('backup')
+    assert router.initialized('backup') and not router.initialized()
+
+
+def test_cost_is_accounted_per_model():
+    router = make_router(costs={'primary': (1.0, 4.0)})
+    router.record('primary', 0.2, True, prompt_tokens=1000, response_tokens=500)
+
+    stats = router.stats()['models']['primary']
+    assert (stats['calls'], stats['cost_usd'], stats['avg_latency_ms']) == (1, 0.003, 200.0)
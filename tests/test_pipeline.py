@@ -0,0 +1,137 @@
+import asyncio
+import json
+
+from utils.validators import OUTPUT_FIELDS, validate_output
+
+
+def test_generate_description_returns_a_valid_description(client, product):
+    response = client.post('/generate-description', json=product)
+
+    assert response.status_code == 200
+    output = response.get_json()
+    assert list(output) == OUTPUT_FIELDS
+    assert validate_output(output) == (True, "Valid")
+    assert product['product_name'] in output['short_description']
+    assert response.headers['X-Cache'] == 'MISS'
+    assert 'llm;dur=' in response.headers['Server-Timing']
+
+
+def test_repeated_product_is_served_from_the_cache(client, product):
+    first = client.post('/generate-description', json=product)
+    second = client.post('/generate-description', json=product)
+
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.get_json() == first.get_json()
+
+
+def test_no_cache_request_bypasses_the_cache(client, product):
+    client.post('/generate-description', json=product)
+    response = client.post('/generate-description', json=product, headers={'Cache-Control': 'no-cache'})
+
+    assert response.status_code == 200
+    assert response.headers['X-Cache'] == 'BYPASS'
+
+
+def test_invalid_required_field_is_marked_in_the_400(client, product):
+    response = client.post('/generate-description', json=dict(product, price=-5))
+
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['price'] == 'Invalid input'
+    assert body['product_name'] == product['product_name']
+
+
+def test_malformed_json_is_rejected(client):
+    response = client.post('/generate-description', data='{"product_name": ', content_type='application/json')
+
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Invalid JSON format')
+
+
+def test_batch_reports_each_item_in_input_order(client, product):
+    response = client.post('/generate-descriptions/batch', json={'products': [product, {'price': 10}]})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['summary']['succeeded'] == 1
+    assert body['summary']['invalid_input'] == 1
+    assert [item['index'] for item in body['results']] == [0, 1]
+    assert body['results'][0]['status'] == 'ok'
+    assert list(body['results'][0]['output']) == OUTPUT_FIELDS
+    assert body['results'][1]['status'] == 'invalid_input'
+
+
+def test_stream_emits_each_field_then_done(client, product):
+    response = client.post('/generate-description/stream?format=ndjson', json=product)
+
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    fields = [event['field'] for event in events if event['event'] == 'field']
+    assert fields == OUTPUT_FIELDS
+    assert events[-1]['event'] == 'done'
+    assert events[-1]['valid'] is True
+
+
+def test_validate_input_lists_error_codes(client):
+    response = client.post('/validate-input', json={'product_name': 'Mat', 'price': -1})
+
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['is_valid'] is False
+    assert body['errors']['price'] == 'negative'
+    assert body['errors']['category'] == 'missing'
+
+
+def test_job_callback_to_an_internal_address_is_refused(client, product):
+    response = client.post('/jobs', json={'product': product, 'callback_url': 'http://127.0.0.1:8080/hook'})
+
+    assert response.status_code == 400
+    assert 'internal address' in response.get_json()['error']
+
+
+def track_in_flight(monkeypatch):
+    """Replace generation with a short sleep; returns {'now', 'max'} generations in flight"""
+    from services import generation
+
+    in_flight = {'now': 0, 'max': 0}
+
+    async def generate(clean_data, **kwargs):
+        in_flight['now'] += 1
+        in_flight['max'] = max(in_flight['max'], in_flight['now'])
+        await asyncio.sleep(0.01)
+        in_flight['now'] -= 1
+        return {}, 'MISS'
+
+    monkeypatch.setattr(generation, 'generate_description_async', generate)
+    return in_flight
+
+
+def batch_products(count):
+    return [{'product_name': f"Mat {i}", 'category': 'Sports', 'key_features': ['grip'], 'price': 10}
+            for i in range(count)]
+
+
+def test_concurrent_batches_share_the_concurrency_limit(monkeypatch):
+    from config import Config
+    from services.generation import generate_batch_async
+
+    monkeypatch.setattr(Config, 'BATCH_MAX_CONCURRENCY', 3)
+    in_flight = track_in_flight(monkeypatch)
+
+    async def two_batches():
+        return await asyncio.gather(generate_batch_async(batch_products(10)), generate_batch_async(batch_products(10)))
+
+    results = asyncio.run(two_batches())
+
+    assert [result['summary']['succeeded'] for result in results] == [10, 10]
+    assert in_flight['max'] == 3
+
+
+def test_batch_concurrency_argument_is_a_tighter_cap(monkeypatch):
+    from services.generation import generate_batch_async
+
+    in_flight = track_in_flight(monkeypatch)
+
+    asyncio.run(generate_batch_async(batch_products(5), concurrency=1))
+
+    assert in_flight['max'] == 1
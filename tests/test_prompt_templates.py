@@ -0,0 +1,142 @@
+import pytest
+
+from prompts.prompt_templates import get_product_description_prompt, render_product_prompt, templates
+from prompts.template_engine import estimate_tokens
+
+PRODUCTS = [
+    {
+        'product_name': 'Samsung Galaxy S24', 'category': 'Smartphone', 'key_features': ['256GB storage', '50MP camera'],
+        'price': 79999, 'target_audience': 'tech enthusiasts', 'tone': 'professional',
+    },
+    {'product_name': 'Yoga Mat {Pro}', 'category': 'Sports', 'key_features': ['non-slip grip'], 'price': 999},
+    {'product_name': 'Desk Lamp', 'category': 'Office', 'key_features': ['dimmable', 'USB-C'], 'price': 15000.5},
+]
+
+
+def original_prompt(product_data):
+    """The prompt as it was built before the template engine, for the v1 byte-for-byte check"""
+    # Price positioning logic
+    price = product_data.get('price', 0)
+    if price < 1000:
+        price_category = "budget-friendly"
+    elif price < 10000:
+        price_category = "mid-range"
+    elif price < 50000:
+        price_category = "premium"
+    else:
+        price_category = "luxury"
+
+    # Category-specific context
+    category_context = {
+        'smartphone': 'cutting-edge technology and connectivity',
+        'electronics': 'innovative features and performance',
+        'clothing': 'style, comfort, and quality',
+        'home': 'functionality and aesthetic appeal',
+        'beauty': 'enhancement and self-care',
+        'sports': 'performance and durability'
+    }
+
+    category_lower = product_data.get('category', '').lower()
+    context = category_context.get(category_lower, 'quality and value')
+
+    # Format features for the prompt
+    features_list = product_data.get('key_features', [])
+    features_str = ', '.join(features_list)
+
+    prompt = f"""You are an expert e-commerce copywriter specializing in {product_data.get('category', 'products')}.
+Your task is to create compelling, conversion-focused product descriptions that drive sales.
+
+PRODUCT DETAILS:
+- Product Name: {product_data.get('product_name')}
+- Category: {product_data.get('category')}
+- Key Features: {features_str}
+- Price: ₹{product_data.get('price')} ({price_category})
+- Target Audience: {product_data.get('target_audience', 'general')}
+- Tone: {product_data.get('tone', 'professional')}
+
+WRITING GUIDELINES:
+- Focus on {context}
+- Highlight value proposition for {price_category} segment
+- Use {product_data.get('tone', 'professional')} tone throughout
+- Appeal to {product_data.get('target_audience', 'general')} specifically
+- Include emotional triggers and benefits, not just features
+
+EXAMPLE OUTPUT FORMAT:
+{{
+  "short_description": "Samsung Galaxy S24 - Premium smartphone with 256GB storage and 50MP camera",
+  "detailed_description": "Experience cutting-edge technology with the Samsung Galaxy S24. This premium smartphone delivers exceptional performance with its advanced processor and stunning camera system. Perfect for tech enthusiasts who demand the best.",
+  "bullet_points": [
+    "256GB storage - Never run out of space for your digital life",
+    "50MP camera - Capture professional-quality photos and videos",
+    "6.2 inch display - Immersive viewing experience for all your content"
+  ],
+  "seo_keywords": [
+    "Samsung Galaxy S24",
+    "smartphone",
+    "256GB",
+    "50MP camera",
+    "premium phone"
+  ],
+  "call_to_action": "Upgrade to premium technology - Order your Galaxy S24 today!"
+}}
+
+CRITICAL REQUIREMENTS:
+- Mention ALL key features: {features_str}
+- Short description: EXACTLY 20-50 words
+- Detailed description: EXACTLY 50-200 words
+- Bullet points: EXACTLY 3-5 items, each explaining the benefit of the feature
+- SEO keywords: Include product name and key features
+- Call to action: Create urgency and encourage purchase
+- Consider the {price_category} price point in positioning
+- Adapt language for {product_data.get('target_audience', 'general')} audience
+- Use {product_data.get('tone', 'professional')} tone consistently
+
+Return ONLY valid JSON format with the exact structure shown above. No additional text before or after the JSON."""
+
+    return prompt
+
+
+@pytest.mark.parametrize('product', PRODUCTS)
+def test_v1_matches_the_original_prompt_byte_for_byte(product):
+    assert get_product_description_prompt(product, 'v1') == original_prompt(product)
+
+
+@pytest.mark.parametrize('version', ['v2', 'v2-structured'])
+def test_v2_prefix_is_identical_for_every_product(version):
+    prefixes = {render_product_prompt(product, version).prefix for product in PRODUCTS}
+
+    assert len(prefixes) == 1
+    assert 'Samsung Galaxy S24' not in render_product_prompt(PRODUCTS[1], version).suffix
+
+
+def test_v2_states_each_product_value_once():
+    rendered = render_product_prompt(PRODUCTS[0], 'v2')
+
+    assert rendered.suffix.count('tech enthusiasts') == 1
+    assert rendered.suffix.count('256GB storage, 50MP camera') == 1
+    assert rendered.chars < len(get_product_description_prompt(PRODUCTS[0], 'v1'))
+
+
+def test_rendered_prompt_size_accounting():
+    rendered = render_product_prompt(PRODUCTS[0], 'v2')
+
+    size = rendered.size()
+    assert size['chars'] == len(rendered.text) == size['prefix_chars'] + size['suffix_chars']
+    assert size['estimated_tokens'] == estimate_tokens(rendered.text) == round(len(rendered.text) / 4)
+
+
+def test_template_stats_accumulate_per_version():
+    template = templates.get('v2')
+    before = template.stats()
+
+    rendered = render_product_prompt(PRODUCTS[1], 'v2')
+
+    after = template.stats()
+    assert after['renders'] == before['renders'] + 1
+    assert after['total_chars'] == before['total_chars'] + rendered.chars
+    assert after['prefix_chars'] == len(template.prefix)
+
+
+def test_unknown_version_is_rejected():
+    with pytest.raises(ValueError, match='Unknown prompt template version'):
+        render_product_prompt(PRODUCTS[0], 'v0')
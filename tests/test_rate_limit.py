@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.rate_limit import FileLockState, RateLimitedError, TokenBucketLimiter
+
+
+def test_limiter_allows_the_burst_then_paces():
+    limiter = TokenBucketLimiter(rpm=60, headroom=0.5)  # 30 per minute, burst of 30
+
+    waits = [limiter.reserve(0) for _ in range(31)]
+
+    assert waits[:30] == [0.0] * 30
+    assert waits[30] == pytest.approx(2.0, abs=0.1)
+    assert limiter.stats()['delayed'] == 1
+
+
+def test_limiter_rejects_a_wait_past_max_wait_without_reserving():
+    limiter = TokenBucketLimiter(tpm=1000, headroom=0.5)  # 500 tokens per minute, burst of 500
+    limiter.reserve(500)
+
+    with pytest.raises(RateLimitedError) as info:
+        limiter.reserve(100, max_wait=1.0)
+    assert info.value.retry_after == pytest.approx(12.0, abs=0.1)
+    assert limiter.reserve(100) == pytest.approx(12.0, abs=0.1)  # the rejected call took nothing
+
+
+def test_limiter_settles_the_token_estimate():
+    limiter = TokenBucketLimiter(tpm=1000, headroom=0.5)
+    limiter.reserve(400)
+    limiter.settle(400, 100)  # 300 tokens back
+
+    assert limiter.reserve(400) == 0.0
+
+
+def test_limiter_drain_makes_callers_wait():
+    limiter = TokenBucketLimiter(rpm=600, headroom=0.5)
+    limiter.drain()
+
+    assert limiter.reserve(0) > 0
+
+
+# File-backed state
+
+def test_file_state_is_shared_between_limiters(tmp_path):
+    path = str(tmp_path / 'quota.json')
+    first = TokenBucketLimiter(rpm=60, headroom=0.5, state=FileLockState(path))
+    second = TokenBucketLimiter(rpm=60, headroom=0.5, state=FileLockState(path))
+
+    for _ in range(30):
+        first.reserve(0)
+
+    assert second.reserve(0) == pytest.approx(2.0, abs=0.1)
+
+
+def test_concurrent_coroutines_share_the_file_state_without_blocking_the_loop(tmp_path):
+    state = FileLockState(str(tmp_path / 'quota.json'))
+    limiter = TokenBucketLimiter(rpm=60, tpm=100000, headroom=0.5, state=state)
+    threads = []
+    update = state.update
+
+    def slow_update(fn):
+        threads.append(threading.current_thread().name)
+        time.sleep(0.01)  # stands in for another process holding the flock
+        return update(fn)
+    state.update = slow_update
+
+    async def callers():
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.002)
+        clock = asyncio.ensure_future(ticker())
+        await asyncio.gather(*(limiter.acquire(100) for _ in range(10)))
+        await asyncio.gather(*(limiter.settle_async(100, 60) for _ in range(10)))
+        clock.cancel()
+        return ticks
+
+    ticks = asyncio.run(callers())
+
+    assert len(threads) == 20
+    assert all(name.startswith('rate-limit-state') for name in threads)
+    assert len(ticks) > 20  # the loop kept running while the file was locked
+    stats = limiter.stats()
+    assert (stats['acquired'], stats['delayed'], stats['actual_tokens']) == (10, 0, 600)
+    assert stats['requests_utilization'] == pytest.approx(10 / 30, abs=0.02)  # no reservation was lost
+
+
+def test_drain_async_empties_the_file_state(tmp_path):
+    limiter = TokenBucketLimiter(rpm=600, headroom=0.5, state=FileLockState(str(tmp_path / 'quota.json')))
+
+    asyncio.run(limiter.drain_async())
+
+    assert limiter.reserve(0) > 0
+    assert limiter.stats()['drains'] == 1
+
+
+# Breaker admission before the quota
+
+def test_open_breaker_fails_fast_without_taking_quota(monkeypatch):
+    from services import generation
+
+    breaker = CircuitBreaker(min_calls=1, open_seconds=60)
+    breaker.before_call()
+    breaker.record(False, 0.1)
+    limiter = TokenBucketLimiter(rpm=60, headroom=0.5)
+    monkeypatch.setattr(generation, 'circuit_breaker', breaker)
+    monkeypatch.setattr(generation, 'rate_limiter', limiter)
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(generation._call_model("prompt", timeout=5.0))
+    assert limiter.stats()['acquired'] == 0
+
+
+def test_refused_quota_wait_releases_the_admission(monkeypatch):
+    from services import generation
+
+    breaker = CircuitBreaker(min_calls=1, open_seconds=0, half_open_max_calls=1)
+    breaker.before_call()
+    breaker.record(False, 0.1)  # half-open on the next call, with one probe slot
+    limiter = TokenBucketLimiter(rpm=2, headroom=0.5)
+    limiter.reserve(0)
+    monkeypatch.setattr(generation, 'circuit_breaker', breaker)
+    monkeypatch.setattr(generation, 'rate_limiter', limiter)
+
+    with pytest.raises(RateLimitedError):
+        asyncio.run(generation._call_model("prompt", timeout=1.0))
+    assert breaker.accepting
@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+from services import generation
+from services.model_backends import FakeBackend, ModelResponse
+from utils.validators import OUTPUT_FIELDS
+
+
+class BrokenFirstBackend(FakeBackend):
+    """Answers the first call with a too-short short_description, then behaves like FakeBackend"""
+
+    def __init__(self, broken_calls=1):
+        super().__init__(mean_ms=0)
+        self.broken_calls = broken_calls
+        self.prompts = []
+
+    async def generate_content_async(self, prompt, stream=False, generation_config=None, **kwargs):
+        self.prompts.append(prompt)
+        response = await super().generate_content_async(prompt, generation_config=generation_config)
+        if len(self.prompts) > self.broken_calls:
+            return response
+        output = json.loads(response.text)
+        output['short_description'] = "Too short"
+        return ModelResponse(json.dumps(output))
+
+
+def test_repair_rewrites_only_the_failing_fields(fake_model, product):
+    fake_model(mean_ms=0)
+    output = {
+        'short_description': "Too short",
+        'detailed_description': "kept " * 60,
+        'bullet_points': ['kept'],
+        'seo_keywords': ['kept'],
+        'call_to_action': "kept",
+    }
+    errors = generation.check_output(output)
+
+    repaired, remaining = asyncio.run(generation.repair_output(product, output, errors))
+
+    assert remaining == {}
+    assert repaired['short_description'] != "Too short"
+    assert {field: repaired[field] for field in OUTPUT_FIELDS[1:]} == \
+        {field: output[field] for field in OUTPUT_FIELDS[1:]}
+
+
+def test_invalid_field_is_repaired_instead_of_failing_the_request(client, product, monkeypatch):
+    backend = BrokenFirstBackend()
+    monkeypatch.setattr(generation, 'get_model', lambda name=None: backend)
+    before = generation.repair_stats()
+
+    response = client.post('/generate-description', json=product)
+
+    assert response.status_code == 200
+    assert response.get_json()['short_description'] != "Too short"
+    assert len(backend.prompts) == 2
+    assert 'Rewrite ONLY these fields' in backend.prompts[1]
+    assert 'repair;dur=' in response.headers['Server-Timing']
+    after = generation.repair_stats()
+    assert (after['needed'] - before['needed'], after['succeeded'] - before['succeeded']) == (1, 1)
+
+
+def test_unrepairable_output_is_a_500(client, product, monkeypatch):
+    backend = BrokenFirstBackend(broken_calls=10)
+    monkeypatch.setattr(generation, 'get_model', lambda name=None: backend)
+    failed = generation.repair_stats()['failed']
+
+    response = client.post('/generate-description', json=product)
+
+    assert response.status_code == 500
+    assert response.get_json()['error'].startswith('Invalid output format: short_description')
+    assert generation.repair_stats()['failed'] == failed + 1
@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+from services.model_backends import FakeBackendError
+from utils.circuit_breaker import CircuitOpenError, OverloadedError
+from utils.rate_limit import RateLimitedError
+from utils.retry import RetryBudget, RetryError, RetryPolicy, classify_error, server_retry_delay
+from utils.timing import DeadlineCutOffError
+
+
+def failing(*errors, result='ok'):
+    """An attempt function that raises each error in turn, then returns result"""
+    errors = list(errors)
+    calls = []
+
+    async def attempt():
+        calls.append(len(calls))
+        if errors:
+            raise errors.pop(0)
+        return result
+    attempt.calls = calls
+    return attempt
+
+
+@pytest.mark.parametrize('exc, reason', [
+    (FakeBackendError("quota", 429), 'rate_limited'),
+    (FakeBackendError("overloaded", 503), 'unavailable'),
+    (FakeBackendError("bad request", 400), 'invalid_argument'),
+    (asyncio.TimeoutError(), 'deadline_exceeded'),
+    (DeadlineCutOffError("cut off"), 'local_deadline'),
+    (ValueError("Could not parse JSON response"), 'malformed_response'),
+    (ValueError("response was blocked by safety filters"), 'safety_block'),
+    (CircuitOpenError("open", 1.0), 'circuit_open'),
+    (OverloadedError("busy", 1.0), 'overloaded'),
+    (RateLimitedError("slow down", 1.0), 'throttled'),
+    (RuntimeError("boom"), 'unknown'),
+])
+def test_classify_error(exc, reason):
+    assert classify_error(exc) == reason
+
+
+def test_server_retry_delay_from_the_message():
+    assert server_retry_delay(Exception("429 Quota exceeded, please retry in 7.5s")) == 7.5
+    assert server_retry_delay(Exception("503")) is None
+
+
+def test_retryable_errors_are_retried():
+    policy = RetryPolicy(max_attempts=3, base_delay=0)
+    attempt = failing(FakeBackendError("busy", 503), FakeBackendError("quota", 429))
+
+    assert asyncio.run(policy.run_async(attempt)) == 'ok'
+    assert len(attempt.calls) == 3
+    assert policy.stats()['outcomes'] == {'retried': 2, 'success_after_retry': 1}
+
+
+def test_fatal_error_is_not_retried():
+    policy = RetryPolicy(max_attempts=3, base_delay=0)
+    attempt = failing(FakeBackendError("bad request", 400))
+
+    with pytest.raises(RetryError) as info:
+        asyncio.run(policy.run_async(attempt))
+    assert (info.value.outcome, info.value.reason, info.value.attempts) == ('fatal_error', 'invalid_argument', 1)
+
+
+def test_retries_exhausted():
+    policy = RetryPolicy(max_attempts=2, base_delay=0)
+    attempt = failing(*[FakeBackendError("busy", 503)] * 5)
+
+    with pytest.raises(RetryError) as info:
+        asyncio.run(policy.run_async(attempt))
+    assert info.value.outcome == 'retries_exhausted'
+    assert len(attempt.calls) == 2
+
+
+def test_empty_retry_budget_stops_retries():
+    policy = RetryPolicy(max_attempts=3, base_delay=0, budget=RetryBudget(ratio=0.0, min_retries=0))
+
+    with pytest.raises(RetryError) as info:
+        asyncio.run(policy.run_async(failing(FakeBackendError("busy", 503))))
+    assert info.value.outcome == 'budget_exhausted'
+
+
+def test_retry_budget_allows_a_share_of_requests():
+    budget = RetryBudget(ratio=0.5, min_retries=1, window=60)
+    for _ in range(4):
+        budget.record_request()
+
+    granted = [budget.try_acquire_retry() for _ in range(4)]
+
+    assert granted == [True, True, True, False]  # 1 + 0.5 * 4
+
+
+def test_failover_retry_is_not_charged_to_the_budget():
+    budget = RetryBudget(ratio=0.0, min_retries=0)
+    policy = RetryPolicy(max_attempts=3, base_delay=10, budget=budget)
+
+    result = asyncio.run(policy.run_async(failing(FakeBackendError("busy", 503)), failover=lambda: True))
+
+    assert result == 'ok'
+    assert policy.stats()['outcomes'] == {'failed_over': 1, 'success_after_retry': 1}
+    assert budget.stats()['retries_in_window'] == 0
+
+
+def test_server_retry_delay_is_honored_in_full():
+    policy = RetryPolicy(base_delay=0.5, max_delay=8)
+
+    assert 7.5 <= policy.backoff_delay(1, Exception("429 Quota exceeded, please retry in 7.5s")) <= 8.0
+
+
+def test_server_delay_past_max_delay_is_not_cut_short():
+    policy = RetryPolicy(max_attempts=3, base_delay=0, max_delay=8)
+    attempt = failing(FakeBackendError("429 Quota exceeded, please retry in 30s", 429))
+
+    with pytest.raises(RetryError) as info:
+        asyncio.run(policy.run_async(attempt))
+    assert (info.value.outcome, info.value.retry_after, len(attempt.calls)) == ('retry_after_too_long', 30.0, 1)
+
+
+def test_server_delay_past_the_deadline_is_reported():
+    from utils.timing import Deadline
+    policy = RetryPolicy(max_attempts=3, base_delay=0, max_delay=8)
+
+    with pytest.raises(RetryError) as info:
+        asyncio.run(policy.run_async(failing(FakeBackendError("retry in 3s", 429)), deadline=Deadline(1)))
+    assert (info.value.outcome, info.value.retry_after) == ('deadline_exhausted', 3.0)
+
+
+def test_server_delay_surfaces_as_retry_after(client, product, monkeypatch):
+    from services import generation
+
+    async def quota(*args, **kwargs):
+        raise FakeBackendError("429 Quota exceeded, please retry in 30s", 429)
+    monkeypatch.setattr(generation, '_call_model', quota)
+
+    response = client.post('/generate-description', json=product)
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
@@ -0,0 +1,119 @@
+from utils.semantic_cache import SemanticCache, jaccard, name_shingles, patch_output
+
+SOURCE = {'product_name': 'Galaxy S24', 'key_features': ['5000mAh battery', 'AMOLED display'], 'price': 79999}
+
+
+def patched(text, source=SOURCE, **target):
+    output = patch_output({'short_description': text}, source, dict(source, **target))
+    return output['short_description'] if output is not None else None
+
+
+def test_name_is_substituted():
+    text = "Galaxy S24 pairs a 5000mAh battery with an AMOLED display."
+
+    assert patched(text, product_name='Galaxy S25') == "Galaxy S25 pairs a 5000mAh battery with an AMOLED display."
+
+
+def test_swapped_feature_is_not_patched():
+    # The AMOLED copy ("deep blacks") must not be passed off as describing an LTPO display
+    text = "Its AMOLED display shows deep blacks."
+
+    assert patched(text, key_features=['5000mAh battery', 'LTPO display']) is None
+
+
+def test_feature_wording_alone_is_not_a_change():
+    text = "Galaxy S24 with an AMOLED display"
+
+    assert patched(text, key_features=['amoled  display', '5000mAh battery']) == text
+
+
+def test_list_fields_are_patched():
+    output = patch_output({'seo_keywords': ['galaxy s24', 'phone']}, SOURCE, dict(SOURCE, product_name='Pixel 9'))
+
+    assert output == {'seo_keywords': ['Pixel 9', 'phone']}
+
+
+def test_removed_features_are_not_patched():
+    assert patched("Galaxy S24", key_features=['5000mAh battery']) is None
+
+
+def test_unchanged_product_returns_a_copy():
+    output = {'short_description': "Galaxy S24 for ₹79,999"}
+
+    result = patch_output(output, SOURCE, dict(SOURCE))
+
+    assert result == output
+    assert result is not output
+
+
+def test_price_in_the_formats_the_model_writes():
+    assert patched("Yours for ₹79,999 only", price=129999) == "Yours for ₹1,29,999 only"
+    assert patched("Yours for Rs.79999/-", price=129999) == "Yours for Rs.129999/-"
+    assert patched("Now 1,079,999.00!", dict(SOURCE, price=1079999), price=1129999) == "Now 1,129,999.00!"
+
+
+def test_price_inside_a_longer_number_is_left_alone():
+    source = dict(SOURCE, key_features=['fast charging', 'AMOLED display'], price=1000)
+
+    assert patched("10000mAh cell, 1000 rupees", source, price=1200) == "10000mAh cell, 1200 rupees"
+
+
+def test_price_prefix_of_a_decimal_is_left_alone():
+    source = dict(SOURCE, price=62.0)
+
+    assert patched("Rated 62.05 out of 100, priced at 62", source, price=70) == \
+        "Rated 62.05 out of 100, priced at 70"
+
+
+def test_price_in_the_product_name_is_not_rewritten():
+    source = dict(SOURCE, product_name='Model 1000', price=1000)
+
+    assert patched("Model 1000 costs 1000", source, product_name='Model 2000', price=1500) == \
+        "Model 2000 costs 1500"
+
+
+def test_lookup_patches_the_closest_product_with_the_same_features():
+    cache = SemanticCache(threshold=0.7)
+    cache.add('a', SOURCE, 'block', {'short_description': "Galaxy S24 at 79,999"})
+
+    output, similarity = cache.lookup(dict(SOURCE, product_name='Galaxy S24 FE', price=59999), 'block')
+
+    assert output == {'short_description': "Galaxy S24 FE at 59,999"}
+    assert similarity >= 0.7
+    assert cache.stats()['hits'] == 1
+
+
+def test_lookup_misses_a_product_with_a_swapped_feature():
+    cache = SemanticCache(threshold=0.5)
+    cache.add('a', SOURCE, 'block', {'short_description': "Its AMOLED display shows deep blacks."})
+
+    # An identical name is no candidate when the features differ
+    assert cache.lookup(dict(SOURCE, key_features=['5000mAh battery', 'LTPO display']), 'block') == (None, 0.0)
+    assert cache.stats()['misses'] == 1
+
+
+def test_similarity_is_name_similarity():
+    cache = SemanticCache(threshold=0.9)
+    cache.add('a', SOURCE, 'block', {'short_description': "Galaxy S24"})
+
+    output, similarity = cache.lookup(dict(SOURCE, product_name='Galaxy S24 FE'), 'block')
+
+    assert output is None
+    assert similarity == round(jaccard(name_shingles('Galaxy S24'), name_shingles('Galaxy S24 FE')), 4)
+
+
+def test_lookup_rejects_a_patch_the_validator_refuses():
+    cache = SemanticCache(threshold=0.5)
+    cache.add('a', SOURCE, 'block', {'short_description': "Galaxy S24"})
+
+    output, _ = cache.lookup(dict(SOURCE, product_name='Galaxy S25'), 'block', validate=lambda output: False)
+
+    assert output is None
+    assert cache.stats()['rejected'] == 1
+
+
+def test_lookup_stays_within_the_block():
+    cache = SemanticCache(threshold=0.5)
+    cache.add('a', SOURCE, 'block', {'short_description': "Galaxy S24"})
+
+    assert cache.lookup(SOURCE, 'other block') == (None, 0.0)
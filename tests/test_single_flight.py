@@ -0,0 +1,139 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def counted(result='done', delay=0.05, error=None):
+    """A coro factory that counts its executions"""
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+    work.runs = runs
+    return work
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    work = counted()
+
+    async def callers():
+        return await asyncio.gather(*(flight.run('k', work) for _ in range(5)))
+
+    results = asyncio.run(callers())
+
+    assert len(work.runs) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert all(result == 'done' for result, _ in results)
+    assert flight.stats() == {'in_flight': 0, 'leaders': 1, 'coalesced': 4, 'coalesced_rate': 0.8}
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    work = counted()
+
+    async def callers():
+        return await asyncio.gather(flight.run('a', work), flight.run('b', work))
+
+    asyncio.run(callers())
+
+    assert len(work.runs) == 2
+
+
+def test_error_reaches_every_caller_and_the_key_is_freed():
+    flight = SingleFlight()
+
+    async def callers():
+        return await asyncio.gather(*(flight.run('k', counted(error=ValueError('bad'))) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(callers())
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_follower_timeout_leaves_the_leader_running():
+    flight = SingleFlight()
+
+    async def callers():
+        leader = asyncio.ensure_future(flight.run('k', counted(delay=0.1)))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await flight.run('k', counted(), timeout=0.01)
+        return await leader
+
+    assert asyncio.run(callers()) == ('done', False)
+
+
+def test_cancelled_leader_does_not_cancel_the_followers():
+    flight = SingleFlight()
+    work = counted(delay=0.05)
+
+    async def callers():
+        leader = asyncio.ensure_future(flight.run('k', work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.run('k', work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(callers()) == ('done', True)
+    assert len(work.runs) == 1
+
+
+def test_calls_are_shared_across_event_loops():
+    flight = SingleFlight()
+    work = counted(delay=0.1)
+    results = []
+
+    def call():
+        results.append(asyncio.run(flight.run('k', work)))
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(work.runs) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True]
+
+
+def test_identical_generations_are_coalesced(product, fake_model):
+    from services.generation import generate_description_async
+
+    backend = fake_model(mean_ms=50)
+    calls = []
+    generate = backend.generate_content_async
+
+    async def counting(prompt, **kwargs):
+        calls.append(prompt)
+        return await generate(prompt, **kwargs)
+    backend.generate_content_async = counting
+
+    async def requests():
+        return await asyncio.gather(*(generate_description_async(product) for _ in range(3)))
+
+    statuses = sorted(status for _, status in asyncio.run(requests()))
+
+    assert statuses == ['COALESCED', 'COALESCED', 'MISS']
+    assert len(calls) == 1
+
+
+def test_no_cache_generations_are_never_coalesced(product, fake_model):
+    from services.generation import generate_description_async
+
+    fake_model(mean_ms=20)
+
+    async def requests():
+        return await asyncio.gather(*(generate_description_async(product, bypass_cache=True) for _ in range(2)))
+
+    assert [status for _, status in asyncio.run(requests())] == ['BYPASS', 'BYPASS']
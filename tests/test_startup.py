@@ -0,0 +1,97 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from startup_benchmark import FORBIDDEN_MODULES, parse_importtime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = """
+import json, sys
+import app
+from services import generation
+client = app.app.test_client()
+statuses = [client.get('/health').status_code, client.get('/ready').status_code,
+            client.post('/validate-input', json={'product_name': 'Probe'}).status_code]
+print(json.dumps({
+    'statuses': statuses,
+    'initialized': generation.model_router.initialized(),
+    'imported': sorted(name for name in %r if name in sys.modules),
+}))
+""" % (FORBIDDEN_MODULES,)
+
+
+def test_import_and_probes_do_not_build_the_model_client():
+    env = dict(os.environ, MODEL_BACKEND='gemini', WARM_UP_ON_START='false')
+    env.pop('GEMINI_API_KEY', None)
+    result = subprocess.run([sys.executable, '-c', _PROBE], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True)
+
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert probe == {'statuses': [200, 200, 400], 'initialized': False, 'imported': []}
+
+
+def test_parse_importtime_skips_interpreter_start_up():
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       100 |        100 |   encodings",
+        "import time:       200 |        300 | site",
+        "import time:       50 |        900 | flask",
+        "import time:       10 |         10 |   flask.json",
+    ])
+
+    assert parse_importtime(stderr) == {'flask': (50, 900), 'flask.json': (10, 10)}
+
+
+@pytest.fixture
+def warm_up_state(monkeypatch):
+    from services import generation
+    state = {'status': 'idle', 'seconds': None, 'error': None}
+    monkeypatch.setattr(generation, '_warm_up_state', state)
+    return state
+
+
+def wait_for_warm_up(state):
+    for _ in range(200):
+        if state['status'] != 'running':
+            return state
+        time.sleep(0.01)
+    raise AssertionError("warm-up did not finish")
+
+
+@pytest.mark.parametrize('status, code', [('idle', 200), ('running', 503), ('done', 200), ('failed', 503)])
+def test_ready_follows_the_warm_up(client, warm_up_state, status, code):
+    warm_up_state['status'] = status
+
+    response = client.get('/ready')
+
+    assert response.status_code == code
+    assert response.get_json()['warm_up']['status'] == status
+
+
+def test_warm_up_builds_the_model_client(client, warm_up_state):
+    from services.generation import start_warm_up
+
+    start_warm_up()
+
+    assert wait_for_warm_up(warm_up_state)['status'] == 'done'
+    body = client.get('/ready').get_json()
+    assert body['ready'] and body['backend']['initialized']
+
+
+def test_failed_warm_up_is_reported(client, warm_up_state, monkeypatch):
+    from services import generation
+
+    def broken(name=None):
+        raise RuntimeError("no credentials")
+    monkeypatch.setattr(generation, 'get_model', broken)
+
+    generation.start_warm_up()
+
+    assert wait_for_warm_up(warm_up_state)['error'] == "no credentials"
+    assert client.get('/ready').status_code == 503
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from prompts.prompt_templates import OUTPUT_SCHEMA, output_schema
+from services import generation
+from services.model_backends import FakeBackend
+from utils.validators import OUTPUT_FIELDS
+
+
+class RecordingBackend(FakeBackend):
+    def __init__(self):
+        super().__init__(mean_ms=0)
+        self.calls = []
+
+    async def generate_content_async(self, prompt, stream=False, generation_config=None, **kwargs):
+        self.calls.append((prompt, generation_config))
+        return await super().generate_content_async(prompt, stream=stream, generation_config=generation_config)
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = RecordingBackend()
+    monkeypatch.setattr(generation, 'get_model', lambda name=None: backend)
+    return backend
+
+
+def test_output_schema_requires_the_requested_fields():
+    assert OUTPUT_SCHEMA['required'] == OUTPUT_FIELDS
+    assert list(output_schema(['call_to_action'])['properties']) == ['call_to_action']
+    assert OUTPUT_SCHEMA['properties']['bullet_points']['items'] == {'type': 'STRING'}
+
+
+def test_structured_request_sends_the_response_schema(client, product, backend):
+    response = client.post('/generate-description?output_mode=structured', json=product)
+
+    assert response.status_code == 200
+    assert list(response.get_json()) == OUTPUT_FIELDS
+    prompt, generation_config = backend.calls[0]
+    assert generation_config == {'response_mime_type': 'application/json', 'response_schema': OUTPUT_SCHEMA}
+    # The schema pins the shape, so the prompt carries no example or format instructions
+    assert 'EXAMPLE OUTPUT FORMAT' not in prompt
+    assert 'Return ONLY valid JSON' not in prompt
+
+
+def test_text_mode_sends_no_schema(client, product, backend):
+    response = client.post('/generate-description?output_mode=text', json=product)
+
+    assert response.status_code == 200
+    assert backend.calls[0][1] is None
+
+
+def test_output_modes_are_cached_apart(client, product, backend):
+    client.post('/generate-description?output_mode=text', json=product)
+    response = client.post('/generate-description?output_mode=structured', json=product)
+
+    assert response.headers['X-Cache'] == 'MISS'
+    assert len(backend.calls) == 2
+
+
+def test_unknown_output_mode_is_a_400(client, product):
+    response = client.post('/generate-description?output_mode=xml', json=product)
+
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Unknown output_mode: xml')
+
+
+def test_structured_reply_is_parsed_without_cleanup():
+    assert generation.parse_model_output('{"call_to_action": "Buy"}', structured=True) == {'call_to_action': 'Buy'}
+    with pytest.raises(ValueError, match='Could not parse JSON response'):
+        generation.parse_model_output('```json\n{"call_to_action": "Buy"}\n```', structured=True)
+
+
+def test_structured_repair_asks_for_the_failing_fields_only(product, backend):
+    output = {'short_description': "Too short", 'bullet_points': ['kept']}
+    errors = {'short_description': "short_description must be 20-50 words, got 2"}
+
+    asyncio.run(generation.repair_output(product, output, errors, structured=True))
+
+    generation_config = backend.calls[0][1]
+    assert generation_config['response_schema'] == output_schema(['short_description'])
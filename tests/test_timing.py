@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+import pytest
+
+from config import Config
+from utils.timing import Deadline, ServerTiming, hedged
+
+
+def test_deadline_counts_down_from_its_start():
+    deadline = Deadline(5.0, started=time.monotonic() - 4.5)
+
+    assert deadline.remaining() == pytest.approx(0.5, abs=0.05)
+    assert not deadline.expired()
+    assert Deadline(1.0, started=time.monotonic() - 2).expired()
+
+
+def test_server_timing_header_sums_repeated_stages():
+    timings = ServerTiming()
+    timings.add('llm', 0.25)
+    timings.add('llm', 0.25)
+    timings.add('total', 0.6)
+
+    assert timings.header_value() == 'llm;dur=500.0, total;dur=600.0'
+
+
+def calls(*plan):
+    """A call factory whose n-th call sleeps plan[n][0] seconds, then returns (or raises) plan[n][1]"""
+    plan = list(plan)
+    started = []
+
+    async def call():
+        delay, outcome = plan[len(started)]
+        started.append(delay)
+        await asyncio.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    call.started = started
+    return call
+
+
+def test_fast_primary_launches_no_backup():
+    call = calls((0.0, 'primary'), (0.0, 'backup'))
+    hedges = []
+
+    assert asyncio.run(hedged(call, 0.05, on_hedge=hedges.append)) == 'primary'
+    assert call.started == [0.0]
+    assert hedges == []
+
+
+def test_backup_wins_over_a_slow_primary():
+    call = calls((1.0, 'primary'), (0.0, 'backup'))
+    hedges = []
+
+    assert asyncio.run(hedged(call, 0.01, on_hedge=hedges.append)) == 'backup'
+    assert hedges == [True]
+
+
+def test_failed_call_falls_back_to_the_other():
+    call = calls((0.05, RuntimeError('primary failed')), (0.1, 'backup'))
+
+    assert asyncio.run(hedged(call, 0.01)) == 'backup'
+
+
+def test_both_calls_failing_raises():
+    call = calls((0.02, RuntimeError('first')), (0.05, RuntimeError('second')))
+
+    with pytest.raises(RuntimeError, match='first'):
+        asyncio.run(hedged(call, 0.01))
+
+
+def test_no_backup_when_can_hedge_refuses():
+    call = calls((0.05, 'primary'), (0.0, 'backup'))
+
+    assert asyncio.run(hedged(call, 0.01, can_hedge=lambda: False)) == 'primary'
+    assert len(call.started) == 1
+
+
+def test_slow_model_answers_504_within_the_deadline(client, product, fake_model, monkeypatch):
+    from services.generation import model_router
+
+    fake_model(mean_ms=2000)
+    monkeypatch.setattr(Config, 'MAX_RESPONSE_TIME', 0.3)
+    monkeypatch.setattr(Config, 'MIN_ATTEMPT_SECONDS', 0.05)
+    cut_off = model_router.stats()['models'][model_router.default]['cut_off']
+
+    started = time.monotonic()
+    response = client.post('/generate-description', json=product)
+
+    assert response.status_code == 504
+    assert time.monotonic() - started < 1.0
+    assert 'response deadline' in response.get_json()['error']
+    assert 'total;dur=' in response.headers['Server-Timing']
+    # A cut-off says nothing about the model, so it is kept out of its error stats
+    assert model_router.stats()['models'][model_router.default]['cut_off'] == cut_off + 1
@@ -0,0 +1,97 @@
+import pytest
+
+from utils.validators import validate_input, validate_product
+
+VALID = {
+    'product_name': 'Aurora Smartwatch',
+    'category': 'Wearables',
+    'key_features': ['heart rate monitor', 'GPS'],
+    'price': 12999,
+}
+
+
+def test_valid_product_gets_optional_defaults():
+    validated, valid, errors = validate_product(VALID)
+
+    assert valid is True
+    assert errors == {}
+    assert validated['target_audience'] == 'general'
+    assert validated['tone'] == 'professional'
+
+
+def test_category_is_case_insensitive():
+    _, valid, _ = validate_product(dict(VALID, category='wearables'))
+
+    assert valid is True
+
+
+@pytest.mark.parametrize('field, value, code', [
+    ('product_name', '   ', 'empty'),
+    ('product_name', 42, 'invalid_type'),
+    ('category', 'Furniture', 'unknown_category'),
+    ('key_features', 'GPS', 'invalid_type'),
+    ('key_features', ['GPS', ''], 'invalid_feature'),
+    ('price', -1, 'negative'),
+    ('price', '999', 'invalid_type'),
+    ('price', float('nan'), 'not_finite'),
+    ('price', float('inf'), 'not_finite'),
+])
+def test_invalid_required_field(field, value, code):
+    validated, valid, errors = validate_product(dict(VALID, **{field: value}))
+
+    assert valid is False
+    assert errors == {field: code}
+    assert validated[field] == 'Invalid input'
+
+
+def test_missing_required_field():
+    data = dict(VALID)
+    del data['price']
+
+    validated, valid, errors = validate_product(data)
+
+    assert valid is False
+    assert errors == {'price': 'missing'}
+    assert validated['price'] == 'Invalid input'
+
+
+def test_invalid_optional_field_does_not_invalidate_the_payload():
+    validated, valid, errors = validate_product(dict(VALID, tone=''))
+
+    assert valid is True
+    assert errors == {'tone': 'empty'}
+    assert validated['tone'] == 'Invalid input'
+
+
+def test_non_object_payload():
+    _, valid, errors = validate_product(['not', 'a', 'product'])
+
+    assert valid is False
+    assert errors == {'payload': 'invalid_type'}
+
+
+def test_validate_input_messages():
+    assert validate_input(dict(VALID, price=-3)) == ["price must not be negative"]
+    assert validate_input(VALID) == []
+
+
+def test_batch_endpoint_reports_each_payload(client):
+    response = client.post('/validate-input/batch', json={'products': [VALID, dict(VALID, price=-1), 'nope']})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['summary'] == {'total': 3, 'valid': 1, 'invalid': 2}
+    assert [r['is_valid'] for r in body['results']] == [True, False, False]
+    assert 'price' in body['results'][1]['errors']
+
+
+def test_batch_endpoint_accepts_a_bare_array_and_rejects_an_empty_one(client):
+    assert client.post('/validate-input/batch', json=[VALID]).get_json()['summary']['valid'] == 1
+    assert client.post('/validate-input/batch', json=[]).status_code == 400
+
+
+def test_batch_endpoint_limits_the_batch_size(client, monkeypatch):
+    from config import Config
+    monkeypatch.setattr(Config, 'VALIDATE_BATCH_MAX_ITEMS', 2)
+
+    assert client.post('/validate-input/batch', json=[VALID] * 3).status_code == 413
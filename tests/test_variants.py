@@ -0,0 +1,109 @@
+import asyncio
+import re
+import time
+
+import pytest
+
+from services.generation import DeadlineExceededError, GenerationError, _raise_for_retry_error
+from utils.circuit_breaker import OverloadedError
+from utils.retry import RetryError
+from utils.timing import Deadline
+from utils.validators import validate_variants
+
+VARIANTS = [{'tone': 'casual'}, {'tone': 'luxury', 'id': 'lux'}, {'locale': 'en-GB', 'target_audience': 'students'}]
+
+
+def post_variants(client, product, variants=VARIANTS):
+    return client.post('/generate-description/variants', json={'product': product, 'variants': variants})
+
+
+def test_variants_share_one_call_and_are_cached(client, product):
+    first = post_variants(client, product)
+
+    assert first.status_code == 200
+    body = first.get_json()
+    assert list(body['variants']) == ['casual', 'lux', 'en-gb-students']
+    assert all(result['status'] == 'ok' for result in body['variants'].values())
+    assert (body['summary']['calls'], body['summary']['succeeded']) == (1, 3)
+    assert 'Server-Timing' in first.headers
+
+    again = post_variants(client, product).get_json()
+    assert (again['summary']['cached'], again['summary']['calls']) == (3, 0)
+
+
+def test_only_the_failing_variant_is_regenerated(client, product, fake_model):
+    backend = fake_model(mean_ms=5)
+    generate = backend.generate_content_async
+    prompts = []
+
+    async def drop_first_variant_once(prompt, **kwargs):
+        prompts.append(prompt)
+        response = await generate(prompt, **kwargs)
+        if len(prompts) == 1:
+            response.text = response.text.replace('"casual"', '"unrequested"', 1)
+        return response
+    backend.generate_content_async = drop_first_variant_once
+
+    body = post_variants(client, product).get_json()
+
+    assert body['summary'] == dict(body['summary'], succeeded=3, calls=2, rounds=2, regenerated=1)
+    assert re.findall(r'^- ([\w.-]+): locale ', prompts[1], re.MULTILINE) == ['casual']
+
+
+def test_too_many_variants_is_413(client, product, monkeypatch):
+    from config import Config
+    monkeypatch.setattr(Config, 'VARIANTS_MAX_ITEMS', 2)
+
+    response = post_variants(client, product)
+
+    assert response.status_code == 413
+    assert response.get_json()['error'] == "Too many variants: 3 (max 2)"
+
+
+@pytest.mark.parametrize('variants, error', [
+    ([], "variants must be a non-empty array"),
+    ([{'tone': 'casual'}, {'tone': 'Casual'}], "Duplicate variant id: casual"),
+    ([{'id': 'x'}], "variants[0] must set at least one of: locale, tone, target_audience"),
+])
+def test_invalid_variants(variants, error):
+    assert validate_variants(variants) == (None, error)
+
+
+def test_ids_default_to_the_targets():
+    variants, error = validate_variants([{'locale': 'fr-FR', 'tone': 'casual'}])
+
+    assert error is None
+    assert variants == [{'locale': 'fr-FR', 'tone': 'casual', 'id': 'fr-fr-casual'}]
+
+
+@pytest.mark.parametrize('error, status', [
+    (OverloadedError("busy", 2.5), 503),
+    (DeadlineExceededError("too slow"), 504),
+    (GenerationError("bad output"), 500),
+])
+def test_generation_errors_map_to_statuses(client, product, monkeypatch, error, status):
+    import app
+
+    def fail(*args, **kwargs):
+        raise error
+    monkeypatch.setattr(app, 'generate_variants', fail)
+
+    response = post_variants(client, product)
+
+    assert response.status_code == status
+    assert response.get_json() == {'error': str(error)}
+    assert 'total;dur=' in response.headers['Server-Timing']
+    assert response.headers.get('Retry-After') == ('3' if status == 503 else None)
+
+
+def test_retry_error_mapping():
+    rejected = OverloadedError("busy", 1)
+    with pytest.raises(OverloadedError):
+        _raise_for_retry_error(RetryError(rejected, 1, 'rejected', 'fatal_error'), None)
+
+    expired = Deadline(0.01, started=time.monotonic() - 1)
+    with pytest.raises(DeadlineExceededError):
+        _raise_for_retry_error(RetryError(asyncio.TimeoutError(), 2, 'timeout', 'exhausted'), expired)
+
+    with pytest.raises(GenerationError, match="non-retryable"):
+        _raise_for_retry_error(RetryError(ValueError("bad key"), 1, 'auth', 'fatal_error'), Deadline(60))
@@ -0,0 +1,205 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cachetools import TTLCache
+
+
+def normalize_text(value):
+    """Collapse internal whitespace and strip the ends of a string"""
+    return ' '.join(value.split()) if isinstance(value, str) else value
+
+
+def canonicalize_product(data):
+    """Build the canonical form of a validated product payload used for cache keys"""
+    features = data.get('key_features', [])
+    if isinstance(features, list):
+        features = sorted(normalize_text(f) for f in features)
+
+    category = data.get('category', '')
+    if isinstance(category, str):
+        category = normalize_text(category).casefold()
+
+    return {
+        'product_name': normalize_text(data.get('product_name')),
+        'category': category,
+        'key_features': features,
+        'price': data.get('price'),
+        'target_audience': normalize_text(data.get('target_audience', 'general')),
+        'tone': normalize_text(data.get('tone', 'professional')),
+    }
+
+
+def make_cache_key(data, prompt_version):
+    """Content-addressed key: sha256 of the canonical payload plus the prompt version"""
+    payload = json.dumps(
+        {'product': canonicalize_product(data), 'prompt_version': prompt_version},
+        sort_keys=True,
+        separators=(',', ':'),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _CountingTTLCache(TTLCache):
+    """TTLCache that reports LRU evictions and TTL expirations to its owner"""
+
+    def __init__(self, maxsize, ttl, on_evict, on_expire):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self._on_evict = on_evict
+        self._on_expire = on_expire
+
+    def popitem(self):
+        item = super().popitem()
+        self._on_evict()
+        return item
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        if expired:
+            self._on_expire(len(expired))
+        return expired
+
+
+class _SQLiteTier:
+    """Persistent cache tier backed by a single SQLite table"""
+
+    def __init__(self, path, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + self.ttl),
+            )
+            self._conn.commit()
+
+    def size(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    """Two-tier (in-memory LRU/TTL + optional SQLite) cache for generated descriptions.
+
+    Coroutines use get_async()/set_async(), which touch the SQLite tier on a
+    dedicated thread so a lookup never blocks the event loop.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600, db_path=None, disk_ttl=None):
+        self._lock = threading.Lock()
+        self._counters = {
+            'hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'bypasses': 0,
+        }
+        self._memory = _CountingTTLCache(
+            maxsize, ttl, self._record_eviction, self._record_expirations
+        )
+        self._disk = _SQLiteTier(db_path, disk_ttl or ttl) if db_path else None
+        self._disk_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cache-disk') if db_path else None
+
+    def _record_eviction(self):
+        self._counters['evictions'] += 1
+
+    def _record_expirations(self, count):
+        self._counters['expirations'] += count
+
+    def _get_memory(self, key):
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._counters['hits'] += 1
+            return value
+
+    def _get_disk(self, key):
+        """Look key up in the SQLite tier, promoting a hit to memory"""
+        value = self._disk.get(key)
+        if value is not None:
+            with self._lock:
+                self._memory[key] = value
+                self._counters['hits'] += 1
+                self._counters['disk_hits'] += 1
+        return value
+
+    def _record_miss(self):
+        with self._lock:
+            self._counters['misses'] += 1
+
+    def get(self, key):
+        """Return the cached value for key or None, promoting disk hits to memory"""
+        value = self._get_memory(key)
+        if value is None and self._disk is not None:
+            value = self._get_disk(key)
+        if value is None:
+            self._record_miss()
+        return value
+
+    async def get_async(self, key):
+        """get() for coroutines; the SQLite tier is read off the event loop"""
+        value = self._get_memory(key)
+        if value is None and self._disk is not None:
+            value = await asyncio.get_running_loop().run_in_executor(self._disk_executor, self._get_disk, key)
+        if value is None:
+            self._record_miss()
+        return value
+
+    def set(self, key, value):
+        """Store value in every configured tier"""
+        with self._lock:
+            self._memory[key] = value
+        if self._disk is not None:
+            self._disk.set(key, value)
+
+    async def set_async(self, key, value):
+        """set() for coroutines; the SQLite tier is written off the event loop"""
+        with self._lock:
+            self._memory[key] = value
+        if self._disk is not None:
+            await asyncio.get_running_loop().run_in_executor(self._disk_executor, self._disk.set, key, value)
+
+    def record_bypass(self):
+        """Count a request that skipped the lookup (Cache-Control: no-cache)"""
+        with self._lock:
+            self._counters['bypasses'] += 1
+
+    def stats(self):
+        """Snapshot of hit/miss/eviction counters and tier sizes"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['memory_size'] = len(self._memory)
+            stats['memory_maxsize'] = self._memory.maxsize
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['disk_enabled'] = self._disk is not None
+        if self._disk is not None:
+            stats['disk_size'] = self._disk.size()
+        return stats
@@ -0,0 +1,194 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class RejectedError(Exception):
+    """Base for requests refused before reaching the model; carries a Retry-After hint"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self):
+        """Retry-After value in whole seconds (at least 1)"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class CircuitOpenError(RejectedError):
+    """Raised while the breaker is open (or half-open with all probe slots taken)"""
+
+
+class OverloadedError(RejectedError):
+    """Raised when admission control sheds a request"""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by a rolling window of recent calls.
+
+    The breaker opens once the window holds at least `min_calls` results and
+    either the failure rate or the slow-call rate crosses its threshold. After
+    `open_seconds` it lets `half_open_max_calls` probe calls through; all of
+    them must succeed (and be fast) to close again, any failure re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window_size=20, min_calls=10, failure_rate_threshold=0.5,
+                 slow_call_seconds=10.0, slow_call_rate_threshold=0.8,
+                 open_seconds=30.0, half_open_max_calls=3, name='Gemini'):
+        self.name = name
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._window = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+        self._counters = {'opened': 0, 'rejected': 0}
+
+    def _rates(self):
+        calls = len(self._window)
+        if not calls:
+            return 0.0, 0.0
+        failures = sum(1 for failed, _ in self._window if failed)
+        slow = sum(1 for _, is_slow in self._window if is_slow)
+        return failures / calls, slow / calls
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._counters['opened'] += 1
+
+    def _close(self):
+        self._state = self.CLOSED
+        self._window.clear()
+
+    def before_call(self):
+        """Reserve permission for one call or raise CircuitOpenError"""
+        with self._lock:
+            if self._state == self.OPEN:
+                remaining = self._opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0:
+                    self._counters['rejected'] += 1
+                    raise CircuitOpenError(f"{self.name} circuit breaker is open", remaining)
+                self._state = self.HALF_OPEN
+                self._half_open_in_flight = 0
+                self._half_open_successes = 0
+
+            if self._state == self.HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_max_calls:
+                    self._counters['rejected'] += 1
+                    raise CircuitOpenError(f"{self.name} circuit breaker is half-open; probe calls in progress", 1.0)
+                self._half_open_in_flight += 1
+
+    def record(self, success, latency):
+        """Report the outcome of a call admitted by before_call"""
+        slow = latency >= self.slow_call_seconds
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+                if not success or slow:
+                    self._open()
+                    return
+                self._half_open_successes += 1
+                if self._half_open_successes >= self.half_open_max_calls:
+                    self._close()
+                return
+
+            if self._state == self.OPEN:
+                # Late result from a call started before the breaker tripped
+                return
+
+            self._window.append((not success, slow))
+            if len(self._window) >= self.min_calls:
+                failure_rate, slow_rate = self._rates()
+                if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+                    self._open()
+
+    def release(self):
+        """End an admitted call without an outcome (e.g. it was cancelled)"""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() >= self._opened_at + self.open_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    @property
+    def accepting(self):
+        """Whether before_call would admit a call right now (it reserves nothing)"""
+        with self._lock:
+            if self._state == self.OPEN:
+                return time.monotonic() >= self._opened_at + self.open_seconds
+            return self._state == self.CLOSED or self._half_open_in_flight < self.half_open_max_calls
+
+    def stats(self):
+        state = self.state
+        with self._lock:
+            failure_rate, slow_rate = self._rates()
+            stats = {
+                'state': state,
+                'calls_in_window': len(self._window),
+                'failure_rate': round(failure_rate, 4),
+                'slow_call_rate': round(slow_rate, 4),
+            }
+            stats.update(self._counters)
+            if state == self.OPEN:
+                stats['retry_after'] = round(self._opened_at + self.open_seconds - time.monotonic(), 2)
+        return stats
+
+
+class AdmissionController:
+    """Sheds new work once `max_in_flight` calls are already running"""
+
+    def __init__(self, max_in_flight=64, retry_after=1.0):
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counters = {'admitted': 0, 'rejected': 0}
+
+    @contextmanager
+    def slot(self):
+        """Hold one in-flight slot for the duration of the block or raise OverloadedError"""
+        with self._lock:
+            if self._in_flight >= self.max_in_flight:
+                self._counters['rejected'] += 1
+                raise OverloadedError(
+                    f"Too many generations in flight (limit {self.max_in_flight})", self.retry_after
+                )
+            self._in_flight += 1
+            self._counters['admitted'] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    @property
+    def in_flight(self):
+        with self._lock:
+            return self._in_flight
+
+    def stats(self):
+        with self._lock:
+            stats = {'in_flight': self._in_flight, 'max_in_flight': self.max_in_flight}
+            stats.update(self._counters)
+        return stats
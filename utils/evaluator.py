@@ -1,65 +1,115 @@
-def evaluate_description(input_data, generated_output):
-    """Evaluate generated description according to challenge criteria"""
-    score = 0
-    
-    
-    
-    
-    features_mentioned = all(
-        feature.lower() in generated_output.get('detailed_description', '').lower()
-        for feature in input_data.get('key_features', [])
-    )
-    if features_mentioned:
-        score += 10
-    
-    
+import re
+from collections import Counter
+
+PRICE_TERMS = ('premium', 'luxury', 'budget', 'affordable', 'value', 'investment')
+# Substring match, like the original `term in text` checks ("valued" counts as "value")
+_PRICE_TERMS_RE = re.compile('|'.join(map(re.escape, PRICE_TERMS)))
+
+# Rubric criterion -> points awarded when it is met
+RUBRIC = {
+    'features_mentioned': 10,
+    'appropriate_length': 10,
+    'price_positioning': 5,
+    'audience_targeted': 10,
+    'call_to_action': 5,
+}
+MAX_SCORE = sum(RUBRIC.values())
+MIN_WORDS, MAX_WORDS = 50, 200
+
+
+def _score(input_data, generated_output):
+    """Apply the rubric to one pair; returns (breakdown, issues).
+
+    The description is lowercased once; features and the audience are
+    substring checks against that copy, price terms one precompiled regex.
+    """
     detailed_desc = generated_output.get('detailed_description', '')
+    text = detailed_desc.lower()
     word_count = len(detailed_desc.split())
-    if 50 <= word_count <= 200:
-        score += 10
-    
-    
-    price = input_data.get('price', 0)
-    price_terms = ['premium', 'luxury', 'budget', 'affordable', 'value', 'investment']
-    if any(term in detailed_desc.lower() for term in price_terms):
-        score += 5
-    
-    
+    breakdown = dict.fromkeys(RUBRIC, 0)
+    issues = []
+
+    # Deliberately one substring scan per feature, not a combined multi-pattern regex: the features
+    # differ per pair, so that pattern would be compiled for every item, and for the handful of
+    # features a product has that measured ~10x slower than str's C-level substring search
+    if all(feature.lower() in text for feature in input_data.get('key_features', [])):
+        breakdown['features_mentioned'] = RUBRIC['features_mentioned']
+    else:
+        issues.append("Not all features mentioned in description")
+
+    if MIN_WORDS <= word_count <= MAX_WORDS:
+        breakdown['appropriate_length'] = RUBRIC['appropriate_length']
+    else:
+        issues.append(f"Description length {word_count} words (should be {MIN_WORDS}-{MAX_WORDS})")
+
+    if _PRICE_TERMS_RE.search(text):
+        breakdown['price_positioning'] = RUBRIC['price_positioning']
+    else:
+        issues.append("No price positioning term (" + ", ".join(PRICE_TERMS) + ")")
+
     target_audience = input_data.get('target_audience', '').lower()
-    if target_audience in detailed_desc.lower():
-        score += 10
-    
-    
+    if target_audience in text:
+        breakdown['audience_targeted'] = RUBRIC['audience_targeted']
+    else:
+        issues.append(f"Target audience '{target_audience}' not mentioned in description")
+
     cta = generated_output.get('call_to_action', '')
     if cta and len(cta) > 10:
-        score += 5
-    
-    return score
+        breakdown['call_to_action'] = RUBRIC['call_to_action']
+    else:
+        issues.append("Call to action missing or too short")
+
+    return breakdown, issues
+
+
+def evaluate_description(input_data, generated_output):
+    """Evaluate generated description according to challenge criteria"""
+    breakdown, _ = _score(input_data, generated_output)
+    return sum(breakdown.values())
+
 
 def get_evaluation_report(input_data, generated_output):
     """Generate detailed evaluation report"""
-    report = {
-        'total_score': 0,
-        'breakdown': {},
-        'issues': []
+    breakdown, issues = _score(input_data, generated_output)
+    return {
+        'total_score': sum(breakdown.values()),
+        'max_score': MAX_SCORE,
+        'breakdown': breakdown,
+        'issues': issues,
+    }
+
+
+def evaluate_batch(pairs):
+    """Score many (input_data, generated_output) pairs; returns (results, summary).
+
+    Results keep input order; a pair that cannot be scored gets an 'error'
+    entry instead of failing the batch. The summary aggregates scores and
+    counts how often each criterion was missed.
+    """
+    results = []
+    missed = Counter()
+    scores = []
+    for index, pair in enumerate(pairs):
+        try:
+            input_data, generated_output = pair
+            if not isinstance(input_data, dict) or not isinstance(generated_output, dict):
+                raise TypeError("input_data and generated_output must be objects")
+            breakdown, issues = _score(input_data, generated_output)
+        except (TypeError, ValueError, AttributeError) as e:
+            results.append({'index': index, 'error': f"Cannot evaluate pair: {e}"})
+            continue
+        total = sum(breakdown.values())
+        scores.append(total)
+        missed.update(name for name, points in breakdown.items() if not points)
+        results.append({'index': index, 'total_score': total, 'breakdown': breakdown, 'issues': issues})
+
+    summary = {
+        'total': len(results),
+        'evaluated': len(scores),
+        'failed': len(results) - len(scores),
+        'max_score': MAX_SCORE,
+        'mean_score': round(sum(scores) / len(scores), 2) if scores else None,
+        'perfect': scores.count(MAX_SCORE),
+        'criteria_missed': {name: missed[name] for name in RUBRIC},
     }
-    
-    
-    features_mentioned = all(
-        feature.lower() in generated_output.get('detailed_description', '').lower()
-        for feature in input_data.get('key_features', [])
-    )
-    report['breakdown']['features_mentioned'] = 10 if features_mentioned else 0
-    if not features_mentioned:
-        report['issues'].append("Not all features mentioned in description")
-    
-    
-    word_count = len(generated_output.get('detailed_description', '').split())
-    report['breakdown']['appropriate_length'] = 10 if 50 <= word_count <= 200 else 0
-    if not (50 <= word_count <= 200):
-        report['issues'].append(f"Description length {word_count} words (should be 50-200)")
-    
-    
-    report['total_score'] = sum(report['breakdown'].values())
-    
-    return report
\ No newline at end of file
+    return results, summary
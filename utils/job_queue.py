@@ -0,0 +1,121 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Priority name -> share of dequeues when every level has work waiting
+PRIORITY_WEIGHTS = OrderedDict([('high', 8), ('normal', 4), ('low', 1)])
+
+
+class FairQueue:
+    """Priority queue that is fair across tenants.
+
+    Levels are served by weighted round robin (PRIORITY_WEIGHTS), so low
+    priority work still drains under sustained high priority load. Within a
+    level each tenant has its own FIFO and tenants take turns, so one
+    tenant's bulk import cannot delay another tenant's jobs by more than one
+    job per turn. Not thread-safe on its own; JobManager guards it.
+    """
+
+    def __init__(self, weights=PRIORITY_WEIGHTS):
+        self.weights = weights
+        self._schedule = [level for level, weight in weights.items() for _ in range(weight)]
+        self._cursor = 0
+        # level -> OrderedDict(tenant -> deque of items); tenant order is the round-robin order
+        self._levels = {level: OrderedDict() for level in weights}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def put(self, item, tenant, priority):
+        if priority not in self._levels:
+            raise ValueError(f"Unknown priority: {priority}")
+        tenants = self._levels[priority]
+        tenants.setdefault(tenant, deque()).append(item)
+        self._size += 1
+
+    def pop(self):
+        """Next item, or None when empty"""
+        if not self._size:
+            return None
+        for offset in range(len(self._schedule)):
+            level = self._schedule[(self._cursor + offset) % len(self._schedule)]
+            tenants = self._levels[level]
+            if tenants:
+                self._cursor = (self._cursor + offset + 1) % len(self._schedule)
+                tenant, items = next(iter(tenants.items()))
+                item = items.popleft()
+                # Move the tenant to the back of the line (or drop it once drained)
+                del tenants[tenant]
+                if items:
+                    tenants[tenant] = items
+                self._size -= 1
+                return item
+        return None
+
+    def remove(self, item, tenant, priority):
+        """Drop a queued item (e.g. a cancelled job); True if it was queued"""
+        items = self._levels.get(priority, {}).get(tenant)
+        if not items or item not in items:
+            return False
+        items.remove(item)
+        if not items:
+            del self._levels[priority][tenant]
+        self._size -= 1
+        return True
+
+    def depth(self):
+        """Queued items per priority level"""
+        return {level: sum(len(items) for items in tenants.values()) for level, tenants in self._levels.items()}
+
+    def tenants(self):
+        return len({tenant for tenants in self._levels.values() for tenant in tenants})
+
+
+class SQLiteJobStore:
+    """Durable job records in a single SQLite table, so queued jobs survive a restart"""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, tenant TEXT NOT NULL, priority TEXT NOT NULL, status TEXT NOT NULL, "
+            "record TEXT NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        self._conn.commit()
+
+    def save(self, record):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, tenant, priority, status, record, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (record['id'], record['tenant'], record['priority'], record['status'],
+                 json.dumps(record), record['created_at'], time.time()),
+            )
+            self._conn.commit()
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT record FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def unfinished(self):
+        """Records of jobs that were queued or running when the process stopped, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def purge(self, finished_before):
+        """Delete finished jobs last updated before the given timestamp"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status NOT IN ('queued', 'running') AND updated_at < ?",
+                (finished_before,),
+            )
+            self._conn.commit()
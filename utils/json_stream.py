@@ -0,0 +1,109 @@
+import json
+
+
+class IncrementalObjectParser:
+    """Incrementally parses a streamed JSON object and reports each top-level
+    member as soon as its value is complete.
+
+    Text before the opening brace (e.g. a ```json fence) is ignored, as is a
+    trailing comma before the closing brace. Usage:
+
+        parser = IncrementalObjectParser()
+        for chunk in chunks:
+            for key, value in parser.feed(chunk):
+                ...
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = None
+        self.finished = False
+
+    def feed(self, text):
+        """Consume more text; return a list of (key, value) members completed by it"""
+        self._buffer += text
+        members = []
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer) and not self.finished:
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif self._depth == 0:
+                if char == '{':
+                    self._depth = 1
+                    self._member_start = i + 1
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    members.extend(self._complete_member(i))
+                    self.finished = True
+            elif char == ',' and self._depth == 1:
+                members.extend(self._complete_member(i))
+                self._member_start = i + 1
+            i += 1
+
+        # Drop consumed text we will never look at again
+        if self._member_start is not None and self._member_start > 0:
+            keep_from = min(self._member_start, i)
+            self._buffer = buffer[keep_from:]
+            self._member_start -= keep_from
+            self._pos = i - keep_from
+        else:
+            self._pos = i
+        return members
+
+    def _complete_member(self, end):
+        text = self._buffer[self._member_start:end].strip()
+        if not text:
+            return []
+        try:
+            member = json.loads('{' + text + '}')
+        except ValueError:
+            return []
+        return list(member.items())
+
+
+def stream_format_for(format_param=None, accept=None):
+    """'ndjson' when asked for via a format=ndjson query parameter or an Accept header listing
+    application/x-ndjson (with a non-zero q), else 'sse'"""
+    if format_param == 'ndjson':
+        return 'ndjson'
+    for media_range in (accept or '').split(','):
+        media_type, *params = [part.strip().lower() for part in media_range.split(';')]
+        if media_type == 'application/x-ndjson' and _quality(params) > 0:
+            return 'ndjson'
+    return 'sse'
+
+
+def _quality(params):
+    """q value of an Accept media range's parameters (1 when absent or unparseable)"""
+    for param in params:
+        name, _, value = param.partition('=')
+        if name.strip() == 'q':
+            try:
+                return float(value)
+            except ValueError:
+                return 1.0
+    return 1.0
+
+
+def format_stream_event(event, stream_format='sse'):
+    """Encode one streaming event as a Server-Sent Event or an NDJSON line"""
+    if stream_format == 'ndjson':
+        return json.dumps(event, ensure_ascii=False) + '\n'
+    payload = {k: v for k, v in event.items() if k != 'event'}
+    return f"event: {event['event']}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
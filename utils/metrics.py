@@ -0,0 +1,202 @@
+"""Minimal Prometheus-compatible metrics (text exposition format 0.0.4).
+
+Metric objects are cheap to update from any thread. Subsystems that already
+keep their own counters (cache, retry policy, circuit breaker, ...) register
+a collector instead, which is only called when /metrics is scraped.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            items = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                samples.append((self.name + '_bucket', key + (('le', _format_value(float(bound))),), cumulative))
+            samples.append((self.name + '_sum', key, total))
+            samples.append((self.name + '_count', key, count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = []
+        self._collectors = []
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector):
+        """collector() -> iterable of (name, type, help, [(labels_dict, value), ...])"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        for collector in collectors:
+            for name, metric_type, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# Pipeline metrics shared by the Flask app, the ASGI entry point and the service layer
+REQUEST_SECONDS = REGISTRY.histogram(
+    'pdg_request_duration_seconds', 'End-to-end HTTP request latency', ('endpoint', 'status'))
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    'pdg_requests_in_flight', 'HTTP requests currently being served', ('endpoint',))
+STAGE_SECONDS = REGISTRY.histogram(
+    'pdg_stage_duration_seconds', 'Latency of each pipeline stage', ('stage',))
+LLM_IN_FLIGHT = REGISTRY.gauge(
+    'pdg_llm_calls_in_flight', 'Gemini calls currently awaiting a response')
+PARSE_FAILURES = REGISTRY.counter(
+    'pdg_parse_failures_total', 'Model responses that could not be parsed as JSON', ('mode',))
+OUTPUT_VALIDATION_FAILURES = REGISTRY.counter(
+    'pdg_output_validation_failures_total', 'Output fields rejected by validation', ('field', 'reason'))
+PROMPT_TOKENS = REGISTRY.histogram(
+    'pdg_prompt_tokens', 'Prompt tokens per Gemini call', ('kind',), buckets=TOKEN_BUCKETS)
+RESPONSE_TOKENS = REGISTRY.histogram(
+    'pdg_response_tokens', 'Response tokens per Gemini call', ('kind',), buckets=TOKEN_BUCKETS)
+
+
+def stats_collector(name, documentation, stats_fn, metric_type='gauge', prefix='pdg_'):
+    """Build a collector exporting the numeric values of a stats() dict as one labelled metric"""
+    def collect():
+        stats = stats_fn()
+        samples = [
+            ({'key': key}, value) for key, value in stats.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        ]
+        return [(prefix + name, metric_type, documentation, samples)]
+    return collect
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.circuit_breaker import RejectedError
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process backend is available
+    fcntl = None
+
+
+class RateLimitedError(RejectedError):
+    """Raised when staying under the Gemini quota would mean waiting past the caller's deadline"""
+
+
+class LocalState:
+    """Bucket state shared by the threads of one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+
+    def update(self, fn):
+        """Atomically replace the state with fn(state) -> (result, new_state); returns result"""
+        with self._lock:
+            result, self._state = fn(self._state)
+        return result
+
+    async def update_async(self, fn):
+        """update() for coroutines; an in-memory update is cheap enough to run on the event loop"""
+        return self.update(fn)
+
+
+class FileLockState:
+    """Bucket state in a small JSON file guarded by flock, shared by every process on the host"""
+
+    def __init__(self, path):
+        if fcntl is None:
+            raise RuntimeError("RATE_LIMIT_STATE_PATH needs fcntl (POSIX); leave it unset on this platform")
+        self.path = path
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rate-limit-state')
+
+    def update(self, fn):
+        with self._lock, open(self.path, 'a+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            raw = f.read()
+            try:
+                state = json.loads(raw) if raw.strip() else None
+            except ValueError:
+                state = None
+            result, state = fn(state)
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(state))
+            f.flush()
+        return result
+
+    async def update_async(self, fn):
+        """update() for coroutines; the flock wait and file I/O run off the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.update, fn)
+
+
+class TokenBucketLimiter:
+    """Paces Gemini calls to stay under requests-per-minute and tokens-per-minute quotas.
+
+    Each quota is a token bucket refilled continuously at limit * headroom
+    per minute, holding at most limit * (1 - headroom) for bursts, so no
+    60-second window can go over the limit. A call reserves one request and
+    its estimated token cost up front; when a bucket runs short the
+    reservation still goes through and the caller sleeps until the bucket
+    has refilled to cover it, so waiting callers are served in arrival
+    order. A limit of 0 disables that bucket.
+    Bucket levels live in `state` (LocalState or FileLockState) and use
+    wall-clock time so several processes can share one FileLockState.
+    Coroutines use acquire(), settle_async() and drain_async(), which keep
+    FileLockState's flock and file I/O off the event loop.
+    """
+
+    def __init__(self, rpm=0, tpm=0, headroom=0.9, state=None):
+        limits = {'requests': rpm, 'tokens': tpm}
+        # name -> refill per minute; name -> burst capacity
+        self.rates = {name: limit * headroom for name, limit in limits.items() if limit > 0}
+        self.capacity = {name: max(1.0, limits[name] * (1 - headroom)) for name in self.rates}
+        self.state = state or LocalState()
+        self._lock = threading.Lock()
+        self._counters = {
+            'acquired': 0, 'delayed': 0, 'rejected': 0, 'wait_seconds_total': 0.0, 'wait_seconds_max': 0.0,
+            'estimated_tokens': 0, 'actual_tokens': 0, 'drains': 0,
+        }
+
+    def _refilled(self, state, now):
+        """Current bucket levels, with every bucket present and refilled up to now"""
+        state = dict(state or {})
+        updated = state.pop('updated', now)
+        levels = {}
+        for name, rate in self.rates.items():
+            level = state.get(name, self.capacity[name])
+            levels[name] = min(self.capacity[name], level + (now - updated) * rate / 60.0)
+        return levels
+
+    def _reservation(self, tokens, max_wait):
+        """State update reserving one request and `tokens`; its result is (reserved, wait)"""
+        cost = {'requests': 1, 'tokens': tokens}
+
+        def apply(state):
+            now = time.time()
+            levels = self._refilled(state, now)
+            wait = max(
+                [max(0.0, (cost[name] - level) * 60.0 / self.rates[name]) for name, level in levels.items()],
+                default=0.0,
+            )
+            if max_wait is not None and wait > max_wait:
+                return (False, wait), state
+            for name in levels:
+                levels[name] -= cost[name]
+            return (True, wait), dict(levels, updated=now)
+        return apply
+
+    def _count_reservation(self, tokens, reserved, wait):
+        with self._lock:
+            if not reserved:
+                self._counters['rejected'] += 1
+                raise RateLimitedError(f"Gemini quota would be exceeded: next slot in {wait:.1f}s", wait)
+            self._counters['acquired'] += 1
+            self._counters['estimated_tokens'] += tokens
+            if wait:
+                self._counters['delayed'] += 1
+                self._counters['wait_seconds_total'] += wait
+                self._counters['wait_seconds_max'] = max(self._counters['wait_seconds_max'], wait)
+        return wait
+
+    def reserve(self, tokens, max_wait=None):
+        """Reserve one request and `tokens`; return the seconds to wait before calling.
+
+        Raises RateLimitedError without reserving anything when the wait would
+        exceed max_wait.
+        """
+        return self._count_reservation(tokens, *self.state.update(self._reservation(tokens, max_wait)))
+
+    async def acquire(self, tokens, max_wait=None):
+        """reserve() without blocking the event loop, then sleep out the wait; returns the seconds waited"""
+        wait = self._count_reservation(tokens, *await self.state.update_async(self._reservation(tokens, max_wait)))
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+    def _settlement(self, estimated, actual):
+        """State update correcting the token bucket, or None when there is nothing to correct"""
+        with self._lock:
+            self._counters['actual_tokens'] += actual
+        if 'tokens' not in self.rates or actual == estimated:
+            return None
+
+        def apply(state):
+            now = time.time()
+            levels = self._refilled(state, now)
+            levels['tokens'] -= actual - estimated
+            return None, dict(levels, updated=now)
+        return apply
+
+    def settle(self, estimated, actual):
+        """Correct the token bucket once the real usage of a call is known"""
+        apply = self._settlement(estimated, actual)
+        if apply is not None:
+            self.state.update(apply)
+
+    async def settle_async(self, estimated, actual):
+        """settle() without blocking the event loop"""
+        apply = self._settlement(estimated, actual)
+        if apply is not None:
+            await self.state.update_async(apply)
+
+    def _drained(self, state):
+        now = time.time()
+        levels = self._refilled(state, now)
+        return None, dict({name: min(level, 0.0) for name, level in levels.items()}, updated=now)
+
+    def _count_drain(self):
+        with self._lock:
+            self._counters['drains'] += 1
+
+    def drain(self):
+        """Empty the buckets after Gemini answers 429, so every caller backs off until they refill"""
+        self.state.update(self._drained)
+        self._count_drain()
+
+    async def drain_async(self):
+        """drain() without blocking the event loop"""
+        await self.state.update_async(self._drained)
+        self._count_drain()
+
+    def stats(self):
+        levels = self.state.update(lambda state: (self._refilled(state, time.time()), state))
+        with self._lock:
+            stats = dict(self._counters)
+        stats['wait_seconds_total'] = round(stats['wait_seconds_total'], 3)
+        stats['wait_seconds_max'] = round(stats['wait_seconds_max'], 3)
+        stats['avg_wait_seconds'] = round(stats['wait_seconds_total'] / stats['acquired'], 4) if stats['acquired'] else 0.0
+        for name, rate in self.rates.items():
+            stats[f'{name}_per_minute'] = round(rate, 1)
+            # Share of the burst allowance currently spent; above 1.0 means callers are queued behind it
+            stats[f'{name}_utilization'] = round(1 - levels[name] / self.capacity[name], 4)
+        return stats
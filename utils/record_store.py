@@ -0,0 +1,77 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryRecordStore:
+    """Generation records per product id in process memory, least recently used evicted past maxsize"""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._records = OrderedDict()
+        self.evictions = 0
+
+    def get(self, product_id):
+        with self._lock:
+            record = self._records.get(product_id)
+            if record is not None:
+                self._records.move_to_end(product_id)
+        return record
+
+    def save(self, record):
+        with self._lock:
+            self._records[record['product_id']] = record
+            self._records.move_to_end(record['product_id'])
+            while len(self._records) > self.maxsize:
+                self._records.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, product_id):
+        with self._lock:
+            return self._records.pop(product_id, None) is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._records)
+
+
+class SQLiteRecordStore:
+    """Durable generation records in a single SQLite table, shared by every process using the file"""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS generation_records ("
+            "product_id TEXT PRIMARY KEY, record TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.evictions = 0
+
+    def get(self, product_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record FROM generation_records WHERE product_id = ?", (product_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, record):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO generation_records (product_id, record, updated_at) VALUES (?, ?, ?)",
+                (record['product_id'], json.dumps(record, ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+
+    def delete(self, product_id):
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM generation_records WHERE product_id = ?", (product_id,))
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM generation_records").fetchone()[0]
@@ -0,0 +1,255 @@
+import asyncio
+import random
+import re
+import threading
+import time
+from collections import deque
+
+# Reason -> whether a failed attempt with that reason is worth retrying
+RETRYABLE_REASONS = {
+    'rate_limited': True,
+    'unavailable': True,
+    'deadline_exceeded': True,
+    'local_deadline': True,  # the retry policy's own deadline check decides
+    'server_error': True,
+    'malformed_response': True,
+    'unknown': True,
+    'invalid_argument': False,
+    'unauthenticated': False,
+    'permission_denied': False,
+    'not_found': False,
+    'safety_block': False,
+    'circuit_open': False,
+    'overloaded': False,
+    'throttled': False,
+}
+
+_STATUS_REASONS = {
+    400: 'invalid_argument',
+    401: 'unauthenticated',
+    403: 'permission_denied',
+    404: 'not_found',
+    408: 'deadline_exceeded',
+    429: 'rate_limited',
+    500: 'server_error',
+    502: 'unavailable',
+    503: 'unavailable',
+    504: 'deadline_exceeded',
+}
+
+_NAME_REASONS = {
+    'ResourceExhausted': 'rate_limited',
+    'TooManyRequests': 'rate_limited',
+    'ServiceUnavailable': 'unavailable',
+    'DeadlineCutOffError': 'local_deadline',  # before TimeoutError, its base class
+    'DeadlineExceeded': 'deadline_exceeded',
+    'GatewayTimeout': 'deadline_exceeded',
+    'TimeoutError': 'deadline_exceeded',
+    'InternalServerError': 'server_error',
+    'InvalidArgument': 'invalid_argument',
+    'BadRequest': 'invalid_argument',
+    'Unauthenticated': 'unauthenticated',
+    'Unauthorized': 'unauthenticated',
+    'PermissionDenied': 'permission_denied',
+    'Forbidden': 'permission_denied',
+    'NotFound': 'not_found',
+    'BlockedPromptException': 'safety_block',
+    'StopCandidateException': 'safety_block',
+    'CircuitOpenError': 'circuit_open',
+    'OverloadedError': 'overloaded',
+    'RateLimitedError': 'throttled',
+}
+
+_RETRY_IN_PATTERN = re.compile(r'retry in (\d+(?:\.\d+)?)\s*s', re.IGNORECASE)
+
+
+def classify_error(exc):
+    """Map an exception from a Gemini attempt to a reason in RETRYABLE_REASONS.
+
+    Works on class names and the HTTP `code` attribute of google.api_core
+    exceptions so this module never has to import the gRPC stack.
+    """
+    for cls in type(exc).__mro__:
+        reason = _NAME_REASONS.get(cls.__name__)
+        if reason:
+            return reason
+
+    code = getattr(exc, 'code', None)
+    if isinstance(code, int) and code in _STATUS_REASONS:
+        return _STATUS_REASONS[code]
+
+    message = str(exc).lower()
+    if 'could not parse json' in message:
+        return 'malformed_response'
+    # response.text raises ValueError when the candidate was blocked by safety filters
+    if 'safety' in message or 'blocked' in message:
+        return 'safety_block'
+    return 'unknown'
+
+
+def is_retryable(exc):
+    return RETRYABLE_REASONS[classify_error(exc)]
+
+
+def server_retry_delay(exc):
+    """Return the retry delay (seconds) the server asked for, or None"""
+    for detail in getattr(exc, 'details', None) or []:
+        retry_delay = getattr(detail, 'retry_delay', None)
+        if retry_delay is not None:
+            seconds = getattr(retry_delay, 'seconds', 0) + getattr(retry_delay, 'nanos', 0) / 1e9
+            if seconds > 0:
+                return seconds
+
+    match = _RETRY_IN_PATTERN.search(str(exc))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+class RetryBudget:
+    """Caps retries at a fraction of recent first attempts across the whole process.
+
+    Within a sliding window, retries are allowed while
+    retries < min_retries + ratio * requests, so a healthy trickle of traffic
+    can always retry but a 429 storm cannot multiply load.
+    """
+
+    def __init__(self, ratio=0.2, min_retries=10, window=10.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._lock = threading.Lock()
+        self._requests = deque()
+        self._retries = deque()
+
+    def _trim(self, now):
+        cutoff = now - self.window
+        while self._requests and self._requests[0] < cutoff:
+            self._requests.popleft()
+        while self._retries and self._retries[0] < cutoff:
+            self._retries.popleft()
+
+    def record_request(self):
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_acquire_retry(self):
+        """Reserve one retry; False when the budget is spent"""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+                return False
+            self._retries.append(now)
+            return True
+
+    def stats(self):
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                'window_seconds': self.window,
+                'requests_in_window': len(self._requests),
+                'retries_in_window': len(self._retries),
+                'ratio': self.ratio,
+            }
+
+
+class RetryError(Exception):
+    """Raised when a call gives up; wraps the last attempt's exception.
+
+    retry_after is the delay the server asked for, when the policy gave up
+    rather than wait that long.
+    """
+
+    def __init__(self, last_exception, attempts, reason, outcome, retry_after=None):
+        super().__init__(str(last_exception))
+        self.last_exception = last_exception
+        self.attempts = attempts
+        self.reason = reason
+        self.outcome = outcome
+        self.retry_after = retry_after
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, error classification and a shared retry budget"""
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0, budget=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._outcomes = {}
+        self._reasons = {}
+
+    def _count(self, outcome, reason=None):
+        with self._lock:
+            self._outcomes[outcome] = self._outcomes.get(outcome, 0) + 1
+            if reason:
+                self._reasons[reason] = self._reasons.get(reason, 0) + 1
+
+    def backoff_delay(self, attempt, exc=None):
+        """Delay before retry number `attempt` (1-based), honoring server hints in full"""
+        requested = server_retry_delay(exc) if exc is not None else None
+        if requested is not None:
+            # Small jitter on top so clients told the same delay don't return in lockstep
+            return requested + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def run_async(self, attempt_fn, deadline=None, min_attempt_seconds=0.0, failover=None):
+        """Await attempt_fn() until it succeeds or the policy gives up.
+
+        With a deadline, a retry is only made when the remaining time covers
+        the backoff delay plus min_attempt_seconds. A server-requested delay
+        is never shortened: when it is over max_delay or past the deadline,
+        the policy gives up with RetryError.retry_after set to it instead of
+        retrying into another quota error. failover() is asked after
+        a failed attempt whether the next one goes to another model; such a
+        retry is made at once and is not charged to the retry budget. Raises
+        RetryError carrying the last exception, the number of attempts made
+        and why the policy stopped (fatal error, exhausted attempts or
+        deadline, or an empty retry budget).
+        """
+        if self.budget is not None:
+            self.budget.record_request()
+
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = await attempt_fn()
+            except Exception as exc:
+                reason = classify_error(exc)
+                if not RETRYABLE_REASONS[reason]:
+                    self._count('fatal_error', reason)
+                    raise RetryError(exc, attempt, reason, 'fatal_error')
+                if attempt >= self.max_attempts:
+                    self._count('retries_exhausted', reason)
+                    raise RetryError(exc, attempt, reason, 'retries_exhausted')
+                switching = failover is not None and failover()
+                requested = None if switching else server_retry_delay(exc)
+                if requested is not None and requested > self.max_delay:
+                    self._count('retry_after_too_long', reason)
+                    raise RetryError(exc, attempt, reason, 'retry_after_too_long', retry_after=requested)
+                delay = 0.0 if switching else self.backoff_delay(attempt, exc)
+                if deadline is not None and deadline.remaining() < delay + min_attempt_seconds:
+                    self._count('deadline_exhausted', reason)
+                    raise RetryError(exc, attempt, reason, 'deadline_exhausted', retry_after=requested)
+                if not switching and self.budget is not None and not self.budget.try_acquire_retry():
+                    self._count('budget_exhausted', reason)
+                    raise RetryError(exc, attempt, reason, 'budget_exhausted')
+                self._count('failed_over' if switching else 'retried', reason)
+                await asyncio.sleep(delay)
+                continue
+
+            self._count('success' if attempt == 1 else 'success_after_retry')
+            return result
+
+    def stats(self):
+        with self._lock:
+            stats = {'outcomes': dict(self._outcomes), 'errors_by_reason': dict(self._reasons)}
+        if self.budget is not None:
+            stats['budget'] = self.budget.stats()
+        return stats
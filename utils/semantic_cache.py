@@ -0,0 +1,236 @@
+import random
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from utils.cache import normalize_text
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def name_shingles(name, k=3):
+    """Character k-shingles of a normalized product name"""
+    text = f" {normalize_text(name).casefold()} "
+    return frozenset(text[i:i + k] for i in range(max(1, len(text) - k + 1)))
+
+
+def feature_set(features):
+    """Features compared up to order, case and whitespace"""
+    return frozenset(normalize_text(feature).casefold() for feature in features)
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """MinHash signatures over sets of strings, with num_perm universal hash functions"""
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._params = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+
+    def signature(self, tokens):
+        hashes = [zlib.crc32(token.encode('utf-8')) for token in tokens] or [0]
+        return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._params)
+
+
+class SemanticCache:
+    """Reuses generations across products that differ only in name or price.
+
+    Products are only compared within a block of identical category, target
+    audience, tone, price tier and prompt version, and the same feature set
+    (up to order, case and whitespace): copy written about one feature
+    cannot be turned into copy about another by substitution. Within a
+    block, candidates come from MinHash LSH (bands x rows = num_perm) over
+    character shingles of the product name, and are then scored exactly:
+
+        similarity = jaccard(name shingles)
+
+    The best candidate at or above `threshold` has its output patched by
+    substituting the product name and the price, and the patched output is
+    returned only if `validate` accepts it. Only real generations are
+    indexed, so patches are never made from patches.
+    """
+
+    def __init__(self, threshold=0.6, maxsize=10000, ttl=3600, num_perm=64, bands=16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._hasher = MinHasher(num_perm)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> entry, least recently added first
+        self._buckets = {}  # (block, feature set, band, band signature) -> set of keys
+        self._counters = {'lookups': 0, 'hits': 0, 'misses': 0, 'rejected': 0, 'evictions': 0}
+        self._similarity_total = 0.0
+
+    def _describe(self, product, block):
+        features = feature_set(product.get('key_features', []))
+        shingles = name_shingles(product.get('product_name', ''))
+        signature = self._hasher.signature(shingles)
+        bands = [(block, features, band, signature[band * self.rows:(band + 1) * self.rows])
+                 for band in range(self.bands)]
+        return features, shingles, bands
+
+    def add(self, key, product, block, output):
+        """Index a freshly generated output under its exact cache key"""
+        features, shingles, bands = self._describe(product, block)
+        entry = {
+            'product': product, 'features': features, 'shingles': shingles, 'bands': bands,
+            'output': output, 'expires_at': time.monotonic() + self.ttl,
+        }
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            for band in bands:
+                self._buckets.setdefault(band, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self._counters['evictions'] += 1
+
+    def _remove(self, key):
+        """Caller holds self._lock"""
+        entry = self._entries.pop(key)
+        for band in entry['bands']:
+            keys = self._buckets.get(band)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._buckets[band]
+
+    def lookup(self, product, block, validate=None):
+        """Return (patched_output, similarity) for the closest indexed product, or (None, best_similarity)"""
+        features, shingles, bands = self._describe(product, block)
+        now = time.monotonic()
+        with self._lock:
+            self._counters['lookups'] += 1
+            keys = set()
+            for band in bands:
+                keys.update(self._buckets.get(band, ()))
+            candidates = []
+            for key in keys:
+                entry = self._entries[key]
+                if entry['expires_at'] < now:
+                    self._remove(key)
+                    continue
+                candidates.append(entry)
+
+        best, best_similarity = None, 0.0
+        for entry in candidates:
+            similarity = jaccard(shingles, entry['shingles'])
+            if similarity > best_similarity:
+                best, best_similarity = entry, similarity
+
+        outcome, output = 'misses', None
+        if best is not None and best_similarity >= self.threshold:
+            output = patch_output(best['output'], best['product'], product)
+            if output is not None and (validate is None or validate(output)):
+                outcome = 'hits'
+            else:
+                outcome, output = 'rejected', None
+
+        with self._lock:
+            self._counters[outcome] += 1
+            if outcome == 'hits':
+                self._similarity_total += best_similarity
+        return output, round(best_similarity, 4)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            similarity_total = self._similarity_total
+        stats['hit_rate'] = round(stats['hits'] / stats['lookups'], 4) if stats['lookups'] else 0.0
+        stats['avg_hit_similarity'] = round(similarity_total / stats['hits'], 4) if stats['hits'] else None
+        stats['threshold'] = self.threshold
+        return stats
+
+
+# A price as the model writes it, standing alone: 2499, 2,499, 1,29,999, 2499.00 (never part of
+# 10000mAh, S24 or 62.05). Thousands separators are checked in _parse_price
+_PRICE_RE = r'(?<![\w,])(?<!\d\.)(?P<price>\d(?:,?\d)*(?:\.\d+)?)(?!\w|[.,]\d)'
+_GROUPED_RE = re.compile(r'\d+|\d{1,3}(?:,\d{3})+|\d{1,2}(?:,\d{2})*,\d{3}')
+
+
+def _parse_price(text):
+    """Numeric value of a price token, or None when its digit grouping is not a real one"""
+    whole, _, fraction = text.partition('.')
+    if not _GROUPED_RE.fullmatch(whole):
+        return None
+    return float(whole.replace(',', '') + ('.' + fraction if fraction else ''))
+
+
+def _format_price(value, template):
+    """Write value in the style of template: same decimals and, if it had them, separators.
+
+    '79,999' is read as Indian grouping (1,29,999), the catalogue being in rupees;
+    '129,999' and '1,299,999' as Western grouping.
+    """
+    whole_template, _, fraction_template = template.partition('.')
+    if fraction_template or value == int(value):
+        digits = f"{value:.{len(fraction_template)}f}"
+    else:
+        digits = f"{value:.2f}".rstrip('0')
+    whole, dot, fraction = digits.partition('.')
+    if ',' in whole_template:
+        groups = whole_template.split(',')
+        if len(groups[0]) == 3 or any(len(group) == 3 for group in groups[1:-1]):
+            whole = f"{int(whole):,}"
+        elif len(whole) > 3:
+            whole = re.sub(r'(\d)(?=(\d{2})+$)', r'\1,', whole[:-3]) + ',' + whole[-3:]
+    return whole + dot + fraction
+
+
+def patch_output(output, source, target):
+    """Rewrite an output generated for `source` so it describes `target`.
+
+    Substitutes the product name (case-insensitively) and every standalone
+    occurrence of the source price, in any of the formats in _PRICE_RE, in
+    every string and list-of-strings field; nothing else is touched.
+    Returns None when the feature sets differ, since the text written about
+    a removed feature cannot be made to describe an added one.
+    """
+    if feature_set(source.get('key_features', [])) != feature_set(target.get('key_features', [])):
+        return None
+
+    replacements = {}
+    old_name, new_name = source.get('product_name') or '', target.get('product_name') or ''
+    if old_name and old_name != new_name:
+        replacements[old_name.casefold()] = new_name
+    old_price, new_price = source.get('price'), target.get('price')
+    price_changed = old_price != new_price and old_price is not None and new_price is not None
+    if not replacements and not price_changed:
+        return output.copy()
+
+    # One pass, name first, so a price inside the replaced name is left alone
+    alternatives = [re.escape(old) for old in replacements]
+    if price_changed:
+        alternatives.append(_PRICE_RE)
+    pattern = re.compile('|'.join(alternatives), re.IGNORECASE)
+
+    def replace(match):
+        price = match.group('price') if price_changed else None
+        if price is None:
+            return replacements.get(match.group(0).casefold(), match.group(0))
+        if _parse_price(price) != float(old_price):
+            return price
+        return _format_price(float(new_price), price)
+
+    def substitute(value):
+        if isinstance(value, str):
+            return pattern.sub(replace, value)
+        if isinstance(value, list):
+            return [substitute(item) for item in value]
+        return value
+
+    return output.__class__((field, substitute(value)) for field, value in output.items())
@@ -0,0 +1,75 @@
+import asyncio
+import concurrent.futures
+import threading
+
+
+class SingleFlight:
+    """Collapses concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs the work; callers arriving
+    while it is in flight wait for the same result or exception. Calls are
+    tracked with a thread lock and concurrent.futures.Future, so duplicates
+    are caught across threads and across event loops (the Flask bridge loop
+    and the ASGI server loop). The work runs as its own task, so a leader
+    that is cancelled or times out does not take the shared call down with
+    it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._counters = {'leaders': 0, 'coalesced': 0}
+
+    async def run(self, key, coro_factory, timeout=None):
+        """Return (result, shared); shared is True when another caller did the work.
+
+        timeout bounds only how long a follower waits (asyncio.TimeoutError);
+        the leader's work is bounded by whatever coro_factory does itself.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = concurrent.futures.Future()
+                self._counters['leaders'] += 1
+            else:
+                self._counters['coalesced'] += 1
+
+        if not leader:
+            # shield: a follower giving up must not cancel the shared future for the others
+            result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+            return result, True
+
+        try:
+            task = asyncio.ensure_future(coro_factory())
+        except BaseException as exc:
+            self._finish(key, future, exc=exc)
+            raise
+
+        def on_done(task):
+            if task.cancelled():
+                self._finish(key, future, cancelled=True)
+            else:
+                self._finish(key, future, exc=task.exception(), result=None if task.exception() else task.result())
+
+        task.add_done_callback(on_done)
+        return await asyncio.shield(task), False
+
+    def _finish(self, key, future, result=None, exc=None, cancelled=False):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if cancelled:
+            future.cancel()
+        elif exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+    def stats(self):
+        with self._lock:
+            stats = {'in_flight': len(self._calls)}
+            stats.update(self._counters)
+        total = stats['leaders'] + stats['coalesced']
+        stats['coalesced_rate'] = round(stats['coalesced'] / total, 4) if total else 0.0
+        return stats
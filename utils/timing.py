@@ -0,0 +1,90 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class Deadline:
+    """Absolute end-to-end deadline measured on the monotonic clock"""
+
+    def __init__(self, seconds, started=None):
+        self.seconds = seconds
+        self.started = time.monotonic() if started is None else started
+        self.expires_at = self.started + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+
+class DeadlineCutOffError(asyncio.TimeoutError):
+    """A call cut off by the request's own deadline, as opposed to a timeout reported by the model API"""
+
+
+class ServerTiming:
+    """Per-request stage durations rendered as a Server-Timing header"""
+
+    def __init__(self):
+        self._durations = OrderedDict()
+
+    def add(self, name, seconds):
+        self._durations[name] = self._durations.get(name, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def as_dict(self):
+        return dict(self._durations)
+
+    def header_value(self):
+        return ', '.join(
+            f"{name};dur={seconds * 1000:.1f}" for name, seconds in self._durations.items()
+        )
+
+
+async def hedged(call_factory, hedge_after, can_hedge=None, on_hedge=None):
+    """Await call_factory(); if it is still running after hedge_after seconds,
+    start a second identical call and return whichever succeeds first.
+
+    The slower call is cancelled. If one call fails, the other is still
+    awaited; the error is only raised when both have failed. can_hedge() is
+    consulted before launching the backup (e.g. to check the remaining
+    deadline) and on_hedge(won) is called once per launched backup.
+    """
+    primary = asyncio.ensure_future(call_factory())
+    tasks = [primary]
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done or (can_hedge is not None and not can_hedge()):
+            return await primary
+
+        backup = asyncio.ensure_future(call_factory())
+        tasks.append(backup)
+        pending = {primary, backup}
+        first_error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if on_hedge is not None:
+                        on_hedge(task is backup)
+                    return task.result()
+                first_error = first_error or task.exception()
+        if on_hedge is not None:
+            on_hedge(False)
+        raise first_error
+    finally:
+        # Cancel the loser (or everything, if we were cancelled ourselves)
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -1,58 +1,221 @@
+import re
+from typing import Annotated, List
+
+from pydantic import AfterValidator, Field, Strict, StringConstraints, TypeAdapter, ValidationError
+from pydantic_core import PydanticCustomError
+from typing_extensions import NotRequired, TypedDict  # pydantic rejects typing.TypedDict before 3.12
+
+VALID_CATEGORIES = frozenset({"Electronics", "Wearables", "Smartphone", "Clothing", "Home", "Beauty", "Sports"})
+
+REQUIRED_FIELDS = ('product_name', 'category', 'key_features', 'price')
+OPTIONAL_DEFAULTS = {'target_audience': 'general', 'tone': 'professional'}
+
+# Per-field error codes returned by validate_product, with the message validate_input uses for each
+ERROR_MESSAGES = {
+    'missing': "Missing required field: {field}",
+    'invalid_type': "{field} has the wrong type",
+    'empty': "{field} must not be empty",
+    'unknown_category': "category must be one of: " + ", ".join(sorted(VALID_CATEGORIES)),
+    'invalid_feature': "all key_features must be non-empty strings",
+    'negative': "{field} must not be negative",
+    'not_finite': "{field} must be a finite number",
+}
+
+# pydantic error type -> our error code (anything unlisted is a type error)
+_ERROR_CODES = {
+    'missing': 'missing',
+    'string_pattern_mismatch': 'empty',
+    'unknown_category': 'unknown_category',
+    'greater_than_equal': 'negative',
+    'finite_number': 'not_finite',
+}
+
+
+def _known_category(value):
+    if value.capitalize() not in VALID_CATEGORIES:
+        raise PydanticCustomError('unknown_category', 'Unknown category')
+    return value
+
+
+NonBlankStr = Annotated[str, Strict(), StringConstraints(pattern=r'\S')]
+
+
+class ProductInput(TypedDict):
+    """Declarative schema for a /generate-description payload; unknown keys are ignored"""
+    product_name: NonBlankStr
+    category: Annotated[str, Strict(), AfterValidator(_known_category)]
+    key_features: Annotated[List[NonBlankStr], Strict()]
+    # allow_inf_nan=False rejects inf and -inf as well as NaN (error code 'not_finite')
+    price: Annotated[float, Strict(), Field(ge=0, allow_inf_nan=False)]
+    target_audience: NotRequired[NonBlankStr]
+    tone: NotRequired[NonBlankStr]
+
+
+# Compiled once at import; validation itself runs in pydantic-core
+_product_validator = TypeAdapter(ProductInput)
+
+
+def validate_product(data):
+    """Validate one product payload against ProductInput.
+
+    Returns (validated_data, has_valid_required_data, errors): validated_data
+    is a copy of the input with every invalid field replaced by 'Invalid
+    input' and optional fields defaulted, and errors maps each invalid field
+    to an error code from ERROR_MESSAGES. Invalid optional fields are marked
+    but do not make the payload invalid.
+    """
+    if not isinstance(data, dict):
+        validated_data = dict.fromkeys(REQUIRED_FIELDS, "Invalid input")
+        validated_data.update(OPTIONAL_DEFAULTS)
+        return validated_data, False, {'payload': 'invalid_type'}
+
+    validated_data = dict(data)
+    errors = {}
+    try:
+        _product_validator.validate_python(data)
+    except ValidationError as e:
+        for error in e.errors(include_url=False, include_context=False, include_input=False):
+            field = error['loc'][0]
+            if field in errors:
+                continue
+            if field == 'key_features' and len(error['loc']) > 1:
+                errors[field] = 'invalid_feature'
+            else:
+                errors[field] = _ERROR_CODES.get(error['type'], 'invalid_type')
+            validated_data[field] = "Invalid input"
+
+    for field, default in OPTIONAL_DEFAULTS.items():
+        validated_data.setdefault(field, default)
+
+    has_valid_required_data = not any(field in errors for field in REQUIRED_FIELDS)
+    return validated_data, has_valid_required_data, errors
+
+
+def validate_and_mark_invalid_fields(data):
+    """Validate input data and mark invalid fields with 'Invalid input'"""
+    validated_data, has_valid_data, _ = validate_product(data)
+    return validated_data, has_valid_data
+
+
 def validate_input(data):
-    """Validate input data according to API specification"""
-    errors = []
+    """Validate input data according to API specification; returns a list of error messages"""
+    _, _, errors = validate_product(data)
+    return [ERROR_MESSAGES[code].format(field=field) for field, code in errors.items()]
 
-    required_fields = ['product_name', 'category', 'key_features', 'price']
-    for field in required_fields:
-        if field not in data:
-            errors.append(f"Missing required field: {field}")
 
-    if 'product_name' in data and not isinstance(data['product_name'], str):
-        errors.append("product_name must be a string")
+# Storefront locale of a variant with no locale of its own (prices are in rupees)
+DEFAULT_LOCALE = 'en-IN'
 
-    if 'category' in data and not isinstance(data['category'], str):
-        errors.append("category must be a string")
+# Languages written without spaces between words: characters per word, used to turn a
+# character count into the word count the output length limits are stated in
+CHARS_PER_WORD = {'zh': 1.7, 'yue': 1.7, 'ja': 2.5, 'th': 5.0}
+# Also written without spaces, but with no conversion we trust; variants in them are refused
+UNSUPPORTED_LANGUAGES = frozenset({'bo', 'dz', 'km', 'lo', 'my'})
 
-    if 'key_features' in data:
-        if not isinstance(data['key_features'], list):
-            errors.append("key_features must be an array")
-        elif not all(isinstance(feature, str) for feature in data['key_features']):
-            errors.append("all key_features must be strings")
 
-    # Removed: price type check (now handled in app.py)
+def locale_language(locale):
+    """Primary language subtag of a locale ('ja' for 'ja-JP'), or None"""
+    return locale.split('-', 1)[0].casefold() if locale else None
 
-    if 'target_audience' in data and not isinstance(data['target_audience'], str):
-        errors.append("target_audience must be a string")
 
-    if 'tone' in data and not isinstance(data['tone'], str):
-        errors.append("tone must be a string")
+def count_words(text, locale=None):
+    """Word count for the output length limits; locale-aware for languages written without spaces"""
+    chars_per_word = CHARS_PER_WORD.get(locale_language(locale))
+    if chars_per_word is None:
+        return len(text.split())
+    return round(len(''.join(text.split())) / chars_per_word)
 
-    return errors
+
+VARIANT_TARGET_FIELDS = ('locale', 'tone', 'target_audience')
+
+
+class VariantTarget(TypedDict):
+    """One storefront target of a multi-variant generation; unknown keys are ignored"""
+    id: NotRequired[Annotated[str, Strict(), StringConstraints(pattern=r'^[A-Za-z0-9_.-]{1,64}$')]]
+    locale: NotRequired[Annotated[str, Strict(), StringConstraints(pattern=r'^[A-Za-z]{2,3}(-[A-Za-z0-9]{2,8})*$')]]
+    tone: NotRequired[NonBlankStr]
+    target_audience: NotRequired[NonBlankStr]
+
+
+_variants_validator = TypeAdapter(List[VariantTarget])
+
+
+def _variant_id(variant):
+    """Default id: the variant's own target values, slugged and joined ('fr-fr-casual')"""
+    slugs = (re.sub(r'[^a-z0-9]+', '-', variant[field].casefold()).strip('-')
+             for field in VARIANT_TARGET_FIELDS if field in variant)
+    return '-'.join(slug for slug in slugs if slug)
+
+
+def validate_variants(variants):
+    """Validate the variant targets of a multi-variant generation.
+
+    Returns (variants, error): variants is a list of {'id', 'locale', ...}
+    with the locale defaulted and every id set and unique, or error is a
+    message describing the first problem. The count limit is the caller's
+    (a 413 in the route).
+    """
+    if not isinstance(variants, list) or not variants:
+        return None, "variants must be a non-empty array"
+    try:
+        variants = _variants_validator.validate_python(variants)
+    except ValidationError as e:
+        error = e.errors(include_url=False, include_context=False, include_input=False)[0]
+        location = f"variants[{error['loc'][0]}]" + ''.join(f".{part}" for part in error['loc'][1:])
+        return None, f"{location}: {error['msg']}"
+
+    normalized = []
+    seen = set()
+    for index, variant in enumerate(variants):
+        if not any(field in variant for field in VARIANT_TARGET_FIELDS):
+            return None, f"variants[{index}] must set at least one of: {', '.join(VARIANT_TARGET_FIELDS)}"
+        if locale_language(variant.get('locale')) in UNSUPPORTED_LANGUAGES:
+            return None, f"variants[{index}].locale: {variant['locale']} is not supported (its length limits cannot be checked)"
+        variant_id = variant.get('id') or _variant_id(variant)
+        if not variant_id:
+            return None, f"variants[{index}] needs an id (its target values have no ASCII letters or digits)"
+        if variant_id in seen:
+            return None, f"Duplicate variant id: {variant_id}"
+        seen.add(variant_id)
+        normalized.append(dict(variant, id=variant_id, locale=variant.get('locale', DEFAULT_LOCALE)))
+    return normalized, None
 
 
+OUTPUT_FIELDS = ['short_description', 'detailed_description', 'bullet_points', 'seo_keywords', 'call_to_action']
+
+
+def get_output_field_errors(output, locale=None):
+    """Return {field: message} for every output field that fails validation.
+
+    Word counts follow count_words, so text in a locale written without
+    spaces is measured by its characters.
+    """
+    errors = {}
+
+    for field in OUTPUT_FIELDS:
+        if field not in output:
+            errors[field] = f"Missing required field: {field}"
+
+    for field in ('bullet_points', 'seo_keywords'):
+        if field not in errors and not isinstance(output.get(field), list):
+            errors[field] = f"{field} must be an array"
+
+    for field, low, high in (('short_description', 20, 50), ('detailed_description', 50, 200)):
+        if field in errors:
+            continue
+        if not isinstance(output.get(field), str):
+            errors[field] = f"{field} must be a string"
+            continue
+        words = count_words(output.get(field), locale)
+        if not (low <= words <= high):
+            errors[field] = f"{field} must be {low}-{high} words, got {words}"
+
+    return errors
+
 
 def validate_output(output):
     """Validate generated output format"""
-    required_fields = ['short_description', 'detailed_description', 'bullet_points', 'seo_keywords', 'call_to_action']
-    
-    for field in required_fields:
-        if field not in output:
-            return False, f"Missing required field: {field}"
-    
-    
-    if not isinstance(output.get('bullet_points'), list):
-        return False, "bullet_points must be an array"
-    
-    if not isinstance(output.get('seo_keywords'), list):
-        return False, "seo_keywords must be an array"
-    
-    
-    short_desc_words = len(output.get('short_description', '').split())
-    if not (20 <= short_desc_words <= 50):
-        return False, f"short_description must be 20-50 words, got {short_desc_words}"
-    
-    detailed_desc_words = len(output.get('detailed_description', '').split())
-    if not (50 <= detailed_desc_words <= 200):
-        return False, f"detailed_description must be 50-200 words, got {detailed_desc_words}"
-    
+    errors = get_output_field_errors(output)
+    if errors:
+        return False, next(iter(errors.values()))
     return True, "Valid"